@@ -0,0 +1,291 @@
+# Bedrock clients for ESGenius
+# Process-wide, lazily created boto3 clients, plus an async wrapper since boto3
+# has no native asyncio support
+
+import json
+import os
+import threading
+import weakref
+from concurrent.futures import ThreadPoolExecutor
+from typing import TYPE_CHECKING, Any, AsyncIterator, Dict, Iterator, Optional, Tuple
+
+if TYPE_CHECKING:
+    import asyncio
+
+from metrics import incr, record_usage, timed
+from resilience import get_resilience, run_in_context
+from scheduler import get_scheduler, request_tokens, response_tokens
+from response_cache import ResponseCache, get_default_cache, request_cache_key
+
+AWS_REGION = os.getenv('AWS_REGION', 'ap-southeast-1')
+BEDROCK_MAX_CONCURRENCY = int(os.getenv('BEDROCK_MAX_CONCURRENCY', '8'))
+
+# Connection tuning for the shared clients
+BEDROCK_POOL_SIZE = int(os.getenv('BEDROCK_POOL_SIZE', '32'))
+BEDROCK_CONNECT_TIMEOUT = float(os.getenv('BEDROCK_CONNECT_TIMEOUT', '5'))
+BEDROCK_READ_TIMEOUT = float(os.getenv('BEDROCK_READ_TIMEOUT', '120'))
+# Adaptive retries for clients other than bedrock-runtime, whose throttling the scheduler retries
+BEDROCK_MAX_ATTEMPTS = int(os.getenv('BEDROCK_MAX_ATTEMPTS', '3'))
+
+_clients: Dict[Tuple[str, str], Any] = {}
+_clients_lock = threading.Lock()
+_async_client: Optional['AsyncBedrockClient'] = None
+
+
+def get_client(service: str = 'bedrock-runtime', region: Optional[str] = None):
+    """
+    Shared boto3 client for a service and region, created on first use.
+    
+    boto3 is imported here rather than at module load, so code paths that
+    never reach Bedrock (validation errors, cache hits) don't pay for it.
+    Clients keep connections alive in a pool sized for concurrent callers.
+    bedrock-runtime makes a single attempt per call: the scheduler owns
+    throttling retries, and botocore retrying underneath it would multiply
+    the attempts and stack two backoffs.
+    """
+    key = (service, region or AWS_REGION)
+    client = _clients.get(key)
+    if client is not None:
+        return client
+    with _clients_lock:
+        if key not in _clients:
+            import boto3
+            from botocore.config import Config
+            
+            if service == 'bedrock-runtime':
+                retries = {'total_max_attempts': 1, 'mode': 'standard'}
+            else:
+                retries = {'max_attempts': BEDROCK_MAX_ATTEMPTS, 'mode': 'adaptive'}
+            _clients[key] = boto3.client(service, region_name=key[1], config=Config(
+                max_pool_connections=BEDROCK_POOL_SIZE,
+                connect_timeout=BEDROCK_CONNECT_TIMEOUT,
+                read_timeout=BEDROCK_READ_TIMEOUT,
+                retries=retries,
+                tcp_keepalive=True
+            ))
+        return _clients[key]
+
+
+def get_async_client() -> 'AsyncBedrockClient':
+    """Shared AsyncBedrockClient, so every service in the process respects one in-flight cap"""
+    global _async_client
+    with _clients_lock:
+        if _async_client is None:
+            _async_client = AsyncBedrockClient(cache=get_default_cache())
+    return _async_client
+
+
+def invoke_model(client, model_id: str, body: Dict[str, Any],
+                 cache: Optional[ResponseCache] = None) -> Dict[str, Any]:
+    """
+    Invoke a Bedrock model and return the decoded response body (blocking).
+    
+    Cache misses wait their turn in the shared scheduler, which paces calls
+    per model and retries throttling, then go through the shared resilience
+    layer, so this raises CircuitOpenError or DeadlineExceeded instead of
+    calling a failing model.
+    """
+    def call():
+        with timed('bedrock'):
+            result = get_scheduler().run(
+                model_id, lambda: guard.call(model_id, lambda: _invoke_model(client, model_id, body)),
+                request_tokens(body), used_tokens=response_tokens
+            )
+        record_usage(result.get('usage'))
+        return result
+    
+    guard = get_resilience()
+    if cache is None:
+        return call()
+    key = request_cache_key(model_id, body)
+    result = cache.get(key)
+    if result is None:
+        incr('cache_misses')
+        result = call()
+        cache.put(key, result)
+    else:
+        incr('cache_hits')
+    return result
+
+
+def _invoke_model(client, model_id: str, body: Dict[str, Any]) -> Dict[str, Any]:
+    response = client.invoke_model(
+        modelId=model_id,
+        contentType="application/json",
+        accept="application/json",
+        body=json.dumps(body)
+    )
+    # Reading the streaming body is network I/O too, so it stays on the worker thread
+    return json.loads(response['body'].read())
+
+
+def stream_model(client, model_id: str, body: Dict[str, Any],
+                 cache: Optional[ResponseCache] = None) -> Iterator[str]:
+    """
+    Invoke a Bedrock model with a response stream and yield text deltas as they arrive (blocking).
+    
+    A cached completion is replayed as a single delta; a fully streamed one is
+    stored in the same shape ``invoke_model`` returns, so both paths share entries.
+    """
+    key = request_cache_key(model_id, body) if cache is not None else None
+    if key is not None:
+        cached = cache.get(key)
+        if cached is not None:
+            incr('cache_hits')
+            yield cached['content'][0]['text']
+            return
+        incr('cache_misses')
+    
+    parts = []
+    usage: Dict[str, int] = {}
+    def start():
+        return get_scheduler().run(model_id, lambda: client.invoke_model_with_response_stream(
+            modelId=model_id,
+            contentType="application/json",
+            accept="application/json",
+            body=json.dumps(body)
+        )['body'], request_tokens(body))
+    
+    events = get_resilience().guard_stream(model_id, start)
+    try:
+        for event in events:
+            chunk = event.get('chunk')
+            if not chunk:
+                continue
+            data = json.loads(chunk['bytes'])
+            if data.get('type') == 'content_block_delta' and data['delta'].get('type') == 'text_delta':
+                parts.append(data['delta']['text'])
+                yield data['delta']['text']
+            elif data.get('type') == 'message_start':
+                usage.update(data['message'].get('usage', {}))
+            elif data.get('type') == 'message_delta':
+                usage.update(data.get('usage', {}))
+    finally:
+        # A consumer that stops early closes the response stream rather than leaving it to the GC
+        events.close()
+    record_usage(usage)
+    
+    if key is not None:
+        cache.put(key, {'content': [{'type': 'text', 'text': ''.join(parts)}], 'usage': usage})
+
+
+class AsyncBedrockClient:
+    """
+    Non-blocking wrapper around the boto3 bedrock-runtime client.
+
+    Each call runs on a dedicated thread pool, and at most ``max_concurrency``
+    requests are in flight at once. Extra callers wait on a semaphore without
+    holding up the event loop.
+    """
+
+    def __init__(self, client=None, max_concurrency: Optional[int] = None,
+                 cache: Optional[ResponseCache] = None):
+        self.cache = cache
+        self.max_concurrency = max_concurrency or BEDROCK_MAX_CONCURRENCY
+        self._client = client
+        self._executor = ThreadPoolExecutor(
+            max_workers=self.max_concurrency,
+            thread_name_prefix='bedrock'
+        )
+        self._semaphores: 'weakref.WeakKeyDictionary[asyncio.AbstractEventLoop, asyncio.Semaphore]' = \
+            weakref.WeakKeyDictionary()
+        self.in_flight = 0
+
+    @property
+    def client(self):
+        # Resolved on first call so constructing the wrapper stays cheap
+        if self._client is None:
+            self._client = get_client('bedrock-runtime')
+        return self._client
+
+    def _semaphore(self) -> 'asyncio.Semaphore':
+        # asyncio primitives are bound to a loop, so keep one per running loop; weak keys
+        # drop a loop's semaphore once the loop is gone
+        import asyncio
+        
+        loop = asyncio.get_running_loop()
+        semaphore = self._semaphores.get(loop)
+        if semaphore is None:
+            semaphore = self._semaphores.setdefault(loop, asyncio.Semaphore(self.max_concurrency))
+        return semaphore
+
+    async def invoke_model(self, model_id: str, body: Dict[str, Any]) -> Dict[str, Any]:
+        """Invoke a Bedrock model and return the decoded response body"""
+        import asyncio
+        
+        # Cache hits are answered without taking a slot or a thread hop
+        key = request_cache_key(model_id, body) if self.cache is not None else None
+        if key is not None:
+            result = self.cache.get(key)
+            if result is not None:
+                incr('cache_hits')
+                return result
+            incr('cache_misses')
+        
+        # Each attempt (a hedged request is a second one) takes its own slot
+        async def attempt():
+            async with self._semaphore():
+                self.in_flight += 1
+                try:
+                    loop = asyncio.get_running_loop()
+                    return await loop.run_in_executor(
+                        self._executor, _invoke_model, self.client, model_id, body
+                    )
+                finally:
+                    self.in_flight -= 1
+        
+        with timed('bedrock'):
+            result = await get_scheduler().run_async(
+                model_id, lambda: get_resilience().call_async(model_id, attempt),
+                request_tokens(body), used_tokens=response_tokens
+            )
+        record_usage(result.get('usage'))
+        
+        if key is not None:
+            self.cache.put(key, result)
+        return result
+
+    async def stream_model(self, model_id: str, body: Dict[str, Any]) -> AsyncIterator[str]:
+        """Invoke a Bedrock model with a response stream and yield text deltas as they arrive"""
+        import asyncio
+        
+        loop = asyncio.get_running_loop()
+        queue: asyncio.Queue = asyncio.Queue()
+        finished = object()
+        # Set when the consumer stops early, so the worker stops reading and closes the stream
+        stop = threading.Event()
+        
+        def pump():
+            # Runs on a worker thread and hands each delta back to the event loop
+            deltas = stream_model(self.client, model_id, body, cache=self.cache)
+            try:
+                for delta in deltas:
+                    if stop.is_set():
+                        return
+                    loop.call_soon_threadsafe(queue.put_nowait, delta)
+                loop.call_soon_threadsafe(queue.put_nowait, finished)
+            except Exception as e:
+                if not stop.is_set():
+                    loop.call_soon_threadsafe(queue.put_nowait, e)
+            finally:
+                deltas.close()
+        
+        async with self._semaphore():
+            self.in_flight += 1
+            try:
+                # The worker thread inherits the caller's deadline
+                run_in_context(self._executor, pump)
+                while True:
+                    item = await queue.get()
+                    if item is finished:
+                        break
+                    if isinstance(item, Exception):
+                        raise item
+                    yield item
+            finally:
+                stop.set()
+                self.in_flight -= 1
+
+    def close(self):
+        """Release the worker threads"""
+        self._executor.shutdown(wait=False)
@@ -0,0 +1,57 @@
+"""
+Throughput of ESGLLMAnalyzer under concurrent assessments.
+
+Runs a fixed number of assessments against a fake Bedrock backend with a fixed
+per-call latency, for increasing in-flight caps. With the old blocking call,
+throughput stayed at 1/latency no matter how many coroutines were scheduled.
+
+    python benchmarks/bench_async_client.py --assessments 32 --latency 0.2
+"""
+
+import argparse
+import asyncio
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from bedrock_client import AsyncBedrockClient  # noqa: E402
+from fake_bedrock import FakeBedrockRuntime  # noqa: E402
+from llm_service import ESGLLMAnalyzer, OpportunityMatcher  # noqa: E402
+
+COMPANY = {"name": "Bench Sdn Bhd", "industry": "Manufacturing", "size": "small", "employees": 25}
+RESPONSES = [{"criterionId": "energy-management", "score": 70, "evidence": "Solar panels"}]
+
+
+async def run(assessments: int, concurrency: int, latency: float) -> float:
+    client = AsyncBedrockClient(FakeBedrockRuntime(latency), max_concurrency=concurrency)
+    analyzer = ESGLLMAnalyzer(client)
+    matcher = OpportunityMatcher(client)
+
+    async def one():
+        analysis = await analyzer.analyze_esg_compliance(COMPANY, "NSRF", RESPONSES)
+        await matcher.find_opportunities(COMPANY, analysis.overall_score)
+
+    start = time.perf_counter()
+    await asyncio.gather(*(one() for _ in range(assessments)))
+    elapsed = time.perf_counter() - start
+    client.close()
+    return elapsed
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument('--assessments', type=int, default=32)
+    parser.add_argument('--latency', type=float, default=0.2)
+    parser.add_argument('--levels', default='1,2,4,8,16,32')
+    args = parser.parse_args()
+
+    print(f"{'max_concurrency':>16} {'elapsed_s':>10} {'assessments/s':>14}")
+    for level in (int(x) for x in args.levels.split(',')):
+        elapsed = asyncio.run(run(args.assessments, level, args.latency))
+        print(f"{level:>16} {elapsed:>10.2f} {args.assessments / elapsed:>14.2f}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,105 @@
+"""
+Cohort recommendation cache vs. one recommendation call per company.
+
+Runs ESGProcessor.analyze_esg_assessment in rubric scoring mode (so the only
+Bedrock call is the recommendation call) over a synthetic population of
+micro and small SMEs, with and without the cohort cache, against a fake
+Bedrock backend. Reports latency, Bedrock calls and output tokens, and the
+cache's hit rate and calls saved.
+
+    python benchmarks/bench_cohort_cache.py --companies 500 --score-band 10
+"""
+
+import argparse
+import json
+import os
+import random
+import sys
+import time
+
+os.environ.setdefault('BEDROCK_CACHE_TTL', '0')
+os.environ.setdefault('ESG_METRICS_ENABLED', 'false')
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, BACKEND_DIR)
+sys.path.insert(0, os.path.join(BACKEND_DIR, '..', '..', 'unused'))
+
+import lambda_esg_processor  # noqa: E402
+from cohort_cache import CohortCache  # noqa: E402
+from fake_bedrock import FakeBedrockRuntime  # noqa: E402
+from lambda_esg_processor import ESGProcessor  # noqa: E402
+from response_cache import MemoryTier  # noqa: E402
+
+INDUSTRIES = ['Manufacturing', 'Food & Beverage', 'Retail', 'Logistics', 'Construction']
+CRITERIA = ['energy-management', 'waste-management', 'water-management', 'labor-welfare',
+            'social-inclusion', 'governance-framework', 'supply-chain', 'training-participation']
+# Typical maturity levels; companies vary around one of them
+ARCHETYPES = [35, 55, 70]
+
+RECOMMENDATIONS = json.dumps([{
+    "type": "improvement",
+    "title": title,
+    "description": f"{title} with a named owner, a baseline and quarterly reviews",
+    "priority": "high" if i < 2 else "medium",
+    "estimatedImpact": "Moves the weakest pillar up one band within a year",
+    "timeframe": "3-6 months",
+    "requiredActions": ["Assign an owner", "Measure the baseline", "Set targets", "Review quarterly"],
+    "relatedCriteria": [criterion],
+    "resources": [{"title": "SME Corp ESG guide", "type": "document", "description": "Practical checklist"}]
+} for i, (title, criterion) in enumerate([
+    ("Implement energy monitoring", "energy-management"), ("Formalise a board charter", "governance-framework"),
+    ("Start a waste segregation programme", "waste-management"), ("Run a staff welfare survey", "labor-welfare")])])
+
+
+def population(count, rng):
+    companies = []
+    for i in range(count):
+        employees = rng.choice([rng.randint(1, 4), rng.randint(5, 29), rng.randint(30, 74)])
+        base = rng.choice(ARCHETYPES)
+        companies.append((
+            {'name': f'Syarikat {i:04d} Sdn Bhd', 'industry': rng.choice(INDUSTRIES),
+             'size': 'micro' if employees < 5 else 'small', 'employees': employees},
+            [{'criterionId': criterion, 'score': max(0, min(100, base + rng.randint(-4, 4))),
+              'evidence': 'Records provided', 'notes': ''} for criterion in CRITERIA]
+        ))
+    return companies
+
+
+def run(name, processor, companies, latency):
+    fake = FakeBedrockRuntime(latency=latency, completion=RECOMMENDATIONS)
+    lambda_esg_processor.bedrock_runtime = fake
+    timings = []
+    for business, responses in companies:
+        start = time.perf_counter()
+        result = processor.analyze_esg_assessment(business, responses, 'NSRF')
+        timings.append(time.perf_counter() - start)
+        assert result['recommendations']
+    timings.sort()
+    p50 = timings[len(timings) // 2] * 1000
+    p95 = timings[min(len(timings) - 1, int(len(timings) * 0.95))] * 1000
+    print(f"{name:<14} {p50:>8.1f} {p95:>8.1f} {fake.calls:>7} {fake.output_tokens:>9}")
+    return fake
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument('--companies', type=int, default=500)
+    parser.add_argument('--score-band', type=float, default=10, help='width of the E/S/G score bands')
+    parser.add_argument('--latency', type=float, default=0.02, help='seconds per Bedrock call')
+    parser.add_argument('--seed', type=int, default=7)
+    args = parser.parse_args()
+
+    companies = population(args.companies, random.Random(args.seed))
+    print(f"{args.companies} companies, {args.score_band:g}-point score bands")
+    print(f"{'mode':<14} {'p50 ms':>8} {'p95 ms':>8} {'calls':>7} {'out tok':>9}")
+    run('per-company', ESGProcessor(scoring_mode='rubric', cache=None), companies, args.latency)
+
+    cache = CohortCache([MemoryTier(4096, 3600)], score_band=args.score_band)
+    run('cohort cache', ESGProcessor(scoring_mode='rubric', cache=None, cohort_cache=cache),
+        companies, args.latency)
+    stats = cache.stats()
+    print(f"cohorts {stats['misses']}, hit rate {stats['hit_rate']:.1%}, "
+          f"Bedrock calls saved {stats['bedrock_calls_saved']}")
+
+
+if __name__ == '__main__':
+    main()
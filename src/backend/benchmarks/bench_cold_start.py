@@ -0,0 +1,79 @@
+"""
+Cold- and warm-start cost of the Lambda entry point.
+
+Each trial runs in a fresh interpreter, like a new Lambda container, and records:
+module import time, whether boto3 was loaded by the import, handler time for a
+request that fails validation, time to create the shared Bedrock client, and
+time to first byte for the first (cold) and second (warm) analysis. Model calls
+go to a zero-latency fake, so the numbers are pure overhead.
+
+    python benchmarks/bench_cold_start.py --trials 5
+"""
+
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+BACKEND_DIR = os.path.dirname(BENCH_DIR)
+LAMBDA_DIR = os.path.normpath(os.path.join(BACKEND_DIR, '..', '..', 'unused'))
+
+TRIAL = r'''
+import json, sys, time
+start = time.perf_counter()
+import lambda_esg_processor
+import_ms = (time.perf_counter() - start) * 1000
+boto3_on_import = 'boto3' in sys.modules
+
+invalid = {'body': json.dumps({'assessments': ['not-an-object']})}
+start = time.perf_counter()
+lambda_esg_processor.lambda_handler(invalid, None)
+invalid_ms = (time.perf_counter() - start) * 1000
+boto3_after_invalid = 'boto3' in sys.modules
+
+from bedrock_client import get_client
+start = time.perf_counter()
+get_client('bedrock-runtime')
+client_ms = (time.perf_counter() - start) * 1000
+
+from fake_bedrock import FakeBedrockRuntime
+lambda_esg_processor.bedrock_runtime = FakeBedrockRuntime(latency=0)
+event = {'body': json.dumps({'business': {'name': 'Bench'}, 'responses': [{'score': 70}], 'framework': 'NSRF'})}
+timings = []
+for _ in range(2):
+    start = time.perf_counter()
+    lambda_esg_processor.lambda_handler(event, None)
+    timings.append((time.perf_counter() - start) * 1000)
+
+print(json.dumps({'import_ms': import_ms, 'boto3_on_import': boto3_on_import,
+                  'invalid_request_ms': invalid_ms, 'boto3_after_invalid': boto3_after_invalid,
+                  'client_create_ms': client_ms, 'cold_ttfb_ms': timings[0], 'warm_ttfb_ms': timings[1]}))
+'''
+
+
+def run_trial():
+    env = dict(os.environ, BEDROCK_CACHE_TTL='0', ESG_METRICS_ENABLED='false',
+               PYTHONPATH=os.pathsep.join([LAMBDA_DIR, BACKEND_DIR, BENCH_DIR]))
+    output = subprocess.run([sys.executable, '-c', TRIAL], env=env, check=True,
+                            capture_output=True, text=True).stdout
+    return json.loads(output.strip().splitlines()[-1])
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument('--trials', type=int, default=5)
+    args = parser.parse_args()
+
+    trials = [run_trial() for _ in range(args.trials)]
+    for field in ('boto3_on_import', 'boto3_after_invalid'):
+        print(f"{field:>20}: {trials[0][field]}")
+    for field in ('import_ms', 'invalid_request_ms', 'client_create_ms', 'cold_ttfb_ms', 'warm_ttfb_ms'):
+        values = [trial[field] for trial in trials]
+        print(f"{field:>20}: median {statistics.median(values):8.1f} ms   max {max(values):8.1f} ms")
+
+
+if __name__ == '__main__':
+    main()
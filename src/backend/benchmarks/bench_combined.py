@@ -0,0 +1,107 @@
+"""
+Combined single-call analysis vs. the multi-call pipeline (scores, then recommendations).
+
+Runs ESGProcessor.analyze_esg_assessment in both modes against a fake Bedrock
+backend whose latency grows with prompt and completion length, and reports
+latency percentiles, model calls and input/output tokens per analysis.
+
+    python benchmarks/bench_combined.py --runs 10
+"""
+
+import argparse
+import json
+import os
+import random
+import statistics
+import sys
+import time
+
+os.environ.setdefault('BEDROCK_CACHE_TTL', '0')
+os.environ.setdefault('ESG_METRICS_ENABLED', 'false')
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, BACKEND_DIR)
+sys.path.insert(0, os.path.join(BACKEND_DIR, '..', '..', 'unused'))
+
+import lambda_esg_processor  # noqa: E402
+from fake_bedrock import FakeBedrockRuntime  # noqa: E402
+from lambda_esg_processor import ESGProcessor  # noqa: E402
+
+BUSINESS = {'name': 'Kilang Maju Sdn Bhd', 'industry': 'Manufacturing', 'size': 'small', 'employees': 45}
+
+RECOMMENDATIONS = [{
+    "id": f"rec_{i:03d}",
+    "type": "improvement",
+    "title": title,
+    "description": f"{title} with clear owners, a baseline and quarterly reviews",
+    "priority": priority,
+    "estimatedImpact": "10-15% reduction in operating costs within a year",
+    "timeframe": "3-6 months",
+    "requiredActions": ["Assign an owner", "Measure the baseline", "Set targets", "Review quarterly"],
+    "relatedCriteria": ["energy-management"],
+    "resources": [{"title": "SME Corp ESG guide", "type": "document", "description": "Practical checklist"}]
+} for i, (title, priority) in enumerate([
+    ("Implement energy monitoring", "high"), ("Formalise a safety committee", "high"),
+    ("Start a waste segregation programme", "medium"), ("Publish an anti-bribery policy", "medium")], 1)]
+
+SCORES_TEXT = """Environmental Score: 62
+Social Score: 70
+Governance Score: 58
+Overall Score: 64
+Compliance Level: Good"""
+
+COMBINED_TEXT = json.dumps({
+    "environmental_score": 62, "social_score": 70, "governance_score": 58, "overall_score": 64,
+    "compliance_level": "Good",
+    "recommendations": RECOMMENDATIONS,
+    "compliance_gaps": ["No energy baseline", "Board lacks an independent member"]
+})
+
+
+def multi_call_completion(prompt):
+    if 'Provide scores in this exact format' in prompt:
+        return SCORES_TEXT
+    return json.dumps(RECOMMENDATIONS)
+
+
+def synthetic_responses(count, rng):
+    return [{'criterionId': f'criterion-{i:03d}', 'score': rng.randint(20, 95),
+             'evidence': 'Policy document and monthly records provided', 'notes': ''} for i in range(count)]
+
+
+def measure(name, processor, fake, assessments):
+    lambda_esg_processor.bedrock_runtime = fake
+    timings = []
+    for responses in assessments:
+        start = time.perf_counter()
+        result = processor.analyze_esg_assessment(BUSINESS, responses, 'NSRF')
+        timings.append(time.perf_counter() - start)
+    assert result['recommendations'] and result['scores']
+    timings.sort()
+    runs = len(assessments)
+    print(f"{name:11} p50 {statistics.median(timings) * 1000:7.0f} ms  "
+          f"p95 {timings[int(0.95 * (runs - 1))] * 1000:7.0f} ms  "
+          f"calls {fake.calls / runs:4.1f}  "
+          f"input tokens {fake.input_tokens / runs:7.0f}  output tokens {fake.output_tokens / runs:6.0f}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument('--runs', type=int, default=10)
+    parser.add_argument('--responses', type=int, default=20)
+    parser.add_argument('--latency', type=float, default=0.4, help='fixed seconds per call')
+    parser.add_argument('--prefill', type=float, default=0.1, help='seconds per 1k input tokens')
+    parser.add_argument('--decode', type=float, default=12.0, help='seconds per 1k output tokens')
+    args = parser.parse_args()
+
+    rng = random.Random(5)
+    assessments = [synthetic_responses(args.responses, rng) for _ in range(args.runs)]
+    timing = dict(latency=args.latency, input_latency_per_1k=args.prefill, output_latency_per_1k=args.decode)
+
+    measure('multi-call', ESGProcessor(combined_analysis=False),
+            FakeBedrockRuntime(completion=multi_call_completion, **timing), assessments)
+    measure('combined', ESGProcessor(combined_analysis=True),
+            FakeBedrockRuntime(completion=COMBINED_TEXT, **timing), assessments)
+
+
+if __name__ == '__main__':
+    main()
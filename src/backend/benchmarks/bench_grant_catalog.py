@@ -0,0 +1,94 @@
+"""
+Top-k grant lookup: indexed GrantCatalog vs. a linear scan of every programme.
+
+Builds a synthetic catalog with random minimum scores and application windows,
+checks that both approaches return the same grants, and reports per-query time.
+
+    python benchmarks/bench_grant_catalog.py --grants 50000 --queries 2000
+"""
+
+import argparse
+import os
+import random
+import sys
+import time
+from datetime import date, timedelta
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from grant_catalog import (  # noqa: E402
+    ELIGIBILITY_THRESHOLD, SCORE_DIMENSIONS, SME_BONUS, GrantCatalog, GrantRecord
+)
+
+TODAY = date(2026, 1, 15)
+
+
+def synthetic_grants(count: int, rng: random.Random):
+    grants = []
+    for i in range(count):
+        dimensions = rng.sample([d for d, _ in SCORE_DIMENSIONS], rng.randint(0, 3))
+        deadline = TODAY + timedelta(days=rng.randint(-365, 365))
+        opens = deadline - timedelta(days=rng.randint(30, 400)) if rng.random() < 0.5 else None
+        grants.append(GrantRecord(
+            name=f'Programme {i}', provider='Agency', amount='RM 100,000', description='',
+            deadline=deadline.isoformat(), requirements=[],
+            min_scores={d: float(rng.randint(30, 90)) for d in dimensions},
+            opens=opens.isoformat() if opens else None
+        ))
+    return grants
+
+
+def linear_top_k(grants, scores, sme, k, today):
+    """The pre-index approach: score every grant, filter, sort"""
+    matches = []
+    for grant in grants:
+        if grant.deadline and date.fromisoformat(grant.deadline) < today:
+            continue
+        if grant.opens and date.fromisoformat(grant.opens) > today:
+            continue
+        eligibility = 0.0
+        for dimension, weight in SCORE_DIMENSIONS:
+            if grant.min_scores.get(dimension, 0.0) <= scores[dimension]:
+                eligibility += weight
+        if sme:
+            eligibility += SME_BONUS
+        eligibility = min(eligibility, 1.0)
+        if eligibility > ELIGIBILITY_THRESHOLD:
+            matches.append((grant, eligibility))
+    return sorted(matches, key=lambda match: match[1], reverse=True)[:k]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument('--grants', type=int, default=50000)
+    parser.add_argument('--queries', type=int, default=2000)
+    parser.add_argument('--k', type=int, default=3)
+    args = parser.parse_args()
+
+    rng = random.Random(7)
+    grants = synthetic_grants(args.grants, rng)
+    start = time.perf_counter()
+    catalog = GrantCatalog(grants)
+    print(f"index build: {(time.perf_counter() - start) * 1000:.1f} ms for {args.grants} grants")
+
+    queries = [({d: float(rng.randint(20, 100)) for d, _ in SCORE_DIMENSIONS}, rng.random() < 0.5)
+               for _ in range(args.queries)]
+
+    start = time.perf_counter()
+    indexed = [catalog.top_eligible(scores, sme, args.k, TODAY) for scores, sme in queries]
+    indexed_us = (time.perf_counter() - start) / len(queries) * 1e6
+
+    sample = queries[:max(1, min(len(queries), 50))]
+    start = time.perf_counter()
+    linear = [linear_top_k(grants, scores, sme, args.k, TODAY) for scores, sme in sample]
+    linear_us = (time.perf_counter() - start) / len(sample) * 1e6
+
+    mismatches = sum(1 for a, b in zip(indexed, linear)
+                     if [(g.name, e) for g, e in a] != [(g.name, e) for g, e in b])
+    print(f"indexed: {indexed_us:10.1f} us/query")
+    print(f"linear:  {linear_us:10.1f} us/query  ({len(sample)} queries)")
+    print(f"mismatches: {mismatches}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,98 @@
+"""
+Opportunity matching: local BM25 retrieval vs. one LLM call per request.
+
+Runs OpportunityMatcher.find_opportunities for synthetic company profiles over
+the shipped catalogue (or a synthetic one of --records programmes) with each
+rerank mode, against a fake Bedrock backend. Reports latency, the share of
+requests that called the model, and whether repeated runs return the same
+matches.
+
+    python benchmarks/bench_opportunity_index.py --companies 500 --records 5000
+"""
+
+import argparse
+import asyncio
+import os
+import random
+import sys
+import time
+
+os.environ.setdefault('BEDROCK_CACHE_TTL', '0')
+os.environ.setdefault('ESG_METRICS_ENABLED', 'false')
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from bedrock_client import AsyncBedrockClient  # noqa: E402
+from fake_bedrock import FakeBedrockRuntime  # noqa: E402
+from llm_service import OpportunityMatcher  # noqa: E402
+from opportunity_index import OpportunityIndex, OpportunityRecord, get_opportunity_index  # noqa: E402
+
+INDUSTRIES = ['Manufacturing', 'Food & Beverage', 'Retail', 'Logistics', 'Construction', 'Agriculture',
+              'Hospitality', 'Technology']
+LOCATIONS = ['Shah Alam, Selangor', 'Kuching, Sarawak', 'Kota Kinabalu, Sabah', 'Johor Bahru, Johor', 'Penang']
+INTERESTS = ['solar', 'energy efficiency', 'waste reduction', 'training', 'certification', 'supply chain',
+             'electric vehicle', 'water recycling', 'reporting']
+VOCABULARY = INTERESTS + ['grant', 'loan', 'tax', 'green', 'digital', 'export', 'innovation', 'carbon', 'audit']
+
+RERANK_TEXT = '[{"index": 2, "reasoning": "Closest fit"}, {"index": 1, "reasoning": "Also relevant"}]'
+
+
+def synthetic_catalogue(count, rng):
+    records = []
+    for i in range(count):
+        records.append(OpportunityRecord(
+            name=f'Programme {i}', type=rng.choice(['grant', 'tax_incentive', 'financing', 'certification']),
+            authority='Agency', amount='RM 100,000', description=' '.join(rng.sample(VOCABULARY, 6)),
+            eligibility='SME status', timeline='Year-round', keywords=rng.sample(VOCABULARY, 3),
+            industries=rng.sample([i.lower() for i in INDUSTRIES], rng.choice([0, 0, 1, 2])),
+            sizes=rng.sample(['micro', 'small', 'medium'], rng.choice([0, 2, 3])),
+            locations=[rng.choice(LOCATIONS).split(', ')[-1].lower()] if rng.random() < 0.1 else [],
+            min_esg_score=float(rng.choice([0, 30, 50, 65]))
+        ))
+    return OpportunityIndex(records)
+
+
+def profiles(count, rng):
+    return [({'name': f'Syarikat {i:04d}', 'industry': rng.choice(INDUSTRIES),
+              'size': rng.choice(['micro', 'small', 'medium']), 'location': rng.choice(LOCATIONS),
+              'interests': rng.sample(INTERESTS, 2)}, float(rng.randint(20, 90))) for i in range(count)]
+
+
+async def run(mode, index, companies, latency):
+    fake = FakeBedrockRuntime(latency=latency, completion=RERANK_TEXT)
+    matcher = OpportunityMatcher(AsyncBedrockClient(client=fake), index=index, rerank=mode)
+    timings, results = [], []
+    for company, score in companies:
+        start = time.perf_counter()
+        results.append(await matcher.find_opportunities(company, score))
+        timings.append(time.perf_counter() - start)
+    timings.sort()
+    p50 = timings[len(timings) // 2] * 1000
+    p95 = timings[min(len(timings) - 1, int(len(timings) * 0.95))] * 1000
+    return p50, p95, fake.calls, results
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument('--companies', type=int, default=500)
+    parser.add_argument('--records', type=int, default=0, help='synthetic catalogue size; 0 uses the shipped one')
+    parser.add_argument('--latency', type=float, default=0.05, help='seconds per Bedrock call')
+    parser.add_argument('--seed', type=int, default=7)
+    args = parser.parse_args()
+
+    rng = random.Random(args.seed)
+    start = time.perf_counter()
+    index = synthetic_catalogue(args.records, rng) if args.records else get_opportunity_index()
+    build_ms = (time.perf_counter() - start) * 1000
+    companies = profiles(args.companies, rng)
+    print(f"{len(index.records)} programmes, {len(index.postings)} terms, index built in {build_ms:.1f} ms")
+    print(f"{'rerank':<10} {'p50 ms':>8} {'p95 ms':>8} {'model calls':>12} {'reproducible':>13}")
+    for mode in ('never', 'ambiguous', 'always'):
+        p50, p95, calls, first = asyncio.run(run(mode, index, companies, args.latency))
+        _, _, _, second = asyncio.run(run(mode, index, companies, args.latency))
+        same = [[o['name'] for o in r] for r in first] == [[o['name'] for o in r] for r in second]
+        print(f"{mode:<10} {p50:>8.2f} {p95:>8.2f} {calls / len(companies):>11.0%} {'yes' if same else 'no':>13}")
+    print(f"(the LLM-recall matcher made one {args.latency * 1000:.0f} ms model call per request)")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,104 @@
+"""
+LLM output parsing: tolerant single-pass parser vs. the original find/rfind + split approach.
+
+Runs both over a corpus of representative model outputs (clean, fenced, prose-wrapped,
+trailing commas, truncated, Python-style quoting, markdown score labels), reporting how
+many each recovers and how fast.
+
+    python benchmarks/bench_parser.py --repeat 2000
+"""
+
+import argparse
+import json
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from llm_parser import extract_scores, parse_json_array  # noqa: E402
+
+CORPUS_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'corpus', 'llm_outputs.jsonl')
+
+
+def legacy_json_array(text):
+    """The original extractor: slice from the first '[' to the last ']' and json.loads it"""
+    try:
+        start = text.find('[')
+        end = text.rfind(']') + 1
+        if start != -1 and end > start:
+            return json.loads(text[start:end])
+    except Exception:
+        pass
+    return []
+
+
+def legacy_scores(text):
+    """The original label-line parser"""
+    scores = {}
+    try:
+        for line in text.split('\n'):
+            if 'Environmental Score:' in line:
+                scores['environmental'] = float(line.split(':')[1].strip())
+            elif 'Social Score:' in line:
+                scores['social'] = float(line.split(':')[1].strip())
+            elif 'Governance Score:' in line:
+                scores['governance'] = float(line.split(':')[1].strip())
+            elif 'Overall Score:' in line:
+                scores['overall'] = float(line.split(':')[1].strip())
+            elif 'Compliance Level:' in line:
+                scores['compliance'] = line.split(':')[1].strip()
+    except Exception:
+        return {}
+    return scores
+
+
+PARSERS = {
+    'legacy': {'recommendations': legacy_json_array, 'scores': legacy_scores},
+    'tolerant': {'recommendations': parse_json_array, 'scores': extract_scores},
+}
+
+
+def succeeded(kind, result, expect):
+    if kind == 'recommendations':
+        return isinstance(result, list) and sum(isinstance(item, dict) for item in result) >= expect
+    return all(result.get(key) == value for key, value in expect.items())
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument('--corpus', default=CORPUS_PATH)
+    parser.add_argument('--repeat', type=int, default=2000)
+    args = parser.parse_args()
+
+    with open(args.corpus, encoding='utf-8') as handle:
+        corpus = [json.loads(line) for line in handle if line.strip()]
+    total_bytes = sum(len(sample['text'].encode('utf-8')) for sample in corpus)
+
+    print(f"{'sample':42} {'legacy':>8} {'tolerant':>9}")
+    for sample in corpus:
+        outcome = [
+            'ok' if succeeded(sample['kind'], PARSERS[name][sample['kind']](sample['text']), sample['expect']) else 'FAIL'
+            for name in PARSERS
+        ]
+        print(f"{sample['kind'][:4]}: {sample['label']:36} {outcome[0]:>8} {outcome[1]:>9}")
+
+    print()
+    for name, parsers in PARSERS.items():
+        successes = sum(
+            succeeded(sample['kind'], parsers[sample['kind']](sample['text']), sample['expect'])
+            for sample in corpus
+        )
+        start = time.perf_counter()
+        for _ in range(args.repeat):
+            for sample in corpus:
+                parsers[sample['kind']](sample['text'])
+        elapsed = time.perf_counter() - start
+        per_doc_us = elapsed / (args.repeat * len(corpus)) * 1e6
+        throughput = total_bytes * args.repeat / elapsed / 1e6
+        print(f"{name:9} success {successes:2}/{len(corpus)}  "
+              f"{per_doc_us:8.1f} us/doc  {throughput:6.1f} MB/s")
+
+
+if __name__ == '__main__':
+    main()
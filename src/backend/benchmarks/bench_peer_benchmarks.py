@@ -0,0 +1,87 @@
+"""
+Peer percentiles: score sketches vs. exact ranks over every stored score.
+
+Records --assessments synthetic analyses (random industry, size and E/S/G
+scores) into PeerBenchmarks, split over --workers instances merged at the
+end as separate containers would be, then places --queries new analyses.
+Reports per-query latency against bisecting a sorted list of all peer
+scores, the largest percentile error, and the stored size of the sketches.
+
+    python benchmarks/bench_peer_benchmarks.py --assessments 100000 --workers 4
+"""
+
+import argparse
+import bisect
+import os
+import random
+import sys
+import time
+from collections import defaultdict
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from peer_benchmarks import PILLARS, PeerBenchmarks  # noqa: E402
+
+INDUSTRIES = ['Manufacturing', 'Food & Beverage', 'Retail', 'Logistics', 'Construction', 'Agriculture',
+              'Hospitality', 'Technology']
+SIZES = ['micro', 'small', 'medium']
+
+
+def analysis(rng, company):
+    business = {'name': f'SME {company}', 'industry': rng.choice(INDUSTRIES), 'size': rng.choice(SIZES)}
+    scores = {f'{pillar}_score': round(min(max(rng.gauss(55, 15), 0), 100), 1) for pillar in PILLARS[:3]}
+    scores['overall_score'] = round(sum(scores.values()) / 3, 1)
+    return business, scores
+
+
+def exact_percentile(ordered, score):
+    below = bisect.bisect_left(ordered, score)
+    equal = bisect.bisect_right(ordered, score) - below
+    return 100.0 * (below + equal / 2) / len(ordered)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument('--assessments', type=int, default=100000)
+    parser.add_argument('--workers', type=int, default=4)
+    parser.add_argument('--queries', type=int, default=2000)
+    parser.add_argument('--seed', type=int, default=7)
+    args = parser.parse_args()
+
+    rng = random.Random(args.seed)
+    workers = [PeerBenchmarks(min_peers=1) for _ in range(args.workers)]
+    exact = defaultdict(list)
+    start = time.perf_counter()
+    for i in range(args.assessments):
+        business, scores = analysis(rng, i)
+        workers[i % args.workers].record('NSRF', business, scores)
+        exact[(business['industry'], business['size'])].append(scores['overall_score'])
+    record_us = (time.perf_counter() - start) / args.assessments * 1e6
+    merged = workers[0]
+    for worker in workers[1:]:
+        merged.merge(worker)
+    for scores in exact.values():
+        scores.sort()
+
+    queries = [analysis(rng, args.assessments + i) for i in range(args.queries)]
+    start = time.perf_counter()
+    placed = [merged.percentiles('NSRF', business, scores) for business, scores in queries]
+    sketch_us = (time.perf_counter() - start) / args.queries * 1e6
+    start = time.perf_counter()
+    ranks = [exact_percentile(exact[(business['industry'], business['size'])], scores['overall_score'])
+             for business, scores in queries]
+    exact_us = (time.perf_counter() - start) / args.queries * 1e6
+    error = max(abs(p['overall']['percentile'] - r) for p, r in zip(placed, ranks))
+
+    stored = sum(len(sketch.to_bytes()) for sketch in merged.sketches.values())
+    raw = sum(len(scores) for scores in exact.values()) * 8
+    print(f"{args.assessments} analyses over {args.workers} workers, {len(merged.sketches)} sketches")
+    print(f"record: {record_us:.1f} us per analysis (4 pillars x 3 peer groups)")
+    print(f"percentiles, 4 pillars: {sketch_us:.1f} us per analysis "
+          f"(bisect over all overall scores, 1 pillar: {exact_us:.1f} us)")
+    print(f"largest overall percentile error vs exact: {error:.2f} points")
+    print(f"stored: {stored / 1024:.1f} KiB of sketches vs {raw / 1024:.1f} KiB of raw overall scores")
+
+
+if __name__ == '__main__':
+    main()
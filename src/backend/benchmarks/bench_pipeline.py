@@ -0,0 +1,207 @@
+"""
+Offline benchmark suite for the ESG pipeline against a simulated Bedrock backend.
+
+Runs four workloads against a fake bedrock-runtime client injected in place of
+the Lambda's module-level ``bedrock_runtime`` and the services' async client:
+
+- single: sequential ``lambda_handler`` requests
+- concurrent: ``lambda_handler`` requests from --threads threads
+- batch: one ``lambda_handler`` batch request per --batch assessments
+- async: ``ESGLLMAnalyzer`` and ``OpportunityMatcher`` for --threads assessments at a time
+
+Each reports latency percentiles, throughput, peak allocated memory per
+request (tracemalloc, measured in a separate pass) and the fake's call,
+error and throttle counts. The fake's latency distribution, error and
+throttle rates are configurable. --record captures real Bedrock completions
+(AWS credentials required) and --replay serves them back offline.
+
+    python benchmarks/bench_pipeline.py --requests 40 --threads 8 --error-rate 0.02 --throttle-rate 0.05
+    python benchmarks/bench_pipeline.py --workloads single --record recordings.jsonl
+    python benchmarks/bench_pipeline.py --replay recordings.jsonl --latency-dist exponential
+"""
+
+import argparse
+import asyncio
+import json
+import logging
+import os
+import sys
+import threading
+import time
+import tracemalloc
+
+os.environ.setdefault('BEDROCK_CACHE_TTL', '0')
+os.environ.setdefault('ESG_METRICS_ENABLED', 'false')
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, BACKEND_DIR)
+sys.path.insert(0, os.path.join(BACKEND_DIR, '..', '..', 'unused'))
+
+import lambda_esg_processor  # noqa: E402
+import resilience  # noqa: E402
+import scheduler  # noqa: E402
+from bedrock_client import AsyncBedrockClient, get_client  # noqa: E402
+from fake_bedrock import FakeBedrockRuntime, RecordingBedrockRuntime, ReplayBedrockRuntime  # noqa: E402
+from llm_service import ESGLLMAnalyzer, OpportunityMatcher  # noqa: E402
+
+# Injected errors are expected; their log lines would only break up the table
+logging.disable(logging.ERROR)
+
+BUSINESS = {'name': 'Bench Sdn Bhd', 'industry': 'Manufacturing', 'size': 'small', 'employees': 25}
+RESPONSES = [
+    {'criterionId': 'energy-management', 'score': 75, 'evidence': 'Monthly utility bills', 'notes': 'Solar panels'},
+    {'criterionId': 'waste-management', 'score': 55, 'evidence': 'Recycling contract', 'notes': ''},
+    {'criterionId': 'labor-welfare', 'score': 80, 'evidence': 'Staff handbook', 'notes': 'Annual review'},
+    {'criterionId': 'governance-framework', 'score': 45, 'evidence': '', 'notes': 'Board charter drafted'},
+]
+EVENT = {'body': json.dumps({'business': BUSINESS, 'responses': RESPONSES, 'framework': 'NSRF'})}
+
+# Seconds per call, drawn from the fake's random generator; None keeps the fake's own log-normal model
+LATENCY_DISTRIBUTIONS = {
+    'fixed': lambda median, sigma: (lambda rng: median),
+    'lognormal': lambda median, sigma: None,
+    'exponential': lambda median, sigma: (lambda rng: rng.expovariate(0.6931 / median)),
+    # Mostly fast, with one call in twenty ten times slower
+    'bimodal': lambda median, sigma: (lambda rng: median * (10 if rng.random() < 0.05 else 1)),
+}
+
+
+def percentile(samples, pct):
+    ordered = sorted(samples)
+    return ordered[min(len(ordered) - 1, int(round(pct / 100 * (len(ordered) - 1))))]
+
+
+def make_client(args):
+    if args.record:
+        real = get_client('bedrock-runtime', lambda_esg_processor.AWS_REGION)
+        return RecordingBedrockRuntime(real, args.record)
+    options = dict(latency=args.latency, latency_sigma=args.sigma, error_rate=args.error_rate,
+                   throttle_rate=args.throttle_rate, seed=args.seed,
+                   latency_fn=LATENCY_DISTRIBUTIONS[args.latency_dist](args.latency, args.sigma))
+    if args.replay:
+        return ReplayBedrockRuntime(args.replay, **options)
+    return FakeBedrockRuntime(**options)
+
+
+def fresh_state(client):
+    """New processor, breakers and scheduler, so one workload's history does not leak into the next"""
+    lambda_esg_processor.bedrock_runtime = client
+    lambda_esg_processor._processor = None
+    resilience._resilience = None
+    scheduler._scheduler = None
+
+
+def single(client, args):
+    samples = []
+    for _ in range(args.requests):
+        start = time.perf_counter()
+        lambda_esg_processor.lambda_handler(EVENT, None)
+        samples.append(time.perf_counter() - start)
+    return samples, args.requests
+
+
+def concurrent(client, args):
+    samples = []
+    lock = threading.Lock()
+    per_thread = max(args.requests // args.threads, 1)
+
+    def worker():
+        for _ in range(per_thread):
+            start = time.perf_counter()
+            lambda_esg_processor.lambda_handler(EVENT, None)
+            with lock:
+                samples.append(time.perf_counter() - start)
+
+    threads = [threading.Thread(target=worker) for _ in range(args.threads)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    return samples, per_thread * args.threads
+
+
+def batch(client, args):
+    event = {'body': json.dumps({'assessments': [
+        {'id': f'sme-{i:03d}', 'business': BUSINESS, 'responses': RESPONSES, 'framework': 'NSRF'}
+        for i in range(args.batch)
+    ]})}
+    samples = []
+    for _ in range(max(args.requests // args.batch, 1)):
+        start = time.perf_counter()
+        lambda_esg_processor.lambda_handler(event, None)
+        samples.append(time.perf_counter() - start)
+    # Latency is per batch request; throughput and memory are per assessment
+    return samples, len(samples) * args.batch
+
+
+def run_async(client, args):
+    async def main():
+        bedrock = AsyncBedrockClient(client=client, max_concurrency=args.threads)
+        analyzer = ESGLLMAnalyzer(bedrock)
+        matcher = OpportunityMatcher(bedrock)
+        gate = asyncio.Semaphore(args.threads)
+        samples = []
+
+        async def one():
+            async with gate:
+                start = time.perf_counter()
+                analysis = await analyzer.analyze_esg_compliance(BUSINESS, 'NSRF', RESPONSES)
+                await matcher.find_opportunities(BUSINESS, analysis.overall_score)
+                samples.append(time.perf_counter() - start)
+
+        await asyncio.gather(*(one() for _ in range(args.requests)))
+        bedrock.close()
+        return samples, args.requests
+
+    return asyncio.run(main())
+
+
+WORKLOADS = {'single': single, 'concurrent': concurrent, 'batch': batch, 'async': run_async}
+
+
+def measure_memory(workload, args):
+    """Peak bytes allocated per request, from a short pass under tracemalloc"""
+    small = argparse.Namespace(**{**vars(args), 'requests': max(args.threads, args.batch), 'record': None})
+    fresh_state(make_client(small))
+    tracemalloc.start()
+    _, requests = workload(lambda_esg_processor.bedrock_runtime, small)
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return peak / requests
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument('--workloads', nargs='+', choices=list(WORKLOADS), default=list(WORKLOADS))
+    parser.add_argument('--requests', type=int, default=40)
+    parser.add_argument('--threads', type=int, default=8)
+    parser.add_argument('--batch', type=int, default=10)
+    parser.add_argument('--latency', type=float, default=0.1, help='median seconds per call')
+    parser.add_argument('--sigma', type=float, default=0.3, help='log-normal spread')
+    parser.add_argument('--latency-dist', choices=list(LATENCY_DISTRIBUTIONS), default='lognormal')
+    parser.add_argument('--error-rate', type=float, default=0.0, help='fraction of calls failing with a 5xx')
+    parser.add_argument('--throttle-rate', type=float, default=0.0, help='fraction of calls throttled')
+    parser.add_argument('--seed', type=int, default=7)
+    parser.add_argument('--record', help='call real Bedrock and append completions to this JSONL file')
+    parser.add_argument('--replay', help='serve completions recorded with --record')
+    args = parser.parse_args()
+
+    print(f"{'workload':>10} {'requests':>8} {'p50_ms':>8} {'p95_ms':>8} {'p99_ms':>8} {'req/s':>7} "
+          f"{'KiB/req':>8} {'calls':>6} {'errors':>6} {'throttled':>9}")
+    for name in args.workloads:
+        workload = WORKLOADS[name]
+        client = make_client(args)
+        fresh_state(client)
+        start = time.perf_counter()
+        samples, requests = workload(client, args)
+        elapsed = time.perf_counter() - start
+        memory = measure_memory(workload, args) if not args.record else float('nan')
+        print(f"{name:>10} {requests:>8} {percentile(samples, 50) * 1000:>8.1f} "
+              f"{percentile(samples, 95) * 1000:>8.1f} {percentile(samples, 99) * 1000:>8.1f} "
+              f"{requests / elapsed:>7.1f} {memory / 1024:>8.1f} {getattr(client, 'calls', 0):>6} "
+              f"{getattr(client, 'errors', 0):>6} {getattr(client, 'throttled', 0):>9}")
+        if getattr(client, 'misses', 0):
+            print(f"{'':>10} {client.misses} requests were not in the recording and got the canned completion")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,114 @@
+"""
+Portfolio analytics: per-company rubric scoring vs. the chunked columnar pipeline.
+
+Writes a synthetic book of --companies SME assessments (wide CSV and JSONL)
+and aggregates it three ways: one CompiledRubric.score_many call per company, as
+looping over the handler's deterministic path would, then portfolio.summarize
+in this process and with --workers processes. Reports records per second and
+peak memory traced in this process, and checks the aggregates agree.
+
+    python benchmarks/bench_portfolio.py --companies 100000 --workers 4
+"""
+
+import argparse
+import csv
+import json
+import os
+import random
+import sys
+import tempfile
+import time
+import tracemalloc
+
+import numpy as np
+
+os.environ.setdefault('ESG_METRICS_ENABLED', 'false')
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from portfolio import PortfolioSummary, read_records, summarize  # noqa: E402
+from scoring_engine import COMPLIANCE_LEVELS, get_rubric  # noqa: E402
+
+INDUSTRIES = ['Manufacturing', 'Food & Beverage', 'Retail', 'Logistics', 'Construction', 'Agriculture',
+              'Hospitality', 'Technology']
+SIZES = ['micro', 'small', 'medium']
+
+
+def write_book(directory, count, rng):
+    criteria = get_rubric('NSRF').criteria
+    csv_path = os.path.join(directory, 'book.csv')
+    jsonl_path = os.path.join(directory, 'book.jsonl')
+    with open(csv_path, 'w', newline='', encoding='utf-8') as csv_file, \
+            open(jsonl_path, 'w', encoding='utf-8') as jsonl_file:
+        writer = csv.writer(csv_file)
+        writer.writerow(['id', 'industry', 'size'] + criteria)
+        for i in range(count):
+            scores = {c: rng.randint(0, 100) for c in criteria if rng.random() < 0.8}
+            industry, size = rng.choice(INDUSTRIES), rng.choice(SIZES)
+            writer.writerow([f'sme-{i:06d}', industry, size] + [scores.get(c, '') for c in criteria])
+            jsonl_file.write(json.dumps({'id': f'sme-{i:06d}', 'business': {'industry': industry, 'size': size},
+                                         'framework': 'NSRF', 'responses': [
+                                             {'criterionId': c, 'score': s} for c, s in scores.items()]}) + '\n')
+    return csv_path, jsonl_path
+
+
+def per_company(path):
+    """The baseline: every record scored on its own, then aggregated"""
+    rubric = get_rubric('NSRF')
+    summary = PortfolioSummary()
+    with open(path, encoding='utf-8') as handle:
+        for line in handle:
+            record = json.loads(line)
+            summary.records += 1
+            if not rubric.coverage(record['responses']):
+                summary.unscored += 1
+                continue
+            scores = rubric.score_many([record['responses']])
+            key = ('nsrf', record['business']['industry'].lower(), record['business']['size'])
+            summary.add_scores([key], np.column_stack([scores.pillar_scores, scores.overall_scores]),
+                               np.array([COMPLIANCE_LEVELS.index(scores.compliance_levels[0])]))
+    return summary
+
+
+def measure(fn):
+    """Seconds for one run, then peak traced memory of a second run (tracemalloc distorts timing)"""
+    start = time.perf_counter()
+    summary = fn()
+    elapsed = time.perf_counter() - start
+    tracemalloc.start()
+    fn()
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    return elapsed, peak, summary
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument('--companies', type=int, default=100000)
+    parser.add_argument('--workers', type=int, default=4)
+    parser.add_argument('--chunk-size', type=int, default=5000)
+    parser.add_argument('--seed', type=int, default=7)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as directory:
+        csv_path, jsonl_path = write_book(directory, args.companies, random.Random(args.seed))
+        runs = [
+            ('per-company score (JSONL)', lambda: per_company(jsonl_path)),
+            ('pipeline, 1 process (JSONL)', lambda: summarize(read_records(jsonl_path, args.chunk_size), workers=1)),
+            ('pipeline, 1 process (CSV)', lambda: summarize(read_records(csv_path, args.chunk_size), workers=1)),
+            (f'pipeline, {args.workers} processes (CSV)',
+             lambda: summarize(read_records(csv_path, args.chunk_size), workers=args.workers)),
+        ]
+        print(f"{args.companies} companies, chunks of {args.chunk_size}")
+        print(f"{'path':<32} {'seconds':>8} {'records/s':>10} {'peak MB':>8}")
+        results = []
+        for name, fn in runs:
+            elapsed, peak, summary = measure(fn)
+            results.append(summary.to_dict())
+            print(f"{name:<32} {elapsed:>8.2f} {args.companies / elapsed:>10.0f} {peak / 1e6:>8.1f}")
+
+    same = all(result['segments'] == results[0]['segments'] for result in results[1:])
+    print(f"aggregates agree: {'yes' if same else 'no'}; {len(results[0]['segments'])} segments")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,134 @@
+"""
+Prompt size and latency: token-budgeted prompts vs. the original prompt builders.
+
+Builds synthetic assessments of increasing size (with evidence repeated across
+criteria, as in real uploads) and compares, for the ESGLLMAnalyzer analysis
+prompt, input tokens, criteria covered and simulated end-to-end latency. The
+fake backend charges prompt-processing time per input token, so longer prompts
+answer more slowly. Also reports how many criteria the original Lambda scoring
+and recommendation prompts covered.
+
+    python benchmarks/bench_prompt_budget.py --sizes 20 100 400 --budget 4000
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import random
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from bedrock_client import AsyncBedrockClient  # noqa: E402
+from fake_bedrock import FakeBedrockRuntime  # noqa: E402
+from llm_service import ESGLLMAnalyzer  # noqa: E402
+
+COMPANY = {'name': 'Kilang Maju Sdn Bhd', 'industry': 'Manufacturing', 'size': 'small',
+           'employees': 45, 'revenue': '8,000,000', 'location': 'Penang'}
+
+COMPLETION = json.dumps({
+    "overall_score": 66.0,
+    "category_scores": {"Environmental": 62.0, "Social": 70.0, "Governance": 65.0},
+    "compliance_level": "Progressing",
+    "recommendations": ["Track energy use monthly", "Formalise a safety committee"],
+    "compliance_gaps": ["No emissions baseline"],
+    "action_items": [{"task": "Install sub-meters", "priority": "High", "timeline": "3 months",
+                      "framework_reference": "NSRF E1"}]
+})
+
+EVIDENCE = [
+    "Policy document uploaded and approved by the board; reviewed annually by the sustainability committee.",
+    "Monthly utility bills for the past 24 months with consumption tracked in a shared spreadsheet.",
+    "Staff handbook section on grievance procedures, anti-harassment and whistleblowing channels.",
+    "ISO 14001 certificate issued by SIRIM QAS International, valid until 2026.",
+]
+
+
+def synthetic_responses(count, rng):
+    responses = []
+    for i in range(count):
+        responses.append({
+            'criterionId': f"{rng.choice(['env', 'soc', 'gov'])}-{i:04d}",
+            'score': rng.randint(20, 95),
+            # Most evidence is one of a few shared documents, some is specific
+            'evidence': rng.choice(EVIDENCE) if rng.random() < 0.7 else
+            f"Site visit notes for criterion {i}: " + ' '.join(rng.choice(EVIDENCE).split()[:12]),
+            'notes': rng.choice(['N/A', 'Partially implemented', 'Planned for next financial year', ''])
+        })
+    return responses
+
+
+def legacy_analysis_prompt(company_data, framework, responses):
+    """The original builder: every response as an indented block"""
+    prompt = f"""
+        You are an expert ESG compliance analyst specializing in Malaysian sustainability frameworks.
+
+        Company Profile:
+        - Name: {company_data.get('name')}
+        - Industry: {company_data.get('industry')}
+        - Size: {company_data.get('size')} ({company_data.get('employees')} employees)
+        - Revenue: RM {company_data.get('revenue')}
+        - Location: {company_data.get('location')}
+
+        Framework: {framework}
+
+        Assessment Responses:
+        """
+    for response in responses:
+        prompt += f"""
+        Criterion: {response.get('criterionId')}
+        Score: {response.get('score')}/100
+        Evidence: {response.get('evidence')}
+        Notes: {response.get('notes', 'N/A')}
+        ---
+        """
+    return prompt + "\n        Please analyze this ESG assessment and provide scores, gaps and next steps as JSON.\n        "
+
+
+def run_legacy(fake, responses):
+    body = json.dumps({"anthropic_version": "bedrock-2023-05-31", "max_tokens": 4000, "messages": [
+        {"role": "user", "content": legacy_analysis_prompt(COMPANY, 'NSRF', responses)}]})
+    start = time.perf_counter()
+    fake.invoke_model(modelId='model', body=body)
+    return time.perf_counter() - start
+
+
+async def run_budgeted(fake, responses, budget):
+    client = AsyncBedrockClient(client=fake, max_concurrency=8)
+    analyzer = ESGLLMAnalyzer(bedrock=client, prompt_budget=budget)
+    start = time.perf_counter()
+    await analyzer.analyze_esg_compliance(COMPANY, 'NSRF', responses)
+    elapsed = time.perf_counter() - start
+    client.close()
+    return elapsed
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument('--sizes', type=int, nargs='+', default=[20, 100, 400])
+    parser.add_argument('--budget', type=int, default=4000)
+    parser.add_argument('--latency', type=float, default=0.3, help='fixed seconds per call')
+    parser.add_argument('--prefill', type=float, default=0.15, help='seconds per 1k input tokens')
+    args = parser.parse_args()
+
+    rng = random.Random(11)
+    print(f"{'responses':>9} | {'legacy tokens':>13} {'calls':>5} {'latency':>8} | "
+          f"{'budgeted tokens':>15} {'calls':>5} {'latency':>8} | scoring/recs prompts covered (legacy)")
+    for size in args.sizes:
+        responses = synthetic_responses(size, rng)
+
+        legacy = FakeBedrockRuntime(latency=args.latency, completion=COMPLETION, input_latency_per_1k=args.prefill)
+        legacy_s = run_legacy(legacy, responses)
+
+        budgeted = FakeBedrockRuntime(latency=args.latency, completion=COMPLETION, input_latency_per_1k=args.prefill)
+        budgeted_s = asyncio.run(run_budgeted(budgeted, responses, args.budget))
+
+        print(f"{size:9} | {legacy.input_tokens:13} {legacy.calls:5} {legacy_s * 1000:6.0f}ms | "
+              f"{budgeted.input_tokens:15} {budgeted.calls:5} {budgeted_s * 1000:6.0f}ms | "
+              f"{min(size, 5)}/{size} and {min(size, 3)}/{size}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,173 @@
+"""
+Prompt templates and Bedrock prompt caching vs. per-request f-string prompts.
+
+Times building the combined prompt with the original f-string + compact_prompt
+builder against rendering the precompiled template, and lists the cacheable
+prefix of each template with the shared guidance block in front. Then runs
+ESGProcessor.analyze_esg_assessment in both pipeline modes against a fake
+Bedrock backend that only caches prefixes over the 1024-token minimum: with
+BEDROCK_PROMPT_CACHING off, with the guidance sent but never cached (what a
+model without prompt caching would see), and with caching on. Reports latency,
+time to first streamed token and input tokens billed as Bedrock bills them
+(cache writes at 1.25x, cache reads at 0.1x).
+
+    python benchmarks/bench_prompt_cache.py --runs 20
+"""
+
+import argparse
+import json
+import os
+import random
+import statistics
+import sys
+import time
+
+os.environ.setdefault('BEDROCK_CACHE_TTL', '0')
+os.environ.setdefault('ESG_METRICS_ENABLED', 'false')
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, BACKEND_DIR)
+sys.path.insert(0, os.path.join(BACKEND_DIR, '..', '..', 'unused'))
+
+import lambda_esg_processor  # noqa: E402
+import prompt_templates  # noqa: E402
+from bench_combined import COMBINED_TEXT, multi_call_completion, synthetic_responses  # noqa: E402
+from fake_bedrock import FakeBedrockRuntime  # noqa: E402
+from lambda_esg_processor import ESGProcessor  # noqa: E402
+from prompt_budget import compact_prompt, estimate_tokens, fit_responses  # noqa: E402
+from prompt_guidance import get_guidance  # noqa: E402
+from prompt_templates import request_body  # noqa: E402
+
+BUSINESS = {'name': 'Kilang Maju Sdn Bhd', 'industry': 'Manufacturing', 'size': 'small', 'employees': 45}
+
+# Smallest cacheable prefix on Claude 3.5/3.7 Sonnet; shorter prefixes are processed but not cached
+SONNET_MIN_CACHE_TOKENS = 1024
+
+
+def legacy_combined_prompt(business_data, responses_table, framework, peer_context=''):
+    """The combined builder as it was: data first, the whole prompt compacted on every call"""
+    return compact_prompt(f"""
+        Analyze this Malaysian SME's ESG assessment.
+
+        Company: {business_data.get('name', 'Unknown')}
+        Industry: {business_data.get('industry', 'Unknown')}
+        Size: {business_data.get('size', 'Unknown')} ({business_data.get('employees', 'Unknown')} employees)
+        Framework: {framework}
+        {peer_context}
+
+        Assessment Responses:
+        {responses_table}
+
+        Return a single JSON object and nothing else, with these keys in this order:
+        {{
+            "environmental_score": 0-100,
+            "social_score": 0-100,
+            "governance_score": 0-100,
+            "overall_score": 0-100,
+            "compliance_level": "Excellent|Good|Needs Improvement|Poor",
+            "recommendations": [{{
+                "id": "rec_001",
+                "type": "improvement",
+                "title": "Short recommendation title",
+                "description": "Detailed recommendation description",
+                "priority": "high|medium|low",
+                "estimatedImpact": "Expected impact with specific metrics",
+                "timeframe": "Implementation timeframe (e.g., 3-6 months)",
+                "requiredActions": ["Specific action 1", "Specific action 2"],
+                "relatedCriteria": ["Criterion id"],
+                "resources": [{{"title": "Resource name", "type": "document", "description": "Resource description"}}]
+            }}],
+            "compliance_gaps": ["Specific gap tied to a criterion"]
+        }}
+
+        Give 3-5 recommendations that target the weakest criteria. Consider Malaysian
+        ESG standards and SME context.
+        """)
+
+
+def build_cost(table, iterations):
+    start = time.perf_counter()
+    for _ in range(iterations):
+        legacy_combined_prompt(BUSINESS, table, 'NSRF')
+    legacy_us = (time.perf_counter() - start) / iterations * 1e6
+    fields = dict(name=BUSINESS['name'], industry=BUSINESS['industry'], size=BUSINESS['size'],
+                  employees=BUSINESS['employees'], framework='NSRF', peer_context='', responses=table)
+    start = time.perf_counter()
+    for _ in range(iterations):
+        lambda_esg_processor.COMBINED_PROMPT.render(**fields)
+    template_us = (time.perf_counter() - start) / iterations * 1e6
+    print(f"combined prompt build: f-string + compact_prompt {legacy_us:.1f} us, template {template_us:.1f} us")
+
+
+def prefix_sizes():
+    guidance = estimate_tokens(get_guidance())
+    print(f"cacheable prefix per template (shared guidance block: {guidance} tokens):")
+    for name in ('SCORING_PROMPT', 'RECOMMENDATIONS_PROMPT', 'FALLBACK_RECOMMENDATIONS_PROMPT', 'COMBINED_PROMPT'):
+        prefix = estimate_tokens(getattr(lambda_esg_processor, name).prefix)
+        note = '' if guidance + prefix >= SONNET_MIN_CACHE_TOKENS else f' (under the {SONNET_MIN_CACHE_TOKENS} minimum)'
+        print(f"  {name:32} {prefix:5} tokens alone, {guidance + prefix:5} with the guidance{note}")
+
+
+def billed(fake):
+    """Input tokens weighted by Bedrock's cache pricing"""
+    uncached = fake.input_tokens - fake.cache_write_tokens - fake.cache_read_tokens
+    return uncached + 1.25 * fake.cache_write_tokens + 0.1 * fake.cache_read_tokens
+
+
+def first_token(fake, prompt):
+    """Seconds to the first streamed text delta for one rendered prompt"""
+    body = json.dumps(request_body(prompt, 4000))
+    start = time.perf_counter()
+    for event in fake.invoke_model_with_response_stream(modelId='model', body=body)['body']:
+        if json.loads(event['chunk']['bytes']).get('type') == 'content_block_delta':
+            return time.perf_counter() - start
+    return time.perf_counter() - start
+
+
+def measure(name, processor, fake, assessments):
+    lambda_esg_processor.bedrock_runtime = fake
+    timings = []
+    for responses in assessments:
+        start = time.perf_counter()
+        result = processor.analyze_esg_assessment(BUSINESS, responses, 'NSRF')
+        timings.append(time.perf_counter() - start)
+    assert result['recommendations'] and result['scores']
+    runs = len(assessments)
+    table = fit_responses(assessments[0], processor.prompt_budget)
+    ttft = first_token(fake, processor._build_combined_prompt(BUSINESS, table, 'NSRF'))
+    print(f"{name:22} p50 {statistics.median(timings) * 1000:6.0f} ms  first token {ttft * 1000:5.0f} ms  "
+          f"input tokens {fake.input_tokens / runs:6.0f}  cache read {fake.cache_read_tokens / runs:5.0f}  "
+          f"billed {billed(fake) / runs:6.0f}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument('--runs', type=int, default=20)
+    parser.add_argument('--responses', type=int, default=20)
+    parser.add_argument('--iterations', type=int, default=5000, help='prompt builds to time')
+    parser.add_argument('--latency', type=float, default=0.2, help='fixed seconds per call')
+    parser.add_argument('--prefill', type=float, default=0.4, help='seconds per 1k uncached input tokens')
+    parser.add_argument('--decode', type=float, default=2.0, help='seconds per 1k output tokens')
+    parser.add_argument('--min-cache-tokens', type=int, default=SONNET_MIN_CACHE_TOKENS,
+                        help='smallest prefix the fake caches')
+    args = parser.parse_args()
+
+    rng = random.Random(5)
+    assessments = [synthetic_responses(args.responses, rng) for _ in range(args.runs)]
+    build_cost(fit_responses(assessments[0], ESGProcessor().prompt_budget), args.iterations)
+    prefix_sizes()
+
+    timing = dict(latency=args.latency, input_latency_per_1k=args.prefill, output_latency_per_1k=args.decode)
+    never = sys.maxsize
+    for label, caching, min_tokens in (('off', False, never), ('uncached', True, never),
+                                       ('cached', True, args.min_cache_tokens)):
+        prompt_templates.BEDROCK_PROMPT_CACHING = caching
+        measure(f'multi-call, {label}', ESGProcessor(combined_analysis=False),
+                FakeBedrockRuntime(completion=multi_call_completion, prompt_cache_min_tokens=min_tokens, **timing),
+                assessments)
+        measure(f'combined, {label}', ESGProcessor(combined_analysis=True),
+                FakeBedrockRuntime(completion=COMBINED_TEXT, prompt_cache_min_tokens=min_tokens, **timing),
+                assessments)
+
+
+if __name__ == '__main__':
+    main()
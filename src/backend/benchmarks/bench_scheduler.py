@@ -0,0 +1,91 @@
+"""
+Load test of the Bedrock scheduler against a throttling fake backend.
+
+Many interactive and bulk callers hit one model whose quota is --quota
+requests/second. Compares sending unpaced with no retries, unpaced with
+jittered retries only, and the scheduler (token-bucket pacing at the quota,
+priority lanes and retries). Reports goodput (successful calls/second),
+throttling errors, failures and per-lane latency percentiles.
+
+    python benchmarks/bench_scheduler.py --quota 20 --interactive 8 --bulk 24 --duration 10
+"""
+
+import argparse
+import os
+import statistics
+import sys
+import threading
+import time
+
+os.environ.setdefault('BEDROCK_CACHE_TTL', '0')
+os.environ.setdefault('ESG_METRICS_ENABLED', 'false')
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import resilience  # noqa: E402
+import scheduler  # noqa: E402
+from bedrock_client import invoke_model  # noqa: E402
+from fake_bedrock import FakeBedrockRuntime  # noqa: E402
+from scheduler import PRIORITY_BULK, PRIORITY_INTERACTIVE, BedrockScheduler, priority_scope  # noqa: E402
+
+MODEL_ID = 'anthropic.claude-3-sonnet-20240229-v1:0'
+BODY = {"anthropic_version": "bedrock-2023-05-31", "max_tokens": 300,
+        "messages": [{"role": "user", "content": "Score this ESG assessment."}]}
+
+
+def caller(fake, priority, stop_at, results, think):
+    with priority_scope(priority):
+        while time.monotonic() < stop_at:
+            start = time.monotonic()
+            try:
+                invoke_model(fake, MODEL_ID, BODY)
+                results.append((priority, True, time.monotonic() - start))
+            except Exception:
+                results.append((priority, False, time.monotonic() - start))
+            time.sleep(think)
+
+
+def run(name, sched, args):
+    scheduler._scheduler = sched
+    resilience._resilience = resilience.BedrockResilience()
+    fake = FakeBedrockRuntime(latency=args.latency, latency_sigma=0.3, throttle_rps=args.quota)
+    results = []
+    stop_at = time.monotonic() + args.duration
+    threads = [threading.Thread(target=caller, args=(fake, PRIORITY_INTERACTIVE, stop_at, results, args.think))
+               for _ in range(args.interactive)]
+    threads += [threading.Thread(target=caller, args=(fake, PRIORITY_BULK, stop_at, results, 0))
+                for _ in range(args.bulk)]
+    started = time.monotonic()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    elapsed = time.monotonic() - started
+
+    ok = sum(1 for _, success, _ in results if success)
+    line = (f"{name:10} goodput {ok / elapsed:6.1f}/s  ok {ok:5}  failed {len(results) - ok:5}  "
+            f"throttled {fake.throttled:5}")
+    for lane, label in ((PRIORITY_INTERACTIVE, 'interactive'), (PRIORITY_BULK, 'bulk')):
+        timings = sorted(t for priority, success, t in results if priority == lane and success)
+        if timings:
+            line += (f"  {label} p50 {statistics.median(timings) * 1000:5.0f}ms "
+                     f"p95 {timings[int(0.95 * (len(timings) - 1))] * 1000:5.0f}ms")
+    print(line)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument('--quota', type=float, default=20, help='requests/second the fake accepts')
+    parser.add_argument('--interactive', type=int, default=8)
+    parser.add_argument('--bulk', type=int, default=24)
+    parser.add_argument('--duration', type=float, default=10)
+    parser.add_argument('--latency', type=float, default=0.2, help='median seconds per call')
+    parser.add_argument('--think', type=float, default=0.5, help='seconds between interactive requests')
+    args = parser.parse_args()
+
+    run('no-retry', BedrockScheduler(requests_per_second=0, tokens_per_minute=0, limits={}, retries=0), args)
+    run('retry', BedrockScheduler(requests_per_second=0, tokens_per_minute=0, limits={}), args)
+    run('scheduled', BedrockScheduler(requests_per_second=args.quota, tokens_per_minute=0, limits={}), args)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,110 @@
+"""
+Response serialization: asdict + json.dumps vs. slotted records + serialization.dumps.
+
+Builds batch responses of --assessments results (scores, five recommendations,
+three grant matches each), serializes them both ways and compresses the body
+with gzip and, if installed, brotli. Reports body bytes and CPU time per
+response, and memory per result record.
+
+    python benchmarks/bench_serialization.py --assessments 50 --runs 50
+"""
+
+import argparse
+import base64
+import json
+import os
+import sys
+import time
+import tracemalloc
+from dataclasses import asdict, make_dataclass
+
+os.environ.setdefault('ESG_METRICS_ENABLED', 'false')
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, BACKEND_DIR)
+sys.path.insert(0, os.path.join(BACKEND_DIR, '..', '..', 'unused'))
+
+from lambda_esg_processor import ESGRecommendation, ESGScoring, GrantOpportunity  # noqa: E402
+from serialization import _brotli, compress, dumps, record_dict  # noqa: E402
+
+
+def recommendation(cls, i):
+    return cls(id=f'rec_{i:03d}', type='improvement', title='Implement energy monitoring',
+               description='Install sub-metering on the main loads and review consumption monthly against a baseline',
+               priority='high', estimatedImpact='10-15% lower energy costs within a year', timeframe='3-6 months',
+               requiredActions=['Assign an owner', 'Measure the baseline', 'Set targets', 'Review quarterly'],
+               relatedCriteria=['energy-management'],
+               resources=[{'title': 'SME Corp ESG guide', 'type': 'document', 'description': 'Practical checklist'}])
+
+
+def grant(cls, i):
+    return cls(name=f'Green Technology Financing Scheme {i}', provider='Malaysia Green Technology Corporation',
+               amount='Up to RM 50 million', eligibility_match_score=0.8,
+               description='Funding for green technology adoption and sustainable practices',
+               deadline='2026-12-31', requirements=['Green tech project', '60% local content'])
+
+
+def results(count, to_dict, scoring=ESGScoring, recommendation_cls=ESGRecommendation, grant_cls=GrantOpportunity):
+    return {'success': True, 'message': 'Processed', 'data': {'results': [{
+        'index': i, 'id': f'sme-{i:04d}', 'success': True, 'data': {
+            'scores': to_dict(scoring(62.5, 70.0, 58.0, 64.1, 'progressing')),
+            'recommendations': [to_dict(recommendation(recommendation_cls, r)) for r in range(5)],
+            'opportunities': [to_dict(grant(grant_cls, g)) for g in range(3)],
+            'analysis_timestamp': '2026-01-01T00:00:00Z',
+            'compliance_gaps': ['No energy baseline', 'Board lacks an independent member']
+        }} for i in range(count)]}}
+
+
+def cpu_ms(fn, runs):
+    start = time.process_time()
+    for _ in range(runs):
+        value = fn()
+    return (time.process_time() - start) / runs * 1000, value
+
+
+def record_bytes(cls, factory, count=2000):
+    tracemalloc.start()
+    before = tracemalloc.get_traced_memory()[0]
+    kept = [factory(cls, i) for i in range(count)]
+    used = tracemalloc.get_traced_memory()[0] - before
+    tracemalloc.stop()
+    del kept
+    return used / count
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument('--assessments', type=int, default=50)
+    parser.add_argument('--runs', type=int, default=50)
+    args = parser.parse_args()
+
+    # The records as they were before slotting, for comparison
+    plain = {cls: make_dataclass(cls.__name__, [(name, object) for name in cls.__slots__])
+             for cls in (ESGScoring, ESGRecommendation, GrantOpportunity)}
+
+    old_ms, old_body = cpu_ms(lambda: json.dumps(results(
+        args.assessments, asdict, plain[ESGScoring], plain[ESGRecommendation], plain[GrantOpportunity])), args.runs)
+    new_ms, new_body = cpu_ms(lambda: dumps(results(args.assessments, record_dict)), args.runs)
+    direct_ms, _ = cpu_ms(lambda: dumps(results(args.assessments, lambda record: record)), args.runs)
+
+    print(f"{args.assessments} results per response, CPU time includes building the results")
+    print(f"{'serializer':<34} {'bytes':>9} {'cpu ms':>8}")
+    print(f"{'asdict + json.dumps':<34} {len(old_body.encode()):>9} {old_ms:>8.2f}")
+    print(f"{'record_dict + dumps':<34} {len(new_body.encode()):>9} {new_ms:>8.2f}")
+    print(f"{'records passed to dumps':<34} {'':>9} {direct_ms:>8.2f}")
+
+    data = new_body.encode('utf-8')
+    encodings = ['gzip'] + (['br'] if _brotli() else [])
+    for encoding in encodings:
+        ms, compressed = cpu_ms(lambda: compress(data, encoding), args.runs)
+        encoded = len(base64.b64encode(compressed))
+        print(f"{encoding + ' (base64 body)':<34} {encoded:>9} {ms:>8.2f}")
+    if not _brotli():
+        print("(brotli not installed; br skipped)")
+
+    print(f"\n{'record':<20} {'dict-backed B':>14} {'slotted B':>10}")
+    for cls, factory in ((ESGRecommendation, recommendation), (GrantOpportunity, grant)):
+        print(f"{cls.__name__:<20} {record_bytes(plain[cls], factory):>14.0f} {record_bytes(cls, factory):>10.0f}")
+
+
+if __name__ == '__main__':
+    main()
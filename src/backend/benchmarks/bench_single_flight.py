@@ -0,0 +1,96 @@
+"""
+Single-flight analyses: concurrent identical requests joined vs. each run on its own.
+
+Sends --requests analyses from --clients threads against a fake Bedrock backend,
+with each request a copy of one of --distinct assessments (keys reordered, as a
+retrying client or a repeated batch item would send them), with ESGProcessor's
+single-flight layer off and on. Reports wall time, per-request p50/p95 latency,
+Bedrock calls and duplicates collapsed, then a run where waiters time out
+before the shared analysis finishes.
+
+    python benchmarks/bench_single_flight.py --requests 64 --clients 16 --distinct 4
+"""
+
+import argparse
+import logging
+import os
+import random
+import statistics
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+os.environ.setdefault('BEDROCK_CACHE_TTL', '0')
+os.environ.setdefault('ESG_METRICS_ENABLED', 'false')
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, BACKEND_DIR)
+sys.path.insert(0, os.path.join(BACKEND_DIR, '..', '..', 'unused'))
+
+import lambda_esg_processor  # noqa: E402
+from bench_combined import multi_call_completion, synthetic_responses  # noqa: E402
+from fake_bedrock import FakeBedrockRuntime  # noqa: E402
+from lambda_esg_processor import ESGProcessor  # noqa: E402
+from single_flight import SingleFlight  # noqa: E402
+
+INDUSTRIES = ['Manufacturing', 'Retail', 'Logistics', 'Hospitality']
+
+
+def request(index, distinct, rng):
+    """A copy of assessment ``index % distinct``, with the business keys in a random order"""
+    company = index % distinct
+    fields = [('name', f'SME {company}'), ('industry', INDUSTRIES[company % len(INDUSTRIES)]),
+              ('size', 'small'), ('employees', 20 + company)]
+    rng.shuffle(fields)
+    return dict(fields), synthetic_responses(20, random.Random(company)), 'NSRF'
+
+
+def run(processor, fake, requests, clients):
+    lambda_esg_processor.bedrock_runtime = fake
+
+    def one(args):
+        start = time.perf_counter()
+        result = processor.analyze_esg_assessment(*args)
+        return time.perf_counter() - start, result
+
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=clients) as pool:
+        outcomes = list(pool.map(one, requests))
+    wall = time.perf_counter() - start
+    assert all(result['scores'] for _, result in outcomes)
+    return wall, sorted(elapsed for elapsed, _ in outcomes)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument('--requests', type=int, default=64)
+    parser.add_argument('--clients', type=int, default=16)
+    parser.add_argument('--distinct', type=int, default=4)
+    parser.add_argument('--latency', type=float, default=0.3, help='fixed seconds per call')
+    args = parser.parse_args()
+
+    rng = random.Random(3)
+    requests = [request(i, args.distinct, rng) for i in range(args.requests)]
+    print(f"{args.requests} requests, {args.distinct} distinct assessments, {args.clients} concurrent clients")
+    print(f"{'mode':<22} {'wall s':>7} {'p50 ms':>7} {'p95 ms':>7} {'Bedrock calls':>14} {'collapsed':>10}")
+    for name, single_flight in (('independent', None), ('single-flight', SingleFlight())):
+        fake = FakeBedrockRuntime(completion=multi_call_completion, latency=args.latency)
+        processor = ESGProcessor()
+        # None runs every request on its own
+        processor.single_flight = single_flight
+        wall, timings = run(processor, fake, requests, args.clients)
+        collapsed = single_flight.stats()['collapsed'] if single_flight else 0
+        print(f"{name:<22} {wall:7.2f} {statistics.median(timings) * 1000:7.0f} "
+              f"{timings[int(0.95 * (len(timings) - 1))] * 1000:7.0f} {fake.calls:14} {collapsed:10}")
+
+    # Waiters give up after half a call's latency; the shared analysis still completes for its caller
+    lambda_esg_processor.logger.setLevel(logging.ERROR)
+    single_flight = SingleFlight(timeout=args.latency / 2)
+    fake = FakeBedrockRuntime(completion=multi_call_completion, latency=args.latency)
+    wall, timings = run(ESGProcessor(single_flight=single_flight), fake, requests, args.clients)
+    stats = single_flight.stats()
+    print(f"waiter timeout {args.latency / 2:.2f}s: {stats['timeouts']} of {stats['collapsed']} waiters "
+          f"got the fallback analysis, p50 {statistics.median(timings) * 1000:.0f} ms, {fake.calls} Bedrock calls")
+
+
+if __name__ == '__main__':
+    main()
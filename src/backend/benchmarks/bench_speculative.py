@@ -0,0 +1,69 @@
+"""
+Handler latency of the ESG pipeline: sequential vs. speculative recommendations.
+
+Sequential mode waits for the scoring call before asking for recommendations.
+Speculative mode drafts recommendations from provisional scores while scoring
+is still in flight, saving one Bedrock round-trip.
+
+    python benchmarks/bench_speculative.py --requests 50 --latency 0.1
+"""
+
+import argparse
+import json
+import os
+import statistics
+import sys
+import time
+
+# Measure the pipeline itself, not the response cache
+os.environ.setdefault('BEDROCK_CACHE_TTL', '0')
+os.environ.setdefault('ESG_METRICS_ENABLED', 'false')
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, BACKEND_DIR)
+sys.path.insert(0, os.path.join(BACKEND_DIR, '..', '..', 'unused'))
+
+import lambda_esg_processor  # noqa: E402
+from fake_bedrock import FakeBedrockRuntime  # noqa: E402
+
+EVENT = {'body': json.dumps({
+    'business': {'name': 'Bench Sdn Bhd', 'industry': 'Manufacturing', 'size': 'small', 'employees': 25},
+    'responses': [{'criterionId': 'energy-management', 'score': 75, 'notes': 'Solar panels'}],
+    'framework': 'NSRF'
+})}
+
+MODES = {
+    'sequential': {'speculative_recommendations': False},
+    'speculative': {'speculative_recommendations': True},
+}
+
+
+def percentile(samples, pct):
+    ordered = sorted(samples)
+    return ordered[min(len(ordered) - 1, int(round(pct / 100 * (len(ordered) - 1))))]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument('--requests', type=int, default=50)
+    parser.add_argument('--latency', type=float, default=0.1)
+    parser.add_argument('--sigma', type=float, default=0.3)
+    args = parser.parse_args()
+
+    lambda_esg_processor.bedrock_runtime = FakeBedrockRuntime(args.latency, latency_sigma=args.sigma)
+
+    print(f"{'mode':>12} {'p50_ms':>8} {'p99_ms':>8} {'mean_ms':>8}")
+    for mode, options in MODES.items():
+        # The handler reuses one processor per container; swap in one configured for this mode
+        lambda_esg_processor._processor = lambda_esg_processor.ESGProcessor(**options)
+        samples = []
+        for _ in range(args.requests):
+            start = time.perf_counter()
+            lambda_esg_processor.lambda_handler(EVENT, None)
+            samples.append((time.perf_counter() - start) * 1000)
+        print(f"{mode:>12} {percentile(samples, 50):>8.1f} {percentile(samples, 99):>8.1f} "
+              f"{statistics.mean(samples):>8.1f}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,100 @@
+"""
+Time to first recommendation: buffered vs. streamed Bedrock responses.
+
+The fake backend emits the completion in small chunks spread evenly over the
+configured generation time, so the buffered path waits for all of it while
+the streamed path can hand over the first recommendation once its object closes.
+
+    python benchmarks/bench_streaming.py --latency 2.0
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import sys
+import time
+
+os.environ.setdefault('BEDROCK_CACHE_TTL', '0')
+os.environ.setdefault('ESG_METRICS_ENABLED', 'false')
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, BACKEND_DIR)
+sys.path.insert(0, os.path.join(BACKEND_DIR, '..', '..', 'unused'))
+
+import lambda_esg_processor  # noqa: E402
+from bedrock_client import AsyncBedrockClient  # noqa: E402
+from fake_bedrock import FakeBedrockRuntime  # noqa: E402
+from llm_service import ESGLLMAnalyzer  # noqa: E402
+
+BUSINESS = {'name': 'Bench Sdn Bhd', 'industry': 'Manufacturing', 'size': 'small', 'employees': 25}
+RESPONSES = [{'criterionId': 'energy-management', 'score': 75, 'notes': 'Solar panels'}]
+
+RECOMMENDATIONS = json.dumps([{
+    'id': f'rec_{i:03d}',
+    'type': 'improvement',
+    'title': f'Recommendation {i}',
+    'description': 'Detailed recommendation description ' * 8,
+    'priority': 'medium',
+    'estimatedImpact': '10-15% reduction in energy costs',
+    'timeframe': '3-6 months',
+    'requiredActions': ['Action one', 'Action two', 'Action three'],
+    'relatedCriteria': ['energy-management'],
+    'resources': []
+} for i in range(1, 6)])
+
+ANALYSIS = json.dumps({
+    'overall_score': 72.5,
+    'category_scores': {'Environmental': 68.0, 'Social': 75.0, 'Governance': 78.0},
+    'compliance_level': 'Progressing',
+    'recommendations': [f'Recommendation {i}: ' + 'implement and document the practice ' * 6 for i in range(1, 6)],
+    'compliance_gaps': ['Missing environmental impact measurement'] * 3,
+    'action_items': [{'task': 'Install smart meters', 'priority': 'High', 'timeline': '3 months'}] * 5
+})
+
+
+def bench_processor(latency: float):
+    processor = lambda_esg_processor.ESGProcessor(cache=None)
+    scores = processor._provisional_scores(RESPONSES)
+    lambda_esg_processor.bedrock_runtime = FakeBedrockRuntime(latency, RECOMMENDATIONS)
+
+    start = time.perf_counter()
+    processor._generate_recommendations(BUSINESS, RESPONSES, scores)
+    buffered = time.perf_counter() - start
+
+    start = time.perf_counter()
+    first = None
+    for _ in processor.iter_recommendations(BUSINESS, RESPONSES, scores):
+        first = first or time.perf_counter() - start
+    return buffered, first, time.perf_counter() - start
+
+
+async def bench_analyzer(latency: float):
+    analyzer = ESGLLMAnalyzer(AsyncBedrockClient(FakeBedrockRuntime(latency, ANALYSIS)))
+
+    start = time.perf_counter()
+    await analyzer.analyze_esg_compliance(BUSINESS, 'NSRF', RESPONSES)
+    buffered = time.perf_counter() - start
+
+    start = time.perf_counter()
+    first = None
+    async for _ in analyzer.stream_recommendations(BUSINESS, 'NSRF', RESPONSES):
+        first = first or time.perf_counter() - start
+    return buffered, first, time.perf_counter() - start
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument('--latency', type=float, default=2.0, help='full generation time in seconds')
+    args = parser.parse_args()
+
+    print(f"{'path':>28} {'buffered_s':>11} {'first_rec_s':>12} {'last_rec_s':>11}")
+    for name, (buffered, first, last) in (
+        ('ESGProcessor recommendations', bench_processor(args.latency)),
+        ('ESGLLMAnalyzer analysis', asyncio.run(bench_analyzer(args.latency))),
+    ):
+        print(f"{name:>28} {buffered:>11.2f} {first:>12.2f} {last:>11.2f}")
+
+
+if __name__ == '__main__':
+    main()
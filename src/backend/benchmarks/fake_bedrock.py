@@ -0,0 +1,278 @@
+# Fake bedrock-runtime client for offline benchmarks
+# Mimics the parts of the boto3 client the services call, with simulated latency,
+# errors and throttling, and can replay completions recorded from the real service
+
+import hashlib
+import io
+import json
+import math
+import random
+import threading
+import time
+from collections import deque
+from typing import Any, Callable, Dict, Iterator, Optional, Union
+
+from prompt_templates import prompt_text
+from response_cache import request_cache_key
+
+# Parses both as a score block (label lines) and as a recommendation array
+CANNED_ANALYSIS = """Environmental Score: 68
+Social Score: 75
+Governance Score: 78
+Overall Score: 72.5
+Compliance Level: Good
+
+""" + json.dumps([{
+    "id": "rec_001",
+    "type": "improvement",
+    "title": "Implement Energy Monitoring",
+    "description": "Install sub-metering and track monthly consumption",
+    "priority": "high",
+    "estimatedImpact": "10% lower energy costs",
+    "timeframe": "3-6 months",
+    "requiredActions": ["Install sub-meters", "Set reduction targets"],
+    "relatedCriteria": ["energy-management"],
+    "resources": []
+}])
+
+
+class FakeClientError(Exception):
+    """Shaped like botocore's ClientError: the code is in ``response['Error']['Code']``"""
+
+    def __init__(self, code: str, message: str):
+        super().__init__(f"An error occurred ({code}) when calling the InvokeModel operation: {message}")
+        self.response = {'Error': {'Code': code, 'Message': message}}
+
+
+class ThrottlingError(FakeClientError):
+    def __init__(self):
+        super().__init__('ThrottlingException', 'Too many requests, please wait before trying again.')
+
+
+class ServiceUnavailableError(FakeClientError):
+    def __init__(self):
+        super().__init__('ServiceUnavailableException', 'Service is temporarily unavailable.')
+
+
+class FakeBedrockRuntime:
+    """Stand-in for boto3's bedrock-runtime client that sleeps instead of calling AWS"""
+
+    def __init__(self, latency: float = 0.2, completion: Union[str, Callable[[str], str], None] = None,
+                 latency_sigma: float = 0.0, stream_chunk_chars: int = 16, input_latency_per_1k: float = 0.0,
+                 output_latency_per_1k: float = 0.0, throttle_rps: float = 0.0, throttle_rate: float = 0.0,
+                 error_rate: float = 0.0, latency_fn: Optional[Callable[[random.Random], float]] = None,
+                 prompt_cache_ttl: float = 300.0, prompt_cache_min_tokens: int = 0, seed: Optional[int] = None):
+        self.latency = latency
+        # Prompt processing and generation time, so longer prompts and answers take longer
+        self.input_latency_per_1k = input_latency_per_1k
+        self.output_latency_per_1k = output_latency_per_1k
+        self.stream_chunk_chars = stream_chunk_chars
+        # Log-normal spread around the median latency gives a realistic tail; latency_fn
+        # replaces it with any other distribution, e.g. lambda rng: rng.expovariate(5)
+        self.latency_sigma = latency_sigma
+        self.latency_fn = latency_fn
+        self._random = random.Random(seed)
+        # A fixed completion, or a function of the prompt text for pipelines that make different calls
+        self.completion = completion or CANNED_ANALYSIS
+        # Requests started in any one-second window beyond this are throttled (0 never throttles)
+        self.throttle_rps = throttle_rps
+        # Fractions of calls throttled up front, and failed with a 5xx after the usual latency
+        self.throttle_rate = throttle_rate
+        self.error_rate = error_rate
+        # Prompt caching: the system prompt up to each block marked with cache_control is a cache
+        # point, written on first use and read, without its processing time, until it goes unused
+        # for the TTL; the longest cached point wins, and points shorter than the minimum are not cached
+        self.prompt_cache_ttl = prompt_cache_ttl
+        self.prompt_cache_min_tokens = prompt_cache_min_tokens
+        self._prompt_cache: Dict[str, float] = {}
+        self._started: deque = deque()
+        self._lock = threading.Lock()
+        self.calls = 0
+        self.throttled = 0
+        self.errors = 0
+        self.input_tokens = 0
+        self.output_tokens = 0
+        self.cache_write_tokens = 0
+        self.cache_read_tokens = 0
+
+    def _admit(self):
+        if self.throttle_rate and self._random.random() < self.throttle_rate:
+            with self._lock:
+                self.throttled += 1
+            raise ThrottlingError()
+        if not self.throttle_rps:
+            return
+        with self._lock:
+            now = time.monotonic()
+            while self._started and now - self._started[0] >= 1.0:
+                self._started.popleft()
+            if len(self._started) >= self.throttle_rps:
+                self.throttled += 1
+                raise ThrottlingError()
+            self._started.append(now)
+
+    def _fail(self) -> bool:
+        if self.error_rate and self._random.random() < self.error_rate:
+            with self._lock:
+                self.errors += 1
+            return True
+        return False
+
+    def _completion_for(self, model_id: str, body: str) -> str:
+        if callable(self.completion):
+            return self.completion(prompt_text(json.loads(body)))
+        return self.completion
+
+    def _base_latency(self) -> float:
+        if self.latency_fn is not None:
+            return max(self.latency_fn(self._random), 0.0)
+        if self.latency_sigma:
+            return self._random.lognormvariate(math.log(self.latency), self.latency_sigma)
+        return self.latency
+
+    def _input_usage(self, body: str) -> Dict[str, int]:
+        """Input usage as Bedrock reports it: cache reads and writes are split out of ``input_tokens``"""
+        tokens = len(body) // 4
+        self.input_tokens += tokens
+        prefix, points = '', []
+        for block in json.loads(body).get('system') or []:
+            if not isinstance(block, dict):
+                continue
+            prefix += block.get('text', '')
+            if block.get('cache_control') and len(prefix) // 4 >= self.prompt_cache_min_tokens:
+                points.append((hashlib.sha256(prefix.encode('utf-8')).hexdigest(), len(prefix) // 4))
+        if not points:
+            return {"input_tokens": tokens}
+        with self._lock:
+            now = time.monotonic()
+            read = max((length for key, length in points if self._prompt_cache.get(key, 0.0) > now), default=0)
+            for key, _ in points:
+                self._prompt_cache[key] = now + self.prompt_cache_ttl
+            written = points[-1][1] - read
+            self.cache_read_tokens += read
+            self.cache_write_tokens += written
+        return {"input_tokens": tokens - read - written, "cache_read_input_tokens": read,
+                "cache_creation_input_tokens": written}
+
+    @staticmethod
+    def _processed_tokens(usage: Dict[str, int]) -> int:
+        # Cache reads skip prompt processing; writes are processed like any other input
+        return usage["input_tokens"] + usage.get("cache_creation_input_tokens", 0)
+
+    def _sleep(self, input_tokens: int = 0, text: str = ''):
+        extra = (input_tokens * self.input_latency_per_1k + len(text) / 4 * self.output_latency_per_1k) / 1000
+        time.sleep(extra + self._base_latency())
+
+    def invoke_model(self, modelId: str, body: str, **kwargs) -> Dict:
+        self._admit()
+        text = self._completion_for(modelId, body)
+        self.calls += 1
+        usage = self._input_usage(body)
+        self.output_tokens += len(text) // 4
+        self._sleep(self._processed_tokens(usage), text)
+        if self._fail():
+            raise ServiceUnavailableError()
+        payload = {
+            "content": [{"type": "text", "text": text}],
+            "usage": dict(usage, output_tokens=len(text) // 4)
+        }
+        return {"body": io.BytesIO(json.dumps(payload).encode('utf-8'))}
+
+    def invoke_model_with_response_stream(self, modelId: str, body: str, **kwargs) -> Dict:
+        self._admit()
+        self.calls += 1
+        usage = self._input_usage(body)
+        if self._fail():
+            raise ServiceUnavailableError()
+        return {"body": self._stream_events(modelId, body, usage)}
+
+    def _stream_events(self, model_id: str, body: str, usage: Dict[str, int]) -> Iterator[Dict]:
+        # Spread the same total latency over the chunks, like tokens arriving at a steady rate
+        text = self._completion_for(model_id, body)
+        self.output_tokens += len(text) // 4
+        size = self.stream_chunk_chars
+        pieces = [text[i:i + size] for i in range(0, len(text), size)] or ['']
+        per_chunk = (self._base_latency() + len(text) / 4 / 1000 * self.output_latency_per_1k) / len(pieces)
+
+        def event(payload):
+            return {"chunk": {"bytes": json.dumps(payload).encode('utf-8')}}
+
+        time.sleep(self._processed_tokens(usage) / 1000 * self.input_latency_per_1k)
+        yield event({"type": "message_start", "message": {"usage": usage}})
+        for piece in pieces:
+            time.sleep(per_chunk)
+            yield event({"type": "content_block_delta", "index": 0, "delta": {"type": "text_delta", "text": piece}})
+        yield event({"type": "message_delta", "usage": {"output_tokens": len(text) // 4}})
+        yield event({"type": "message_stop"})
+
+
+class RecordingBedrockRuntime:
+    """
+    Wraps a real bedrock-runtime client and appends each completion to a JSONL
+    recording, keyed like the response cache, for ``ReplayBedrockRuntime``.
+    """
+
+    def __init__(self, client, path: str):
+        self.client = client
+        self.path = path
+        self._lock = threading.Lock()
+        self.recorded = 0
+
+    def _write(self, model_id: str, body: str, text: str, usage: Dict[str, Any]):
+        entry = {'key': request_cache_key(model_id, json.loads(body)), 'model_id': model_id,
+                 'text': text, 'usage': usage}
+        with self._lock, open(self.path, 'a', encoding='utf-8') as handle:
+            handle.write(json.dumps(entry) + '\n')
+            self.recorded += 1
+
+    def invoke_model(self, modelId: str, body: str, **kwargs) -> Dict:
+        raw = self.client.invoke_model(modelId=modelId, body=body, **kwargs)['body'].read()
+        payload = json.loads(raw)
+        self._write(modelId, body, payload['content'][0]['text'], payload.get('usage', {}))
+        return {"body": io.BytesIO(raw)}
+
+    def invoke_model_with_response_stream(self, modelId: str, body: str, **kwargs) -> Dict:
+        events = self.client.invoke_model_with_response_stream(modelId=modelId, body=body, **kwargs)['body']
+        return {"body": self._record_stream(modelId, body, events)}
+
+    def _record_stream(self, model_id: str, body: str, events) -> Iterator[Dict]:
+        parts, usage = [], {}
+        for event in events:
+            chunk = event.get('chunk')
+            if chunk:
+                data = json.loads(chunk['bytes'])
+                if data.get('type') == 'content_block_delta' and data['delta'].get('type') == 'text_delta':
+                    parts.append(data['delta']['text'])
+                elif data.get('type') == 'message_start':
+                    usage.update(data['message'].get('usage', {}))
+                elif data.get('type') == 'message_delta':
+                    usage.update(data.get('usage', {}))
+            yield event
+        self._write(model_id, body, ''.join(parts), usage)
+
+
+class ReplayBedrockRuntime(FakeBedrockRuntime):
+    """
+    Serves completions recorded by ``RecordingBedrockRuntime``, with the fake's
+    latency, error and throttling model. Requests that were never recorded get
+    ``missing`` (the canned analysis by default) and are counted in ``misses``.
+    """
+
+    def __init__(self, path: str, missing: Optional[str] = None, **kwargs):
+        super().__init__(**kwargs)
+        self.recordings: Dict[str, str] = {}
+        with open(path, encoding='utf-8') as handle:
+            for line in handle:
+                if line.strip():
+                    entry = json.loads(line)
+                    self.recordings[entry['key']] = entry['text']
+        self.missing = missing or CANNED_ANALYSIS
+        self.misses = 0
+
+    def _completion_for(self, model_id: str, body: str) -> str:
+        text = self.recordings.get(request_cache_key(model_id, json.loads(body)))
+        if text is None:
+            with self._lock:
+                self.misses += 1
+            return self.missing
+        return text
@@ -0,0 +1,228 @@
+# Cohort-level recommendation cache
+# Companies in the same framework, industry, size, headcount band and score band get
+# near-identical recommendations, so one generated set is stored and reused for the cohort
+
+import contextvars
+import logging
+import os
+import re
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable, Dict, Iterable, List, Optional, Sequence
+
+from metrics import incr
+from response_cache import CacheTier, MemoryTier, SQLiteTier
+from scheduler import PRIORITY_BULK, priority_scope
+
+# Width of the E/S/G score bands, in points
+ESG_COHORT_SCORE_BAND = float(os.getenv('ESG_COHORT_SCORE_BAND', '10'))
+# Entries older than this are served once more while a fresh set is generated in the background
+ESG_COHORT_REFRESH_AFTER = float(os.getenv('ESG_COHORT_REFRESH_AFTER', '21600'))
+# Entries older than this are not served at all
+ESG_COHORT_TTL = float(os.getenv('ESG_COHORT_TTL', '604800'))
+ESG_COHORT_CACHE_SIZE = int(os.getenv('ESG_COHORT_CACHE_SIZE', '1024'))
+# e.g. /tmp/cohorts.sqlite on Lambda; unset keeps cohorts in memory only
+ESG_COHORT_CACHE_PATH = os.getenv('ESG_COHORT_CACHE_PATH')
+
+# Upper bounds of the headcount bands (micro, small, medium per SME Corp, then larger)
+EMPLOYEE_BANDS = (5, 30, 75, 200)
+
+logger = logging.getLogger(__name__)
+
+_SPACE = re.compile(r'\s+')
+
+
+def _employee_band(employees: Any) -> str:
+    try:
+        count = int(float(employees))
+    except (TypeError, ValueError):
+        return 'unknown'
+    lower = 0
+    for upper in EMPLOYEE_BANDS:
+        if count < upper:
+            return f'{lower}-{upper - 1}'
+        lower = upper
+    return f'{lower}+'
+
+
+def _score_band(score: Any, width: float) -> str:
+    try:
+        return str(int(float(score) // width * width))
+    except (TypeError, ValueError):
+        return 'unknown'
+
+
+def cohort_key(framework: str, business_data: Dict, pillar_scores: Sequence[Any],
+               band: float = None) -> str:
+    """
+    Cohort of a request: framework, industry, size, headcount band and the
+    band of each E/S/G score, e.g. ``nsrf|manufacturing|small|5-29|60|70|50``.
+    """
+    band = band or ESG_COHORT_SCORE_BAND
+    parts = [
+        (framework or '').lower(),
+        _SPACE.sub(' ', str(business_data.get('industry') or 'unknown')).strip().lower(),
+        str(business_data.get('size') or 'unknown').lower(),
+        _employee_band(business_data.get('employees'))
+    ]
+    parts.extend(_score_band(score, band) for score in pillar_scores)
+    return '|'.join(parts)
+
+
+def personalize(recommendations: List[Dict], source_company: Optional[str], company: Optional[str],
+                weak_criteria: Iterable[str] = ()) -> List[Dict]:
+    """
+    Adapt a cohort's recommendation set to one company: the name of the
+    company it was generated for is replaced with this one's, recommendations
+    touching this company's weakest criteria move to the front, and ids are
+    renumbered.
+    """
+    weak = {criterion.lower() for criterion in weak_criteria}
+    adapted = []
+    for rec in recommendations:
+        rec = {key: list(value) if isinstance(value, list) else value for key, value in rec.items()}
+        if source_company and company and source_company != company:
+            for field in ('title', 'description', 'estimatedImpact'):
+                if isinstance(rec.get(field), str):
+                    rec[field] = rec[field].replace(source_company, company)
+        adapted.append(rec)
+    adapted.sort(key=lambda rec: not weak.intersection(str(c).lower() for c in rec.get('relatedCriteria') or []))
+    for index, rec in enumerate(adapted, 1):
+        rec['id'] = f'rec_{index:03d}'
+    return adapted
+
+
+class CohortCache:
+    """
+    Recommendation sets keyed by ``cohort_key``, with ``score_band``-point bands.
+
+    A fresh entry is served as is. One older than ``refresh_after`` seconds is
+    still served, and a replacement is generated on a background thread at
+    bulk priority; one older than ``ttl`` is a miss. Only non-empty sets are
+    stored, so fallbacks are never shared across a cohort. Every hit is a
+    Bedrock generation call saved.
+    """
+
+    def __init__(self, tiers: List[CacheTier], refresh_after: float = None, score_band: float = None):
+        self.tiers = tiers
+        self.score_band = score_band or ESG_COHORT_SCORE_BAND
+        self.refresh_after = ESG_COHORT_REFRESH_AFTER if refresh_after is None else refresh_after
+        self._lock = threading.Lock()
+        self._refreshing: set = set()
+        self._executor: Optional[ThreadPoolExecutor] = None
+        self.hits = 0
+        self.stale_hits = 0
+        self.misses = 0
+        self.refreshes = 0
+        self.refresh_failures = 0
+
+    def key(self, framework: str, business_data: Dict, pillar_scores: Sequence[Any]) -> str:
+        return cohort_key(framework, business_data, pillar_scores, self.score_band)
+
+    def _get(self, key: str) -> Optional[Dict]:
+        for index, tier in enumerate(self.tiers):
+            entry = tier.get(key)
+            if entry is not None:
+                for faster in self.tiers[:index]:
+                    faster.put(key, entry)
+                return entry
+        return None
+
+    def put(self, key: str, recommendations: List[Dict], company: Optional[str] = None):
+        if not recommendations:
+            return
+        entry = {'recommendations': recommendations, 'company': company, 'created': time.time()}
+        for tier in self.tiers:
+            tier.put(key, entry)
+
+    def lookup(self, key: str, refresh: Optional[Callable[[], List[Dict]]] = None,
+               company: Optional[str] = None) -> Optional[Dict]:
+        """
+        The stored entry for ``key`` (``recommendations`` and the ``company``
+        they were written for), or None. A stale entry schedules ``refresh``,
+        which writes a set for ``company``.
+        """
+        entry = self._get(key)
+        with self._lock:
+            if entry is None:
+                self.misses += 1
+            elif time.time() - entry['created'] > self.refresh_after:
+                self.stale_hits += 1
+            else:
+                self.hits += 1
+        if entry is None:
+            incr('cohort_misses')
+            return None
+        incr('cohort_hits')
+        if refresh is not None and time.time() - entry['created'] > self.refresh_after:
+            self._schedule_refresh(key, refresh, company)
+        return entry
+
+    def get_or_create(self, key: str, generate: Callable[[], List[Dict]],
+                      company: Optional[str] = None) -> Optional[Dict]:
+        """``lookup``, generating and storing the set on a miss; None if nothing usable was generated"""
+        entry = self.lookup(key, generate, company)
+        if entry is not None:
+            return entry
+        recommendations = generate()
+        if not recommendations:
+            return None
+        self.put(key, recommendations, company)
+        return {'recommendations': recommendations, 'company': company}
+
+    def _schedule_refresh(self, key: str, generate: Callable[[], List[Dict]], company: Optional[str]):
+        with self._lock:
+            if key in self._refreshing:
+                return
+            self._refreshing.add(key)
+            if self._executor is None:
+                self._executor = ThreadPoolExecutor(max_workers=2, thread_name_prefix='cohort-refresh')
+            executor = self._executor
+        # A fresh context: the refresh must not inherit the request's deadline or metrics
+        executor.submit(contextvars.Context().run, self._refresh, key, generate, company)
+
+    def _refresh(self, key: str, generate: Callable[[], List[Dict]], company: Optional[str]):
+        try:
+            with priority_scope(PRIORITY_BULK):
+                recommendations = generate()
+            self.put(key, recommendations, company)
+            with self._lock:
+                self.refreshes += 1
+        except Exception as e:
+            logger.warning(f"Refreshing cohort {key} failed: {str(e)}")
+            with self._lock:
+                self.refresh_failures += 1
+        finally:
+            with self._lock:
+                self._refreshing.discard(key)
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            lookups = self.hits + self.stale_hits + self.misses
+            served = self.hits + self.stale_hits
+            return {
+                'hits': self.hits,
+                'stale_hits': self.stale_hits,
+                'misses': self.misses,
+                'hit_rate': round(served / lookups, 4) if lookups else 0.0,
+                'bedrock_calls_saved': served,
+                'refreshes': self.refreshes,
+                'refresh_failures': self.refresh_failures
+            }
+
+
+_default_cache: Optional[CohortCache] = None
+_default_lock = threading.Lock()
+
+
+def get_cohort_cache() -> CohortCache:
+    """Process-wide cohort cache configured from the environment"""
+    global _default_cache
+    with _default_lock:
+        if _default_cache is None:
+            tiers: List[CacheTier] = [MemoryTier(ESG_COHORT_CACHE_SIZE, ESG_COHORT_TTL)]
+            if ESG_COHORT_CACHE_PATH:
+                tiers.append(SQLiteTier(ESG_COHORT_CACHE_PATH, ESG_COHORT_TTL))
+            _default_cache = CohortCache(tiers)
+        return _default_cache
@@ -0,0 +1,137 @@
+# Criterion crosswalk between ESG frameworks
+# Maps each criterion to its equivalents in the other frameworks, so one set of responses
+# is analyzed once and projected onto a score per framework
+
+import json
+import os
+import threading
+from datetime import datetime, timezone
+from typing import Dict, List, Optional, Sequence, Tuple
+
+from scoring_engine import CompiledRubric, determine_compliance_level, framework_ids, get_rubric
+
+CROSSWALK_PATH = os.getenv(
+    'ESG_CROSSWALK_PATH',
+    os.path.join(os.path.dirname(os.path.abspath(__file__)), 'data', 'crosswalk.json')
+)
+
+
+class Crosswalk:
+    """
+    Equivalence groups of criteria across frameworks, compiled to an index.
+
+    ``sources[c]`` lists the criteria of other frameworks whose responses
+    stand in for criterion ``c``, with the weight of the group that links
+    them. A criterion answered directly always wins; otherwise its projected
+    score is the weighted mean of its answered sources, and their evidence is
+    carried over, so the evidence is written and analyzed once.
+    """
+
+    def __init__(self, groups: List[Dict]):
+        self.groups = groups
+        self.sources: Dict[str, List[Tuple[str, float]]] = {}
+        for group in groups:
+            weight = float(group.get('weight', 1.0))
+            members = [(framework.lower(), criterion)
+                       for framework, criteria in group['criteria'].items() for criterion in criteria]
+            for framework, criterion in members:
+                links = self.sources.setdefault(criterion, [])
+                for other_framework, other in members:
+                    if other_framework != framework and other != criterion and (other, weight) not in links:
+                        links.append((other, weight))
+
+    def project(self, responses: Sequence[Dict], rubric: CompiledRubric, keep_unmapped: bool = False) -> List[Dict]:
+        """
+        Responses for ``rubric``'s criteria: direct answers as they are, the
+        rest projected from equivalent criteria. With ``keep_unmapped``,
+        responses that are neither for the rubric nor used in a projection
+        are appended, so nothing the company wrote is lost.
+        """
+        answered = {
+            response['criterionId']: response for response in responses
+            if response.get('criterionId') and isinstance(response.get('score'), (int, float))
+        }
+        projected, used = [], set()
+        for criterion in rubric.criteria:
+            if criterion in answered:
+                projected.append(answered[criterion])
+                used.add(criterion)
+                continue
+            sources = [(answered[source], weight) for source, weight in self.sources.get(criterion, ())
+                       if source in answered]
+            if not sources:
+                continue
+            total = sum(weight for _, weight in sources)
+            evidence = [str(source['evidence']) for source, _ in sources if source.get('evidence')]
+            projected.append({
+                'criterionId': criterion,
+                'score': round(sum(source['score'] * weight for source, weight in sources) / total, 1),
+                'evidence': '; '.join(dict.fromkeys(evidence)),
+                'notes': f"Projected from {', '.join(source['criterionId'] for source, _ in sources)}",
+                'projectedFrom': [source['criterionId'] for source, _ in sources]
+            })
+            used.update(source['criterionId'] for source, _ in sources)
+        if keep_unmapped:
+            projected.extend(response for response in responses
+                             if response.get('criterionId') not in used
+                             and response.get('criterionId') not in rubric.criterion_index)
+        return projected
+
+    def framework_scores(self, responses: Sequence[Dict], frameworks: Sequence[str],
+                         offset: float = 0.0) -> List[Dict]:
+        """
+        One entry per framework, shaped like the frontend's ``FrameworkScore``.
+
+        ``offset`` moves every rubric score by the same amount, e.g. the gap
+        between the LLM's overall score and the rubric's for the framework the
+        LLM analyzed, so all frameworks share one calibration. Each entry also
+        reports ``coverage``, the share of the framework's criteria answered
+        directly or through the crosswalk.
+        """
+        assessed = datetime.now(timezone.utc).isoformat()
+        scores, seen = [], set()
+        for framework in frameworks:
+            rubric = get_rubric(framework)
+            if rubric.framework_id in seen:
+                continue
+            seen.add(rubric.framework_id)
+            projected = self.project(responses, rubric)
+            coverage = len(projected) / len(rubric.criteria) if rubric.criteria else 0.0
+            score = 0.0
+            if projected:
+                score = round(min(max(rubric.score(projected)['overall_score'] + offset, 0.0), 100.0), 1)
+            scores.append({
+                'frameworkId': rubric.framework_id,
+                'frameworkName': rubric.name,
+                'score': score,
+                'complianceLevel': determine_compliance_level(score),
+                'status': 'not-started' if not projected else 'completed' if coverage == 1 else 'in-progress',
+                'coverage': round(coverage, 3),
+                'lastAssessed': assessed
+            })
+        return scores
+
+
+def resolve_frameworks(frameworks) -> List[str]:
+    """A request's ``frameworks``: a list of names, or 'all' for every rubric"""
+    if isinstance(frameworks, str):
+        return framework_ids() if frameworks.lower() == 'all' else [frameworks]
+    return list(frameworks or []) or framework_ids()
+
+
+def load_crosswalk(path: str) -> Crosswalk:
+    with open(path, encoding='utf-8') as handle:
+        return Crosswalk(json.load(handle)['groups'])
+
+
+_crosswalk: Optional[Crosswalk] = None
+_crosswalk_lock = threading.Lock()
+
+
+def get_crosswalk() -> Crosswalk:
+    """The crosswalk at ESG_CROSSWALK_PATH, compiled once per process"""
+    global _crosswalk
+    with _crosswalk_lock:
+        if _crosswalk is None:
+            _crosswalk = load_crosswalk(CROSSWALK_PATH)
+        return _crosswalk
@@ -0,0 +1,219 @@
+# Grant catalog for ESGenius opportunity matching
+# Loaded once per process and indexed so lookups never scan the whole catalog
+
+import csv
+import json
+import logging
+import os
+import threading
+from bisect import bisect_left, bisect_right
+from dataclasses import dataclass, field
+from datetime import date
+from typing import Dict, List, Optional, Tuple
+
+GRANT_CATALOG_PATH = os.getenv(
+    'ESG_GRANT_CATALOG',
+    os.path.join(os.path.dirname(os.path.abspath(__file__)), 'data', 'grants.json')
+)
+
+logger = logging.getLogger(__name__)
+
+# Eligibility rule: each satisfied minimum score adds its weight, SMEs get a bonus,
+# the total is capped at 1.0, and only grants above the threshold are returned
+SCORE_DIMENSIONS: Tuple[Tuple[str, float], ...] = (
+    ('environmental', 0.3),
+    ('social', 0.3),
+    ('governance', 0.3),
+    ('overall', 0.4),
+)
+SME_SIZES = ('micro', 'small', 'medium')
+SME_BONUS = 0.2
+ELIGIBILITY_THRESHOLD = 0.5
+
+# Entries between stored prefix masks; trades index memory for per-query work
+_BLOCK = 128
+
+
+@dataclass
+class GrantRecord:
+    name: str
+    provider: str
+    amount: str
+    description: str
+    deadline: str
+    requirements: List[str]
+    min_scores: Dict[str, float] = field(default_factory=dict)
+    opens: Optional[str] = None
+
+
+class SortedBitIndex:
+    """
+    Values sorted ascending, answering "which entries have value <= x" as a bitmask.
+
+    Bit ``i`` stands for catalog entry ``i``. A mask of every entry up to each
+    block boundary is stored, so a query is one bisect plus at most one block of ORs.
+    """
+
+    def __init__(self, values: List[float]):
+        self.order = sorted(range(len(values)), key=values.__getitem__)
+        self.sorted_values = [values[i] for i in self.order]
+        self.checkpoints = [0]
+        mask = 0
+        for position, index in enumerate(self.order, 1):
+            mask |= 1 << index
+            if position % _BLOCK == 0:
+                self.checkpoints.append(mask)
+
+    def _prefix(self, count: int) -> int:
+        block = count // _BLOCK
+        mask = self.checkpoints[block]
+        for index in self.order[block * _BLOCK:count]:
+            mask |= 1 << index
+        return mask
+
+    def at_most(self, value: float) -> int:
+        return self._prefix(bisect_right(self.sorted_values, value))
+
+    def below(self, value: float) -> int:
+        return self._prefix(bisect_left(self.sorted_values, value))
+
+
+class GrantCatalog:
+    """
+    Indexed grant programmes.
+
+    One sorted threshold index per score dimension, plus indexes on the parsed
+    opening and deadline dates for the active window. A query combines the
+    bitmasks into the possible eligibility levels and reads the best grants
+    straight out of them in catalog order.
+    """
+
+    def __init__(self, grants: List[GrantRecord]):
+        self.grants = grants
+        self._all = (1 << len(grants)) - 1
+        self._thresholds = {
+            dimension: SortedBitIndex([grant.min_scores.get(dimension, 0.0) for grant in grants])
+            for dimension, _ in SCORE_DIMENSIONS
+        }
+        # Missing dates leave the window open on that side
+        self._deadlines = SortedBitIndex([
+            date.fromisoformat(grant.deadline).toordinal() if grant.deadline else float('inf')
+            for grant in grants
+        ])
+        self._openings = SortedBitIndex([
+            date.fromisoformat(grant.opens).toordinal() if grant.opens else float('-inf')
+            for grant in grants
+        ])
+        self._levels = self._eligibility_levels()
+
+    @staticmethod
+    def _eligibility_levels() -> List[Tuple[float, List[Tuple[str, ...]]]]:
+        """Score, without the SME bonus, for every combination of satisfied dimensions"""
+        levels = []
+        for bits in range(1 << len(SCORE_DIMENSIONS)):
+            satisfied = tuple(d for i, (d, _) in enumerate(SCORE_DIMENSIONS) if bits >> i & 1)
+            score = 0.0
+            for dimension, weight in SCORE_DIMENSIONS:
+                if dimension in satisfied:
+                    score += weight
+            levels.append((score, satisfied))
+        return levels
+
+    def active_mask(self, today: date) -> int:
+        """Grants whose application window includes ``today``"""
+        ordinal = today.toordinal()
+        return self._openings.at_most(ordinal) & (self._all ^ self._deadlines.below(ordinal))
+
+    def top_eligible(self, scores: Dict[str, float], sme: bool = True, k: int = 3,
+                     today: Optional[date] = None) -> List[Tuple[GrantRecord, float]]:
+        """
+        Best ``k`` open grants for the given pillar/overall scores, as (grant, eligibility) pairs.
+
+        Ordered by eligibility, ties in catalog order.
+        """
+        active = self.active_mask(today or date.today())
+        if not active:
+            return []
+        satisfied = {
+            dimension: self._thresholds[dimension].at_most(scores.get(dimension, 0.0))
+            for dimension, _ in SCORE_DIMENSIONS
+        }
+
+        # Union the grants of every dimension combination, bucketed by final eligibility
+        by_eligibility: Dict[float, int] = {}
+        for base, dimensions in self._levels:
+            eligibility = base
+            if sme:
+                eligibility += SME_BONUS
+            eligibility = min(eligibility, 1.0)
+            if eligibility <= ELIGIBILITY_THRESHOLD:
+                continue
+            mask = active
+            for dimension, _ in SCORE_DIMENSIONS:
+                if dimension in dimensions:
+                    mask &= satisfied[dimension]
+                else:
+                    mask &= ~satisfied[dimension]
+                if not mask:
+                    break
+            if mask:
+                by_eligibility[eligibility] = by_eligibility.get(eligibility, 0) | mask
+
+        matches: List[Tuple[GrantRecord, float]] = []
+        for eligibility in sorted(by_eligibility, reverse=True):
+            mask = by_eligibility[eligibility]
+            while mask and len(matches) < k:
+                lowest = mask & -mask
+                matches.append((self.grants[lowest.bit_length() - 1], eligibility))
+                mask ^= lowest
+            if len(matches) == k:
+                break
+        return matches
+
+
+def _record_from_row(row: Dict) -> GrantRecord:
+    requirements = row.get('requirements') or []
+    if isinstance(requirements, str):
+        # CSV cells hold requirements separated by semicolons
+        requirements = [item.strip() for item in requirements.split(';') if item.strip()]
+    min_scores = {
+        dimension: float(row[f'min_{dimension}_score'])
+        for dimension, _ in SCORE_DIMENSIONS
+        if row.get(f'min_{dimension}_score') not in (None, '')
+    }
+    return GrantRecord(
+        name=row['name'],
+        provider=row.get('provider', ''),
+        amount=row.get('amount', ''),
+        description=row.get('description', ''),
+        deadline=row.get('deadline') or '',
+        requirements=requirements,
+        min_scores=min_scores,
+        opens=row.get('opens') or None
+    )
+
+
+def load_grant_catalog(path: str) -> GrantCatalog:
+    """Build a catalog from a JSON array or a CSV file"""
+    with open(path, newline='', encoding='utf-8') as handle:
+        if path.endswith('.csv'):
+            rows = list(csv.DictReader(handle))
+        else:
+            rows = json.load(handle)
+    return GrantCatalog([_record_from_row(row) for row in rows])
+
+
+_catalogs: Dict[str, GrantCatalog] = {}
+_catalogs_lock = threading.Lock()
+
+
+def get_grant_catalog(path: Optional[str] = None) -> GrantCatalog:
+    """Catalog for ``path`` (default ESG_GRANT_CATALOG), loaded once per process"""
+    path = path or GRANT_CATALOG_PATH
+    with _catalogs_lock:
+        if path not in _catalogs:
+            _catalogs[path] = load_grant_catalog(path)
+            if not _catalogs[path].active_mask(date.today()):
+                # Closed programmes are never offered; say so instead of silently matching nothing
+                logger.warning(f"No programme in the grant catalog {path} is open today; update its deadlines")
+        return _catalogs[path]
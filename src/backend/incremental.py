@@ -0,0 +1,118 @@
+# Incremental re-assessment state
+# Remembers each assessment's responses, rubric contributions and last result so an
+# edit to a few criteria can be re-scored without re-running the whole analysis
+
+import hashlib
+import json
+import os
+import threading
+from typing import Any, Dict, List, Optional, Sequence
+
+from response_cache import CacheTier, MemoryTier, ResponseCache, SQLiteTier
+
+# Points a pillar or overall score may drift from the last LLM analysis before the LLM is asked again
+ESG_INCREMENTAL_THRESHOLD = float(os.getenv('ESG_INCREMENTAL_THRESHOLD', '5'))
+# How long and how many assessments are remembered; the optional SQLite file outlives the process
+ESG_ASSESSMENT_TTL = float(os.getenv('ESG_ASSESSMENT_TTL', '86400'))
+ESG_ASSESSMENT_STORE_SIZE = int(os.getenv('ESG_ASSESSMENT_STORE_SIZE', '256'))
+ESG_ASSESSMENT_STORE_PATH = os.getenv('ESG_ASSESSMENT_STORE_PATH')
+
+SCORE_FIELDS = ('environmental_score', 'social_score', 'governance_score', 'overall_score')
+_RESPONSE_FIELDS = ('score', 'evidence', 'notes', 'fieldResponses')
+
+
+def fingerprint(value: Any) -> str:
+    """Stable hash of a JSON-like value, e.g. the business profile"""
+    material = json.dumps(value, sort_keys=True, separators=(',', ':'), default=str)
+    return hashlib.sha256(material.encode('utf-8')).hexdigest()
+
+
+def responses_by_criterion(responses: Sequence[Dict]) -> Dict[str, Dict]:
+    """The fields of each response that matter to the analysis, keyed by criterion id (last one wins)"""
+    return {
+        str(response.get('criterionId', index)): {field: response.get(field) for field in _RESPONSE_FIELDS}
+        for index, response in enumerate(responses)
+    }
+
+
+def response_changes(previous: Dict[str, Dict], current: Dict[str, Dict]) -> Dict[str, List[str]]:
+    """Criterion ids added, removed or edited between two ``responses_by_criterion`` maps"""
+    return {
+        'added': [criterion for criterion in current if criterion not in previous],
+        'removed': [criterion for criterion in previous if criterion not in current],
+        'changed': [criterion for criterion in current
+                    if criterion in previous and current[criterion] != previous[criterion]]
+    }
+
+
+def score_drift(baseline: Dict, current: Dict) -> float:
+    """Largest absolute pillar or overall score change between two rubric score rows"""
+    return max(abs(current[field] - baseline[field]) for field in SCORE_FIELDS)
+
+
+def _added_removed(before: Sequence, after: Sequence) -> Dict[str, List]:
+    return {
+        'added': [item for item in after if item not in before],
+        'removed': [item for item in before if item not in after]
+    }
+
+
+def diff_results(previous: Dict[str, Any], current: Dict[str, Any]) -> Dict[str, Any]:
+    """
+    What changed between two analysis results: scores as ``{"from", "to"}``
+    pairs, and gaps, recommendations (by title) and opportunities (by name)
+    added or removed. Unchanged sections are left out.
+    """
+    diff: Dict[str, Any] = {}
+    before, after = previous.get('scores', {}), current.get('scores', {})
+    scores = {
+        field: {'from': before.get(field), 'to': after.get(field)}
+        for field in after if before.get(field) != after.get(field)
+    }
+    if scores:
+        diff['scores'] = scores
+    sections = (
+        ('compliance_gaps', lambda item: item),
+        ('recommendations', lambda item: item.get('title')),
+        ('opportunities', lambda item: item.get('name'))
+    )
+    for section, label in sections:
+        changes = _added_removed([label(item) for item in previous.get(section, [])],
+                                 [label(item) for item in current.get(section, [])])
+        if changes['added'] or changes['removed']:
+            diff[section] = changes
+    return diff
+
+
+def new_state(framework: str, business_data: Dict, responses: Dict[str, Dict], contributions: Dict[str, List[float]],
+              rubric_scores: Dict, result: Dict[str, Any], baseline: Optional[Dict] = None) -> Dict[str, Any]:
+    """
+    What is remembered per assessment. ``baseline`` holds the rubric scores
+    the last LLM analysis saw; drift is measured from there, not from the last edit,
+    so many small edits still add up to a new analysis.
+    """
+    return {
+        'framework': framework,
+        'business': fingerprint(business_data),
+        'responses': responses,
+        'contributions': contributions,
+        'rubric_scores': rubric_scores,
+        'baseline': baseline or rubric_scores,
+        'result': result
+    }
+
+
+_store: Optional[ResponseCache] = None
+_store_lock = threading.Lock()
+
+
+def get_assessment_store() -> ResponseCache:
+    """Process-wide store of assessment states, keyed by assessment id"""
+    global _store
+    with _store_lock:
+        if _store is None:
+            tiers: List[CacheTier] = [MemoryTier(ESG_ASSESSMENT_STORE_SIZE, ESG_ASSESSMENT_TTL)]
+            if ESG_ASSESSMENT_STORE_PATH:
+                tiers.append(SQLiteTier(ESG_ASSESSMENT_STORE_PATH, ESG_ASSESSMENT_TTL))
+            _store = ResponseCache(tiers)
+        return _store
@@ -0,0 +1,380 @@
+# Asynchronous analysis jobs
+# A submission gets a job id at once, a worker writes the result to a pluggable store and
+# clients poll it; jobs are keyed by an input hash, so a resubmitted request reuses its job
+
+import json
+import logging
+import os
+import sqlite3
+import threading
+import time
+import uuid
+from typing import Any, Callable, Dict, Optional, Tuple
+
+from incremental import fingerprint
+
+# DynamoDB table for jobs (partition key ``input_hash``, string), shared by every container;
+# takes precedence over ESG_JOB_STORE_PATH
+ESG_JOB_TABLE = os.getenv('ESG_JOB_TABLE')
+# SQLite file for jobs, e.g. /tmp/esg-jobs.sqlite, shared by the processes on one host; unset
+# (and no table) keeps jobs in memory, visible only to the process that ran them
+ESG_JOB_STORE_PATH = os.getenv('ESG_JOB_STORE_PATH')
+# Seconds a finished job's result is kept and reused for identical submissions
+ESG_JOB_TTL = float(os.getenv('ESG_JOB_TTL', '86400'))
+# A queued or running job not updated for this long is presumed lost and is resubmitted
+ESG_JOB_STALE_AFTER = float(os.getenv('ESG_JOB_STALE_AFTER', '900'))
+# Seconds between store reads while a poll waits for completion
+ESG_JOB_POLL_INTERVAL = float(os.getenv('ESG_JOB_POLL_INTERVAL', '0.5'))
+
+QUEUED = 'queued'
+RUNNING = 'running'
+SUCCEEDED = 'succeeded'
+FAILED = 'failed'
+FINISHED = (SUCCEEDED, FAILED)
+
+# Request keys that control delivery rather than the analysis, left out of the input hash
+_TRANSPORT_KEYS = ('async', 'jobId', 'wait')
+
+logger = logging.getLogger(__name__)
+
+
+def request_hash(body: Dict[str, Any]) -> str:
+    """Hash of everything in a request body that affects the analysis"""
+    return fingerprint({key: value for key, value in body.items() if key not in _TRANSPORT_KEYS})
+
+
+def describe(job: Dict[str, Any]) -> Dict[str, Any]:
+    """The client-facing view of a job: id, status, timestamps and the result or error once finished"""
+    view = {'jobId': job['id'], 'status': job['status'], 'created': job['created'], 'updated': job['updated']}
+    if job['status'] == SUCCEEDED:
+        view['result'] = job['result']
+    elif job['status'] == FAILED:
+        view['error'] = job['error']
+    return view
+
+
+class JobStore:
+    """
+    Where job state lives; subclass to plug in another store, e.g. DynamoDB.
+
+    A job is a dict with ``id``, ``input_hash``, ``status``, ``request``,
+    ``result``, ``error``, ``created`` and ``updated``. ``submit`` must be
+    atomic per input hash so concurrent duplicates share one job.
+    """
+
+    # Whether every container (or Lambda execution environment) sees the same jobs
+    shared = True
+
+    def __init__(self, ttl: float = None, stale_after: float = None):
+        self.ttl = ESG_JOB_TTL if ttl is None else ttl
+        self.stale_after = ESG_JOB_STALE_AFTER if stale_after is None else stale_after
+
+    def reusable(self, job: Optional[Dict[str, Any]], now: float) -> bool:
+        """Whether a submission with the same input should get ``job`` rather than a new one"""
+        if job is None or job['status'] == FAILED or now - job['created'] > self.ttl:
+            return False
+        return job['status'] == SUCCEEDED or now - job['updated'] <= self.stale_after
+
+    @staticmethod
+    def new_job(input_hash: str, request: Dict[str, Any], now: float) -> Dict[str, Any]:
+        return {'id': uuid.uuid4().hex, 'input_hash': input_hash, 'status': QUEUED, 'request': request,
+                'result': None, 'error': None, 'created': now, 'updated': now}
+
+    def submit(self, input_hash: str, request: Dict[str, Any]) -> Tuple[Dict[str, Any], bool]:
+        """The job for this input, and whether it was just created (and so needs a worker)"""
+        raise NotImplementedError
+
+    def get(self, job_id: str) -> Optional[Dict[str, Any]]:
+        raise NotImplementedError
+
+    def update(self, job_id: str, **changes):
+        """Set ``status``, ``result`` and/or ``error``; ``updated`` is stamped automatically"""
+        raise NotImplementedError
+
+    def wait(self, job_id: str, timeout: float) -> Optional[Dict[str, Any]]:
+        """The job once finished, or as it stands after ``timeout`` seconds"""
+        deadline = time.monotonic() + timeout
+        while True:
+            job = self.get(job_id)
+            remaining = deadline - time.monotonic()
+            if job is None or job['status'] in FINISHED or remaining <= 0:
+                return job
+            time.sleep(min(ESG_JOB_POLL_INTERVAL, remaining))
+
+
+class MemoryJobStore(JobStore):
+    """In-process store; ``wait`` wakes as soon as a job finishes"""
+
+    shared = False
+
+    def __init__(self, ttl: float = None, stale_after: float = None):
+        super().__init__(ttl, stale_after)
+        self._jobs: Dict[str, Dict[str, Any]] = {}
+        self._by_hash: Dict[str, str] = {}
+        self._changed = threading.Condition()
+
+    def submit(self, input_hash: str, request: Dict[str, Any]) -> Tuple[Dict[str, Any], bool]:
+        now = time.time()
+        with self._changed:
+            existing = self._jobs.get(self._by_hash.get(input_hash, ''))
+            if self.reusable(existing, now):
+                return dict(existing), False
+            if existing is not None:
+                del self._jobs[existing['id']]
+            job = self.new_job(input_hash, request, now)
+            self._jobs[job['id']] = job
+            self._by_hash[input_hash] = job['id']
+            return dict(job), True
+
+    def get(self, job_id: str) -> Optional[Dict[str, Any]]:
+        with self._changed:
+            job = self._jobs.get(job_id)
+            return dict(job) if job is not None else None
+
+    def update(self, job_id: str, **changes):
+        with self._changed:
+            job = self._jobs.get(job_id)
+            if job is not None:
+                job.update(changes, updated=time.time())
+                self._changed.notify_all()
+
+    def wait(self, job_id: str, timeout: float) -> Optional[Dict[str, Any]]:
+        deadline = time.monotonic() + timeout
+        with self._changed:
+            while True:
+                job = self._jobs.get(job_id)
+                remaining = deadline - time.monotonic()
+                if job is None or job['status'] in FINISHED or remaining <= 0:
+                    return dict(job) if job is not None else None
+                self._changed.wait(remaining)
+
+
+class SQLiteJobStore(JobStore):
+    """
+    Jobs in a SQLite file. Submissions take a write lock on the file
+    (``BEGIN IMMEDIATE``), so processes sharing it agree on one job per
+    input hash.
+
+    The file keeps SQLite's default rollback journal: WAL mode needs memory
+    shared between the processes, so it only works on one host. On a network
+    filesystem such as EFS the rollback journal relies on NFS file locks;
+    ``DynamoDBJobStore`` is the sturdier way to share jobs between Lambda
+    containers.
+    """
+
+    _COLUMNS = ('id', 'input_hash', 'status', 'request', 'result', 'error', 'created', 'updated')
+    _JSON_COLUMNS = ('request', 'result')
+
+    def __init__(self, path: str, ttl: float = None, stale_after: float = None):
+        super().__init__(ttl, stale_after)
+        self.path = path
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False, isolation_level=None, timeout=30)
+        # Also switches back a file an earlier version left in WAL mode
+        self._conn.execute('PRAGMA journal_mode=DELETE')
+        self._conn.execute(
+            'CREATE TABLE IF NOT EXISTS jobs (id TEXT PRIMARY KEY, input_hash TEXT NOT NULL UNIQUE, '
+            'status TEXT NOT NULL, request TEXT, result TEXT, error TEXT, created REAL NOT NULL, updated REAL NOT NULL)'
+        )
+
+    def _job(self, row) -> Optional[Dict[str, Any]]:
+        if row is None:
+            return None
+        job = dict(zip(self._COLUMNS, row))
+        for column in self._JSON_COLUMNS:
+            if job[column] is not None:
+                job[column] = json.loads(job[column])
+        return job
+
+    def _select(self, where: str, value: str) -> Optional[Dict[str, Any]]:
+        row = self._conn.execute(f"SELECT {', '.join(self._COLUMNS)} FROM jobs WHERE {where} = ?", (value,)).fetchone()
+        return self._job(row)
+
+    def submit(self, input_hash: str, request: Dict[str, Any]) -> Tuple[Dict[str, Any], bool]:
+        now = time.time()
+        with self._lock:
+            self._conn.execute('BEGIN IMMEDIATE')
+            try:
+                existing = self._select('input_hash', input_hash)
+                if self.reusable(existing, now):
+                    self._conn.execute('COMMIT')
+                    return existing, False
+                job = self.new_job(input_hash, request, now)
+                self._conn.execute('DELETE FROM jobs WHERE input_hash = ?', (input_hash,))
+                self._conn.execute(
+                    f"INSERT INTO jobs ({', '.join(self._COLUMNS)}) VALUES ({', '.join('?' * len(self._COLUMNS))})",
+                    tuple(json.dumps(job[c]) if c in self._JSON_COLUMNS and job[c] is not None else job[c]
+                          for c in self._COLUMNS)
+                )
+                self._conn.execute('COMMIT')
+                return job, True
+            except BaseException:
+                self._conn.execute('ROLLBACK')
+                raise
+
+    def get(self, job_id: str) -> Optional[Dict[str, Any]]:
+        with self._lock:
+            return self._select('id', job_id)
+
+    def update(self, job_id: str, **changes):
+        changes['updated'] = time.time()
+        columns = [column for column in changes if column in self._COLUMNS and column != 'id']
+        values = [json.dumps(changes[c]) if c in self._JSON_COLUMNS and changes[c] is not None else changes[c]
+                  for c in columns]
+        with self._lock:
+            self._conn.execute(f"UPDATE jobs SET {', '.join(c + ' = ?' for c in columns)} WHERE id = ?",
+                               values + [job_id])
+
+    def purge_expired(self):
+        """Drop jobs past the TTL"""
+        with self._lock:
+            self._conn.execute('DELETE FROM jobs WHERE created < ?', (time.time() - self.ttl,))
+
+
+class DynamoDBJobStore(JobStore):
+    """
+    Jobs in a DynamoDB table with partition key ``input_hash``: one item per
+    input, replaced when a resubmission cannot reuse it. Conditional writes
+    keep one job per input hash across containers, and reads are strongly
+    consistent, so a poll sees a job as soon as its worker updates it.
+
+    A job id is its input hash and a random suffix, so ``get`` is a single
+    key lookup. Items carry ``expires`` (epoch seconds) for DynamoDB's TTL.
+    """
+
+    def __init__(self, table: str, ttl: float = None, stale_after: float = None, client=None):
+        super().__init__(ttl, stale_after)
+        self.table = table
+        self._client = client
+
+    @property
+    def client(self):
+        # Resolved on first use, like the Bedrock clients, so boto3 loads only when jobs are used
+        if self._client is None:
+            from bedrock_client import get_client
+            self._client = get_client('dynamodb')
+        return self._client
+
+    @staticmethod
+    def new_job(input_hash: str, request: Dict[str, Any], now: float) -> Dict[str, Any]:
+        job = JobStore.new_job(input_hash, request, now)
+        job['id'] = f"{input_hash}.{job['id']}"
+        return job
+
+    def _item(self, job: Dict[str, Any]) -> Dict[str, Dict[str, str]]:
+        item = {
+            'input_hash': {'S': job['input_hash']},
+            'id': {'S': job['id']},
+            'status': {'S': job['status']},
+            'request': {'S': json.dumps(job['request'])},
+            'created': {'N': repr(job['created'])},
+            'updated': {'N': repr(job['updated'])},
+            'expires': {'N': str(int(job['created'] + self.ttl))}
+        }
+        if job['result'] is not None:
+            item['result'] = {'S': json.dumps(job['result'])}
+        if job['error'] is not None:
+            item['error'] = {'S': job['error']}
+        return item
+
+    @staticmethod
+    def _job(item: Optional[Dict[str, Dict[str, str]]]) -> Optional[Dict[str, Any]]:
+        if not item:
+            return None
+        return {
+            'id': item['id']['S'],
+            'input_hash': item['input_hash']['S'],
+            'status': item['status']['S'],
+            'request': json.loads(item['request']['S']),
+            'result': json.loads(item['result']['S']) if 'result' in item else None,
+            'error': item['error']['S'] if 'error' in item else None,
+            'created': float(item['created']['N']),
+            'updated': float(item['updated']['N'])
+        }
+
+    def _read(self, input_hash: str) -> Optional[Dict[str, Any]]:
+        response = self.client.get_item(TableName=self.table, Key={'input_hash': {'S': input_hash}},
+                                        ConsistentRead=True)
+        return self._job(response.get('Item'))
+
+    def submit(self, input_hash: str, request: Dict[str, Any]) -> Tuple[Dict[str, Any], bool]:
+        while True:
+            now = time.time()
+            existing = self._read(input_hash)
+            if self.reusable(existing, now):
+                return existing, False
+            job = self.new_job(input_hash, request, now)
+            # Only create the item, or replace the job just read; another container may have got there first
+            if existing is None:
+                condition = {'ConditionExpression': 'attribute_not_exists(input_hash)'}
+            else:
+                condition = {'ConditionExpression': '#id = :id', 'ExpressionAttributeNames': {'#id': 'id'},
+                             'ExpressionAttributeValues': {':id': {'S': existing['id']}}}
+            try:
+                self.client.put_item(TableName=self.table, Item=self._item(job), **condition)
+            except Exception as e:
+                if getattr(e, 'response', {}).get('Error', {}).get('Code') != 'ConditionalCheckFailedException':
+                    raise
+                continue
+            return job, True
+
+    def get(self, job_id: str) -> Optional[Dict[str, Any]]:
+        job = self._read(job_id.split('.', 1)[0])
+        return job if job is not None and job['id'] == job_id else None
+
+    def update(self, job_id: str, **changes):
+        changes['updated'] = time.time()
+        names, values, assignments = {'#id': 'id'}, {':id': {'S': job_id}}, []
+        for i, column in enumerate(c for c in changes if c in ('status', 'result', 'error', 'updated')):
+            value = changes[column]
+            if value is None:
+                continue
+            if column == 'updated':
+                values[f':v{i}'] = {'N': repr(value)}
+            else:
+                values[f':v{i}'] = {'S': json.dumps(value) if column == 'result' else str(value)}
+            names[f'#c{i}'] = column
+            assignments.append(f'#c{i} = :v{i}')
+        try:
+            # A job replaced by a newer submission is left alone
+            self.client.update_item(
+                TableName=self.table, Key={'input_hash': {'S': job_id.split('.', 1)[0]}},
+                UpdateExpression='SET ' + ', '.join(assignments), ConditionExpression='#id = :id',
+                ExpressionAttributeNames=names, ExpressionAttributeValues=values
+            )
+        except Exception as e:
+            if getattr(e, 'response', {}).get('Error', {}).get('Code') != 'ConditionalCheckFailedException':
+                raise
+
+
+def run_job(store: JobStore, job_id: str, work: Callable[[Dict[str, Any]], Any]):
+    """Run ``work`` on a job's request and record its result or error in the store"""
+    job = store.get(job_id)
+    if job is None or job['status'] in FINISHED:
+        return
+    store.update(job_id, status=RUNNING)
+    try:
+        result = work(job['request'])
+    except Exception as e:
+        logger.error(f"Job {job_id} failed: {str(e)}")
+        store.update(job_id, status=FAILED, error=str(e))
+        return
+    store.update(job_id, status=SUCCEEDED, result=result)
+
+
+_store: Optional[JobStore] = None
+_store_lock = threading.Lock()
+
+
+def get_job_store() -> JobStore:
+    """Process-wide job store: DynamoDB at ESG_JOB_TABLE, else SQLite at ESG_JOB_STORE_PATH, else in memory"""
+    global _store
+    with _store_lock:
+        if _store is None:
+            if ESG_JOB_TABLE:
+                _store = DynamoDBJobStore(ESG_JOB_TABLE)
+            elif ESG_JOB_STORE_PATH:
+                _store = SQLiteJobStore(ESG_JOB_STORE_PATH)
+            else:
+                _store = MemoryJobStore()
+        return _store
@@ -0,0 +1,372 @@
+# Parsers for structured LLM output
+# Tolerates fenced, truncated or slightly malformed JSON, and works on text that
+# arrives in pieces so callers can act on results before generation finishes
+
+import json
+import re
+from dataclasses import MISSING, fields
+from typing import Any, Dict, List, Optional, Type, TypeVar, get_args, get_origin, get_type_hints
+
+T = TypeVar('T')
+
+_WHITESPACE = ' \t\r\n'
+_STRING_RUN = re.compile(r'[^"\'\\\n\r\t]+')
+_BARE_WORD = re.compile(r'[^\s,:\[\]{}"\'`]+')
+_NUMBER = re.compile(r'-?\d+(?:\.\d+)?(?:[eE][+-]?\d+)?')
+_LITERALS = {'true': 'true', 'false': 'false', 'null': 'null', 'True': 'true', 'False': 'false', 'None': 'null'}
+
+# "Environmental Score: 72", "**Social (35% weight):** 68.5/100", "\"governance_score\": 60"
+_SCORE_LABEL = re.compile(
+    r'\b(environmental|social|governance|overall)[\s_]*(?:score)?["\'*\s]*(?:\([^)]*\))?["\'*\s]*[:=]\s*["\'*\s]*(\d+(?:\.\d+)?)',
+    re.IGNORECASE
+)
+_COMPLIANCE_LABEL = re.compile(
+    r'\bcompliance[\s_]*level["\'*\s]*[:=]\s*["\'*\s]*([A-Za-z][A-Za-z -]*[A-Za-z])',
+    re.IGNORECASE
+)
+
+
+def repair_json(text: str) -> str:
+    """
+    Rewrite almost-JSON into JSON in a single pass.
+
+    Starts at the first ``{`` or ``[`` and stops after the value it opens, so
+    prose and code fences around it are dropped. Along the way it converts
+    single-quoted strings, unquoted keys and Python literals, drops trailing
+    commas and escapes raw newlines inside strings. Truncated output is cut
+    back to the last complete value and its open brackets are closed.
+    """
+    match = re.search(r'[\[{]', text)
+    if not match:
+        return text.strip()
+
+    out: List[str] = []
+    stack: List[str] = []
+    quote = None
+    pending_comma = False
+    # (length of out, open brackets) after the most recent complete value
+    safe_point = None
+    i, n = match.start(), len(text)
+
+    def value_done():
+        nonlocal safe_point
+        if stack:
+            safe_point = (len(out), list(stack))
+
+    while i < n:
+        char = text[i]
+        if quote:
+            run = _STRING_RUN.match(text, i)
+            if run:
+                out.append(run.group(0))
+                i = run.end()
+                continue
+            if char == '\\' and i + 1 < n:
+                out.append(text[i:i + 2])
+                i += 2
+                continue
+            if char == quote:
+                out.append('"')
+                quote = None
+                # A string followed by ':' is a key, not a complete value
+                j = i + 1
+                while j < n and text[j] in _WHITESPACE:
+                    j += 1
+                if j >= n or text[j] != ':':
+                    value_done()
+            elif char in '"\'':
+                # The other quote character, literal inside this string
+                out.append('\\"' if char == '"' else char)
+            elif char == '\n':
+                out.append('\\n')
+            elif char == '\t':
+                out.append('\\t')
+            elif char != '\r':
+                out.append(char)
+            i += 1
+            continue
+
+        if char in _WHITESPACE:
+            i += 1
+            continue
+        if char in '}]':
+            pending_comma = False
+            if char in stack:
+                while stack:
+                    closer = stack.pop()
+                    out.append(closer)
+                    if closer == char:
+                        break
+                value_done()
+            i += 1
+            if not stack:
+                break
+            continue
+        if char == '`':
+            # Closing code fence
+            break
+        if pending_comma:
+            out.append(',')
+            pending_comma = False
+
+        if char == ',':
+            pending_comma = True
+        elif char in '{[':
+            stack.append('}' if char == '{' else ']')
+            out.append(char)
+        elif char in '"\'':
+            quote = char
+            out.append('"')
+        elif char == ':':
+            out.append(':')
+        else:
+            word = _BARE_WORD.match(text, i).group(0)
+            i += len(word)
+            j = i
+            while j < n and text[j] in _WHITESPACE:
+                j += 1
+            if j < n and text[j] == ':':
+                out.append(json.dumps(word))
+            else:
+                out.append(_LITERALS.get(word) or (word if _NUMBER.fullmatch(word) else json.dumps(word)))
+                value_done()
+            continue
+        i += 1
+
+    if stack or quote:
+        if safe_point is not None:
+            del out[safe_point[0]:]
+            stack = safe_point[1]
+        else:
+            del out[1:]
+            stack = stack[:1]
+        out.extend(reversed(stack))
+    return ''.join(out)
+
+
+def parse_json(text: str, default: Any = None) -> Any:
+    """Decode the JSON value in an LLM response, repairing it if needed; ``default`` if hopeless"""
+    # Well-formed output, bare or wrapped in prose, decodes without a repair pass
+    match = re.search(r'[\[{]', text)
+    if not match:
+        return default
+    end = text.rfind('}' if match.group(0) == '{' else ']')
+    if end > match.start():
+        try:
+            return json.loads(text[match.start():end + 1])
+        except json.JSONDecodeError:
+            pass
+    try:
+        return json.loads(repair_json(text))
+    except json.JSONDecodeError:
+        return default
+
+
+def parse_json_array(text: str) -> List[Dict]:
+    """Objects from the JSON array in a response; an object wrapping an array is unwrapped"""
+    value = parse_json(text)
+    if isinstance(value, dict):
+        value = next((v for v in value.values() if isinstance(v, list)), [value])
+    if not isinstance(value, list):
+        return []
+    return [item for item in value if isinstance(item, dict)]
+
+
+def extract_scores(text: str) -> Dict[str, Any]:
+    """
+    Pillar/overall scores and compliance level from label lines or JSON keys.
+
+    Returns any of ``environmental``, ``social``, ``governance``, ``overall``
+    (floats) and ``compliance`` (str) that were found; the first mention wins.
+    """
+    scores: Dict[str, Any] = {}
+    for match in _SCORE_LABEL.finditer(text):
+        scores.setdefault(match.group(1).lower(), float(match.group(2)))
+    compliance = _COMPLIANCE_LABEL.search(text)
+    if compliance:
+        scores['compliance'] = compliance.group(1).strip()
+    return scores
+
+
+def to_float(value: Any) -> float:
+    """Numbers as LLMs write them: 72, '72.5', '72/100', '72%'"""
+    if isinstance(value, bool):
+        raise ValueError(f"Not a number: {value!r}")
+    if isinstance(value, (int, float)):
+        return float(value)
+    match = _NUMBER.search(str(value))
+    if not match:
+        raise ValueError(f"Not a number: {value!r}")
+    return float(match.group(0))
+
+
+def _normalize_key(key: str) -> str:
+    return re.sub(r'[^a-z0-9]', '', key.lower())
+
+
+def _coerce(value: Any, annotation: Any) -> Any:
+    origin = get_origin(annotation)
+    if annotation is float:
+        return to_float(value)
+    if annotation is str:
+        if isinstance(value, (dict, list)):
+            return json.dumps(value)
+        return str(value)
+    if origin is list:
+        items = value if isinstance(value, list) else [value]
+        item_type = (get_args(annotation) or (Any,))[0]
+        if item_type is str:
+            return [_coerce(item, str) for item in items]
+        return items
+    if origin is dict:
+        if not isinstance(value, dict):
+            raise ValueError(f"Not an object: {value!r}")
+        return value
+    return value
+
+
+def build_dataclass(cls: Type[T], data: Dict, defaults: Optional[Dict[str, Any]] = None,
+                    aliases: Optional[Dict[str, List[str]]] = None) -> T:
+    """
+    Construct a dataclass from a loosely shaped dict.
+
+    Keys match field names ignoring case and separators (``estimated_impact``
+    fills ``estimatedImpact``), ``aliases`` adds alternative names, and values
+    are coerced to the annotated type. Missing or unusable values take the
+    field's entry in ``defaults`` (callables are called); without one a
+    ValueError is raised.
+    """
+    defaults = defaults or {}
+    aliases = aliases or {}
+    hints = get_type_hints(cls)
+    normalized = {_normalize_key(key): value for key, value in data.items() if value is not None}
+    kwargs = {}
+    for field in fields(cls):
+        value = MISSING
+        for name in [field.name] + aliases.get(field.name, []):
+            if _normalize_key(name) in normalized:
+                value = normalized[_normalize_key(name)]
+                break
+        if value is not MISSING:
+            try:
+                kwargs[field.name] = _coerce(value, hints[field.name])
+                continue
+            except (TypeError, ValueError):
+                pass
+        if field.name not in defaults:
+            raise ValueError(f"{cls.__name__}: no usable value for '{field.name}'")
+        default = defaults[field.name]
+        kwargs[field.name] = default() if callable(default) else default
+    return cls(**kwargs)
+
+
+class IncrementalArrayParser:
+    """
+    Pulls the elements of a JSON array out of streamed text as soon as each one closes.
+
+    With ``key`` set, the array is the value of that key anywhere in the text
+    (e.g. ``"recommendations": [...]``); otherwise it is the first ``[`` seen,
+    which skips any prose the model writes before the JSON. Malformed elements
+    go through ``repair_json``; call ``finish`` at the end of the stream to
+    recover an element cut off by truncation.
+    """
+
+    def __init__(self, key: Optional[str] = None):
+        self._start = re.compile(r'"%s"\s*:\s*\[' % re.escape(key)) if key else re.compile(r'\[')
+        self._buffer = ''
+        self._pos = 0
+        self._in_array = False
+        self.done = False
+        # State of the element being scanned
+        self._element_start: Optional[int] = None
+        self._depth = 0
+        self._in_string = False
+        self._escaped = False
+
+    def feed(self, chunk: str) -> List[Any]:
+        """Add the next piece of text and return the elements completed by it"""
+        if self.done:
+            return []
+        self._buffer += chunk
+        if not self._in_array:
+            match = self._start.search(self._buffer)
+            if not match:
+                return []
+            self._in_array = True
+            self._pos = match.end()
+        return self._scan()
+
+    def finish(self) -> List[Any]:
+        """Flush a trailing element left open when the stream ended early"""
+        if self.done or self._element_start is None:
+            return []
+        completed: List[Any] = []
+        self._emit(len(self._buffer), completed)
+        self.done = True
+        # An element cut off before its first complete value repairs to {} or []
+        return [item for item in completed if item not in ({}, [])]
+
+    def _scan(self) -> List[Any]:
+        completed = []
+        buffer = self._buffer
+        while self._pos < len(buffer):
+            char = buffer[self._pos]
+            self._pos += 1
+
+            if self._element_start is None:
+                if char in _WHITESPACE or char == ',':
+                    continue
+                if char == ']':
+                    self.done = True
+                    break
+                self._element_start = self._pos - 1
+
+            if self._in_string:
+                if self._escaped:
+                    self._escaped = False
+                elif char == '\\':
+                    self._escaped = True
+                elif char == '"':
+                    self._in_string = False
+                    if self._depth == 0:
+                        self._emit(self._pos, completed)
+                continue
+
+            if char == '"':
+                self._in_string = True
+            elif char in '{[':
+                self._depth += 1
+            elif char in '}]':
+                if self._depth == 0:
+                    # Closing bracket of the array itself ends a trailing scalar element
+                    self._emit(self._pos - 1, completed)
+                    self.done = True
+                    break
+                self._depth -= 1
+                if self._depth == 0:
+                    self._emit(self._pos, completed)
+            elif char == ',' and self._depth == 0:
+                self._emit(self._pos - 1, completed)
+
+        # Keep only the unfinished element so the buffer stays small
+        if self._element_start is not None:
+            self._buffer = buffer[self._element_start:]
+            self._pos -= self._element_start
+            self._element_start = 0
+        else:
+            self._buffer = ''
+            self._pos = 0
+        return completed
+
+    def _emit(self, end: int, completed: List[Any]):
+        text = self._buffer[self._element_start:end].strip()
+        self._element_start = None
+        self._depth = 0
+        if not text:
+            return
+        try:
+            completed.append(json.loads(text))
+        except json.JSONDecodeError:
+            value = parse_json(text)
+            if value is not None:
+                completed.append(value)
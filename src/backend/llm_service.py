@@ -1,24 +1,106 @@
 # LLM Analysis Service for ESGenius
 # This is placeholder code for AWS Bedrock integration
 
-import boto3
+import asyncio
 import json
-from typing import Dict, List, Any
+from typing import AsyncIterator, Dict, List, Any, Optional, Tuple
 from dataclasses import dataclass
 
+from bedrock_client import AsyncBedrockClient, get_async_client
+from crosswalk import get_crosswalk
+from metrics import incr, timed
+from llm_parser import IncrementalArrayParser, build_dataclass, extract_scores, parse_json, parse_json_array, to_float
+from opportunity_index import (ESG_OPPORTUNITY_RERANK, ESG_OPPORTUNITY_RERANK_MARGIN, ESG_OPPORTUNITY_TOP_K,
+                               OpportunityIndex, OpportunityMatch, company_query, get_opportunity_index)
+from peer_benchmarks import PeerBenchmarks, get_peer_benchmarks
+from prompt_budget import PROMPT_TOKEN_BUDGET, chunk_responses, fit_responses, summarize_responses
+from prompt_templates import Prompt, PromptTemplate, request_body
+from scoring_engine import determine_compliance_level, get_rubric
+
 @dataclass
 class ESGAnalysisResult:
+    # Slotted: no per-instance __dict__; serialization.dumps writes it from its fields
+    __slots__ = ('overall_score', 'category_scores', 'recommendations', 'compliance_gaps', 'action_items')
     overall_score: float
     category_scores: Dict[str, float]
     recommendations: List[str]
     compliance_gaps: List[str]
     action_items: List[Dict[str, Any]]
 
+# Prompts: the invariant instructions and output schema first, as the system block, then the
+# company's data
+ANALYSIS_PROMPT = PromptTemplate('analysis', """
+    You are an expert ESG compliance analyst specializing in Malaysian sustainability frameworks.
+
+    Please analyze the ESG assessment below and provide:
+
+    1. WEIGHTED SCORES (JSON format):
+       - Environmental (40% weight): X.X/100
+       - Social (35% weight): X.X/100
+       - Governance (25% weight): X.X/100
+       - Overall Score: X.X/100
+
+    2. COMPLIANCE LEVEL:
+       - 0-49: "Needs Foundation"
+       - 50-74: "Progressing"
+       - 75+: "Financing-Ready"
+
+    3. TOP 5 SPECIFIC RECOMMENDATIONS for improvement
+
+    4. CRITICAL COMPLIANCE GAPS that need immediate attention
+
+    5. ACTIONABLE NEXT STEPS with timeline and priority (High/Medium/Low)
+
+    Consider Malaysian context, the peer benchmarks given with the company profile
+    when there are any, and MSMEs challenges.
+    Format as a single JSON object with keys, in this order:
+    "overall_score", "category_scores" (Environmental/Social/Governance),
+    "compliance_level", "recommendations" (array of strings),
+    "compliance_gaps" (array of strings), and "action_items"
+    (array of objects with task, priority, timeline, framework_reference).
+    """, """
+    {scope}
+    Company Profile:
+    - Name: {name}
+    - Industry: {industry}
+    - Size: {size} ({employees} employees)
+    - Revenue: RM {revenue}
+    - Location: {location}
+
+    Framework: {framework}
+    {peer_context}
+
+    Assessment Responses:
+    {responses}
+    """)
+
+RERANK_PROMPT = PromptTemplate('rerank', """
+    Order the candidate Malaysian programmes for the MSME below from most to
+    least relevant. Only use the candidates listed; do not add programmes.
+
+    Return as JSON array of objects with keys: index (the candidate number)
+    and reasoning (one sentence on why it fits this company).
+    """, """
+    Company: {name}
+    Industry: {industry}
+    Size: {size}
+    ESG Score: {esg_score}%
+    Location: {location}
+
+    Candidate Malaysian programmes for this MSME:
+    {candidates}
+    """)
+
 class ESGLLMAnalyzer:
-    def __init__(self):
-        # Initialize AWS Bedrock client
-        self.bedrock = boto3.client('bedrock-runtime', region_name='ap-southeast-1')
+    def __init__(self, bedrock: Optional[AsyncBedrockClient] = None, prompt_budget: Optional[int] = None,
+                 benchmarks: Optional[PeerBenchmarks] = None):
+        # Non-blocking Bedrock client, shared process-wide unless one is passed in
+        self.bedrock = bedrock or get_async_client()
         self.model_id = "anthropic.claude-3-sonnet-20240229-v1:0"
+        # Tokens allowed for the responses block; larger assessments are analyzed in chunks
+        self.prompt_budget = prompt_budget or PROMPT_TOKEN_BUDGET
+        # Peer score quartiles given to the model in place of guessed industry benchmarks
+        self.benchmarks = benchmarks or get_peer_benchmarks()
     
     async def analyze_esg_compliance(self, company_data: Dict, framework: str, responses: List[Dict]) -> ESGAnalysisResult:
         """
@@ -33,182 +115,352 @@ class ESGLLMAnalyzer:
             ESGAnalysisResult with scores and recommendations
         """
         
-        # Construct prompt for LLM analysis
-        prompt = self._build_analysis_prompt(company_data, framework, responses)
-        
-        try:
-            # Call AWS Bedrock
-            response = self.bedrock.invoke_model(
-                modelId=self.model_id,
-                body=json.dumps({
-                    "anthropic_version": "bedrock-2023-05-31",
-                    "max_tokens": 4000,
-                    "messages": [{"role": "user", "content": prompt}]
-                })
-            )
+        with timed('analysis'):
+            try:
+                table = fit_responses(responses, self.prompt_budget)
+                if table is None:
+                    return await self._map_reduce_analysis(company_data, framework, responses)
             
-            # Parse LLM response
-            result = json.loads(response['body'].read())
-            analysis = self._parse_llm_response(result['content'][0]['text'])
+                # Construct prompt for LLM analysis
+                prompt = self._build_analysis_prompt(company_data, framework, table)
+                return await self._analyze_prompt(prompt)
             
-            return analysis
-            
-        except Exception as e:
-            print(f"Error in LLM analysis: {e}")
-            # Return fallback analysis
-            return self._fallback_analysis(responses)
+            except Exception as e:
+                print(f"Error in LLM analysis: {e}")
+                # Return fallback analysis
+                return self._fallback_analysis(responses, framework)
     
-    def _build_analysis_prompt(self, company_data: Dict, framework: str, responses: List[Dict]) -> str:
-        """Build comprehensive prompt for ESG analysis"""
+    async def analyze_frameworks(self, company_data: Dict, frameworks: List[str],
+                                 responses: List[Dict]) -> Tuple[ESGAnalysisResult, List[Dict]]:
+        """
+        Analyze one set of responses against several frameworks with one analysis
         
-        prompt = f"""
-        You are an expert ESG compliance analyst specializing in Malaysian sustainability frameworks.
+        The responses are projected through the criterion crosswalk onto the
+        first framework and analyzed once; every framework is then scored by
+        its rubric, shifted by the LLM-vs-rubric gap on the analyzed one.
         
-        Company Profile:
-        - Name: {company_data.get('name')}
-        - Industry: {company_data.get('industry')}
-        - Size: {company_data.get('size')} ({company_data.get('employees')} employees)
-        - Revenue: RM {company_data.get('revenue')}
-        - Location: {company_data.get('location')}
+        Returns:
+            The ESGAnalysisResult and one FrameworkScore dict per framework
+        """
+        crosswalk = get_crosswalk()
+        rubric = get_rubric(frameworks[0])
+        projected = crosswalk.project(responses, rubric, keep_unmapped=True)
+        analysis = await self.analyze_esg_compliance(company_data, frameworks[0], projected)
         
-        Framework: {framework}
+        offset = 0.0
+        if rubric.coverage(projected):
+            offset = analysis.overall_score - rubric.score(projected)['overall_score']
+        return analysis, crosswalk.framework_scores(responses, frameworks, offset)
+    
+    async def _analyze_prompt(self, prompt: Prompt) -> ESGAnalysisResult:
+        # Call AWS Bedrock without blocking the event loop
+        result = await self.bedrock.invoke_model(self.model_id, request_body(prompt, max_tokens=4000))
         
-        Assessment Responses:
+        # Parse LLM response
+        return self._parse_llm_response(result['content'][0]['text'])
+    
+    async def _map_reduce_analysis(self, company_data: Dict, framework: str, responses: List[Dict]) -> ESGAnalysisResult:
         """
-        
-        for response in responses:
-            prompt += f"""
-        Criterion: {response.get('criterionId')}
-        Score: {response.get('score')}/100
-        Evidence: {response.get('evidence')}
-        Notes: {response.get('notes', 'N/A')}
-        ---
+        Analyze an assessment too large for one prompt: chunks of criteria are
+        analyzed concurrently and the partial results merged, weighted by chunk size
         """
+        chunks = chunk_responses(responses, self.prompt_budget)
+        results = await asyncio.gather(*(
+            self._analyze_prompt(self._build_analysis_prompt(
+                company_data, framework,
+                fit_responses(chunk, self.prompt_budget) or summarize_responses(chunk, self.prompt_budget),
+                part=(index + 1, len(chunks))))
+            for index, chunk in enumerate(chunks)
+        ))
+        weights = [len(chunk) for chunk in chunks]
         
-        prompt += """
-        
-        Please analyze this ESG assessment and provide:
+        category_scores = {}
+        for category in dict.fromkeys(c for result in results for c in result.category_scores):
+            weighted = [(r.category_scores[category], w) for r, w in zip(results, weights) if category in r.category_scores]
+            category_scores[category] = round(sum(s * w for s, w in weighted) / sum(w for _, w in weighted), 1)
         
-        1. WEIGHTED SCORES (JSON format):
-           - Environmental (40% weight): X.X/100
-           - Social (35% weight): X.X/100  
-           - Governance (25% weight): X.X/100
-           - Overall Score: X.X/100
+        # Interleave so every chunk's strongest recommendation comes first
+        recommendations = []
+        for rank in range(max(len(r.recommendations) for r in results)):
+            for result in results:
+                if rank < len(result.recommendations) and result.recommendations[rank] not in recommendations:
+                    recommendations.append(result.recommendations[rank])
         
-        2. COMPLIANCE LEVEL:
-           - 0-49: "Needs Foundation" 
-           - 50-74: "Progressing"
-           - 75+: "Financing-Ready"
+        return ESGAnalysisResult(
+            overall_score=round(sum(r.overall_score * w for r, w in zip(results, weights)) / sum(weights), 1),
+            category_scores=category_scores,
+            recommendations=recommendations[:5],
+            compliance_gaps=list(dict.fromkeys(gap for r in results for gap in r.compliance_gaps)),
+            action_items=list({json.dumps(item, sort_keys=True): item for r in results for item in r.action_items}.values())
+        )
+    
+    async def stream_recommendations(self, company_data: Dict, framework: str, responses: List[Dict]) -> AsyncIterator[str]:
+        """
+        Stream the analysis and yield each recommendation as soon as the model finishes writing it
         
-        3. TOP 5 SPECIFIC RECOMMENDATIONS for improvement
+        Falls back to the static recommendations if none arrive.
+        """
+        prompt = self._build_analysis_prompt(company_data, framework,
+                                             summarize_responses(responses, self.prompt_budget))
+        parser = IncrementalArrayParser(key='recommendations')
+        count = 0
         
-        4. CRITICAL COMPLIANCE GAPS that need immediate attention
+        stream = self.bedrock.stream_model(self.model_id, request_body(prompt, max_tokens=4000))
+        try:
+            async for delta in stream:
+                for recommendation in parser.feed(delta):
+                    if isinstance(recommendation, str):
+                        count += 1
+                        yield recommendation
+                if parser.done:
+                    break
+            for recommendation in parser.finish():
+                if isinstance(recommendation, str):
+                    count += 1
+                    yield recommendation
+        except Exception as e:
+            print(f"Error streaming LLM analysis: {e}")
+        finally:
+            # Release the concurrency slot now rather than when the generator is collected
+            await stream.aclose()
         
-        5. ACTIONABLE NEXT STEPS with timeline and priority (High/Medium/Low)
+        if count == 0:
+            for recommendation in self._fallback_analysis(responses, framework).recommendations:
+                yield recommendation
+    
+    @timed('prompt')
+    def _build_analysis_prompt(self, company_data: Dict, framework: str, responses_table: str,
+                               part: Optional[tuple] = None) -> Prompt:
+        """
+        Build comprehensive prompt for ESG analysis
         
-        Consider Malaysian context, industry benchmarks, and MSMEs challenges.
-        Format as structured JSON for easy parsing.
+        ``responses_table`` comes from ``prompt_budget``; ``part`` is (i, n) when
+        the assessment is analyzed in chunks.
         """
         
-        return prompt
+        scope = ""
+        if part:
+            scope = (f"This is part {part[0]} of {part[1]} of a large assessment; "
+                     "analyze only the criteria below.")
+        return ANALYSIS_PROMPT.render(
+            scope=scope,
+            name=company_data.get('name'),
+            industry=company_data.get('industry'),
+            size=company_data.get('size'),
+            employees=company_data.get('employees'),
+            revenue=company_data.get('revenue'),
+            location=company_data.get('location'),
+            framework=framework,
+            peer_context=self.benchmarks.peer_context(framework, company_data),
+            responses=responses_table
+        )
     
+    @timed('parse')
     def _parse_llm_response(self, llm_output: str) -> ESGAnalysisResult:
-        """Parse structured LLM response into analysis result"""
+        """
+        Parse structured LLM response into analysis result
         
-        # In production, implement robust JSON parsing from LLM response
-        # For now, return mock structured data
+        Tolerates code fences, trailing commas and truncated output. Raises
+        ValueError when no overall score can be recovered, so the caller falls
+        back to the deterministic analysis.
+        """
+        data = parse_json(llm_output)
+        if not isinstance(data, dict):
+            data = {}
+        # Scores written as label lines or nested under other keys
+        labelled = extract_scores(llm_output)
         
-        return ESGAnalysisResult(
-            overall_score=72.5,
-            category_scores={
-                "Environmental": 68.0,
-                "Social": 75.0,
-                "Governance": 78.0
-            },
-            recommendations=[
-                "Implement energy monitoring system to track consumption",
-                "Develop formal employee wellness program",
-                "Create supplier ESG assessment process",
-                "Establish waste reduction targets with KPIs",
-                "Document board diversity and governance policies"
-            ],
-            compliance_gaps=[
-                "Missing environmental impact measurement",
-                "No formal diversity and inclusion policy",
-                "Incomplete supply chain sustainability assessment"
-            ],
-            action_items=[
-                {
-                    "task": "Install smart meters for energy monitoring",
-                    "priority": "High",
-                    "timeline": "3 months",
-                    "framework_reference": "NSRF Environmental Criteria 2.1"
-                },
-                {
-                    "task": "Develop D&I policy document",
-                    "priority": "Medium", 
-                    "timeline": "6 weeks",
-                    "framework_reference": "i-ESG Social Governance 3.2"
-                }
-            ]
+        category_scores = {}
+        for category, score in (data.get('category_scores') or {}).items():
+            try:
+                category_scores[category] = to_float(score)
+            except ValueError:
+                continue
+        if not category_scores:
+            category_scores = {
+                pillar.capitalize(): labelled[pillar]
+                for pillar in ('environmental', 'social', 'governance')
+                if pillar in labelled
+            }
+        if 'overall_score' not in data and 'overall' in labelled:
+            data['overall_score'] = labelled['overall']
+        data['category_scores'] = category_scores
+        
+        # Recommendations may come back as objects rather than strings
+        data['recommendations'] = [
+            rec.get('title') or rec.get('description') or json.dumps(rec) if isinstance(rec, dict) else rec
+            for rec in data.get('recommendations') or []
+        ]
+        data['action_items'] = [item for item in data.get('action_items') or [] if isinstance(item, dict)]
+        
+        return build_dataclass(
+            ESGAnalysisResult, data,
+            defaults={'recommendations': list, 'compliance_gaps': list, 'action_items': list},
+            aliases={'compliance_gaps': ['gaps']}
         )
     
-    def _fallback_analysis(self, responses: List[Dict]) -> ESGAnalysisResult:
+    def _fallback_analysis(self, responses: List[Dict], framework: str = 'NSRF') -> ESGAnalysisResult:
         """Provide fallback analysis when LLM is unavailable"""
+        incr('fallback_analysis')
         
-        # Calculate simple average score
-        total_score = sum(r.get('score', 0) for r in responses)
-        avg_score = total_score / len(responses) if responses else 0
+        # Weighted rubric scores (E 40% / S 35% / G 25%) when the responses map onto the framework
+        rubric = get_rubric(framework)
+        if rubric.coverage(responses):
+            scores = rubric.score(responses)
+            overall_score = scores['overall_score']
+            category_scores = {
+                "Environmental": scores['environmental_score'],
+                "Social": scores['social_score'],
+                "Governance": scores['governance_score']
+            }
+        else:
+            # Calculate simple average score
+            total_score = sum(r.get('score', 0) for r in responses)
+            overall_score = total_score / len(responses) if responses else 0
+            category_scores = {"Overall": overall_score}
         
         return ESGAnalysisResult(
-            overall_score=avg_score,
-            category_scores={"Overall": avg_score},
+            overall_score=overall_score,
+            category_scores=category_scores,
             recommendations=["Complete detailed assessment for personalized recommendations"],
             compliance_gaps=["Detailed analysis unavailable - please retry"],
             action_items=[]
         )
 
 class OpportunityMatcher:
-    """Match companies with relevant Malaysian grants and opportunities"""
+    """
+    Match companies with relevant Malaysian grants and opportunities.
+    
+    Candidates come from the local BM25 index (``opportunity_index.py``),
+    filtered by the company's industry, size, location and ESG score, so the
+    same profile always gets the same matches. The LLM only reranks and explains
+    the top candidates, and only when ``rerank`` asks for it.
+    """
+    
+    # Query terms added for each compliance band, steering towards what that band can use
+    LEVEL_TERMS = {
+        'needs-foundation': ['training', 'capacity building', 'advisory', 'foundation'],
+        'progressing': ['certification', 'energy efficiency', 'financing'],
+        'financing-ready': ['financing', 'sustainability-linked', 'tax allowance', 'excellence']
+    }
     
-    def __init__(self):
-        self.bedrock = boto3.client('bedrock-runtime', region_name='ap-southeast-1')
+    def __init__(self, bedrock: Optional[AsyncBedrockClient] = None, index: Optional[OpportunityIndex] = None,
+                 rerank: Optional[str] = None, top_k: Optional[int] = None):
+        self.bedrock = bedrock or get_async_client()
+        self.model_id = "anthropic.claude-3-sonnet-20240229-v1:0"
+        self.index = index
+        # 'never', 'ambiguous' (top two candidates too close to call) or 'always'
+        self.rerank = rerank or ESG_OPPORTUNITY_RERANK
+        self.top_k = top_k or ESG_OPPORTUNITY_TOP_K
     
     async def find_opportunities(self, company_data: Dict, esg_score: float) -> List[Dict]:
         """
-        Find relevant grants and business opportunities using LLM reasoning
+        Find relevant grants, tax incentives, financing and certifications
         
         Returns list of opportunities with match probability and reasoning
         """
+        with timed('opportunities'):
+            try:
+                matches = self._retrieve(company_data, esg_score)
+            except Exception as e:
+                print(f"Error in opportunity matching: {e}")
+                return self._fallback_opportunities()
+            
+            opportunities = [self._opportunity(match, matches[0].score, esg_score) for match in matches]
+            if self._needs_rerank(matches):
+                opportunities = await self._rerank(company_data, esg_score, opportunities)
+            return opportunities
+    
+    @timed('retrieval')
+    def _retrieve(self, company_data: Dict, esg_score: float) -> List[OpportunityMatch]:
+        index = self.index or get_opportunity_index()
+        query = company_query(company_data, self.LEVEL_TERMS[determine_compliance_level(esg_score)])
+        return index.search(
+            query, k=self.top_k,
+            industry=company_data.get('industry'),
+            size=company_data.get('size'),
+            location=company_data.get('location'),
+            esg_score=esg_score
+        )
+    
+    def _needs_rerank(self, matches: List[OpportunityMatch]) -> bool:
+        if self.rerank == 'always':
+            return len(matches) > 1
+        if self.rerank != 'ambiguous' or len(matches) < 2 or not matches[0].score:
+            return False
+        return (matches[0].score - matches[1].score) / matches[0].score < ESG_OPPORTUNITY_RERANK_MARGIN
+    
+    def _opportunity(self, match: OpportunityMatch, best_score: float, esg_score: float) -> Dict:
+        """A retrieved record in the response shape, with a deterministic probability and reasoning"""
+        record = match.record
+        reasons = []
+        if match.matched_terms:
+            reasons.append(f"Matches {', '.join(match.matched_terms[:5])}")
+        restrictions = [
+            value for value in (', '.join(record.industries), ', '.join(record.sizes), ', '.join(record.locations))
+            if value
+        ]
+        if restrictions:
+            reasons.append(f"open to {'; '.join(restrictions)}")
+        if record.min_esg_score:
+            reasons.append(f"ESG score {esg_score:g} meets the minimum of {record.min_esg_score:g}")
+        return {
+            "name": record.name,
+            "type": record.type,
+            "amount": record.amount,
+            "match_probability": round(40 + 55 * match.score / best_score) if best_score else 40,
+            "authority": record.authority,
+            "eligibility": record.eligibility,
+            "timeline": record.timeline,
+            "reasoning": '; '.join(reasons) or "Eligible for this company profile"
+        }
+    
+    async def _rerank(self, company_data: Dict, esg_score: float, opportunities: List[Dict]) -> List[Dict]:
+        """Order and explain the candidates with the LLM; any failure keeps the retrieval order"""
+        incr('opportunity_reranks')
+        try:
+            result = await self.bedrock.invoke_model(self.model_id, request_body(
+                self._build_rerank_prompt(company_data, esg_score, opportunities), max_tokens=1000, temperature=0))
+            ranked = self._parse_opportunities(result['content'][0]['text'])
+        except Exception as e:
+            print(f"Error in opportunity reranking: {e}")
+            return opportunities
         
-        prompt = f"""
-        Company: {company_data.get('name')} 
-        Industry: {company_data.get('industry')}
-        Size: {company_data.get('size')}
-        ESG Score: {esg_score}%
-        Location: {company_data.get('location')}
-        
-        Based on this Malaysian MSME profile, identify the TOP 5 most relevant:
-        
-        1. GOVERNMENT GRANTS (with specific program names, amounts, eligibility)
-        2. TAX INCENTIVES (Green Investment Tax Allowance, etc.)
-        3. FINANCING OPPORTUNITIES (Green loans, ESG bonds)
-        4. BUSINESS PARTNERSHIPS (Supply chain, ESG-focused companies)
-        5. CERTIFICATION PROGRAMS (MS ISO 14001, etc.)
-        
-        For each opportunity, provide:
-        - Program name and authority
-        - Funding amount/benefit
-        - Match probability (0-100%)
-        - Key eligibility criteria
-        - Application timeline
-        - Strategic reasoning for recommendation
-        
-        Focus on 2024-2025 available programs in Malaysia.
-        """
-        
-        # In production: call Bedrock with this prompt
-        # Return structured opportunity data
+        reordered, seen = [], set()
+        for item in ranked:
+            try:
+                position = int(to_float(item.get('index'))) - 1
+            except ValueError:
+                continue
+            if 0 <= position < len(opportunities) and position not in seen:
+                seen.add(position)
+                reasoning = item.get('reasoning')
+                reordered.append({**opportunities[position], **({"reasoning": reasoning} if reasoning else {})})
+        return reordered + [opp for position, opp in enumerate(opportunities) if position not in seen]
+    
+    @timed('prompt')
+    def _build_rerank_prompt(self, company_data: Dict, esg_score: float, opportunities: List[Dict]) -> Prompt:
+        candidates = '\n'.join(
+            f"{i}. {opp['name']} ({opp['type']}, {opp['authority']}): {opp['amount']}. Eligibility: {opp['eligibility']}"
+            for i, opp in enumerate(opportunities, 1)
+        )
+        return RERANK_PROMPT.render(
+            name=company_data.get('name'),
+            industry=company_data.get('industry'),
+            size=company_data.get('size'),
+            esg_score=esg_score,
+            location=company_data.get('location'),
+            candidates=candidates
+        )
+    
+    @timed('parse')
+    def _parse_opportunities(self, llm_output: str) -> List[Dict]:
+        """Extract the JSON array of opportunities from the LLM response"""
+        return parse_json_array(llm_output)
+    
+    def _fallback_opportunities(self) -> List[Dict]:
+        """Static opportunity list used when the catalogue is unavailable"""
+        incr('fallback_opportunities')
         
         return [
             {
@@ -228,6 +480,11 @@ class OpportunityMatcher:
 # In Lambda function or API endpoint:
 
 from llm_service import ESGLLMAnalyzer, OpportunityMatcher
+from resilience import deadline_scope, lambda_deadline
+from serialization import dumps
+
+# Both services share the process-wide client from get_async_client(),
+# so they respect the same in-flight cap, circuit breakers and connections
 
 async def analyze_assessment(event, context):
     analyzer = ESGLLMAnalyzer()
@@ -237,21 +494,23 @@ async def analyze_assessment(event, context):
     responses = event['responses']
     framework = event['framework']
     
-    # Perform LLM analysis
-    analysis = await analyzer.analyze_esg_compliance(
-        company_data, framework, responses
-    )
-    
-    # Find opportunities
-    matcher = OpportunityMatcher()
-    opportunities = await matcher.find_opportunities(
-        company_data, analysis.overall_score
-    )
+    # Bedrock calls give up early enough to return the fallback in time
+    with deadline_scope(lambda_deadline(context)):
+        # Perform LLM analysis
+        analysis = await analyzer.analyze_esg_compliance(
+            company_data, framework, responses
+        )
+        
+        # Find opportunities
+        matcher = OpportunityMatcher()
+        opportunities = await matcher.find_opportunities(
+            company_data, analysis.overall_score
+        )
     
     return {
         'statusCode': 200,
-        'body': json.dumps({
-            'analysis': analysis.__dict__,
+        'body': dumps({
+            'analysis': analysis,
             'opportunities': opportunities
         })
     }
@@ -0,0 +1,195 @@
+# Per-request instrumentation
+# Stage timers, Bedrock token usage and cache/fallback counters, emitted as one structured log line per request
+
+import contextvars
+import io
+import json
+import logging
+import os
+import random
+import threading
+import time
+from contextlib import contextmanager
+from typing import TYPE_CHECKING, Any, Dict, Iterator, List, Optional
+
+if TYPE_CHECKING:
+    import cProfile
+
+# 'false' keeps measuring but stops printing the per-request line, e.g. in benchmarks
+ESG_METRICS_ENABLED = os.getenv('ESG_METRICS_ENABLED', 'true').lower() != 'false'
+# CloudWatch namespace for the embedded-metric-format log line
+ESG_METRICS_NAMESPACE = os.getenv('ESG_METRICS_NAMESPACE', 'ESGenius')
+# Fraction of requests run under cProfile (0 disables, 1 profiles every request)
+ESG_PROFILE_SAMPLE_RATE = float(os.getenv('ESG_PROFILE_SAMPLE_RATE', '0'))
+# Functions listed, by cumulative time, for a profiled request
+ESG_PROFILE_TOP = int(os.getenv('ESG_PROFILE_TOP', '25'))
+
+logger = logging.getLogger(__name__)
+
+
+class RequestMetrics:
+    """
+    Everything measured while handling one request.
+
+    Stage timers are inclusive (``scores`` contains its ``bedrock`` call) and
+    a stage that runs more than once, e.g. one Bedrock call per chunk, adds up.
+    Worker threads share this object through context variables, hence the lock.
+    """
+
+    def __init__(self, operation: str, profile: bool = False):
+        self.operation = operation
+        self.started = time.perf_counter()
+        self.stages: Dict[str, List[float]] = {}
+        self.counters: Dict[str, int] = {}
+        self.properties: Dict[str, Any] = {}
+        self.profile = profile
+        self.profiles: List['cProfile.Profile'] = []
+        self.thread_id = threading.get_ident()
+        self._lock = threading.Lock()
+
+    def add_time(self, stage: str, seconds: float):
+        with self._lock:
+            entry = self.stages.setdefault(stage, [0, 0.0])
+            entry[0] += 1
+            entry[1] += seconds
+
+    def incr(self, name: str, amount: int = 1):
+        with self._lock:
+            self.counters[name] = self.counters.get(name, 0) + amount
+
+    def record(self) -> Dict[str, Any]:
+        """The log record, in CloudWatch embedded metric format so the values also become metrics"""
+        with self._lock:
+            values: Dict[str, Any] = {'duration_ms': round((time.perf_counter() - self.started) * 1000, 1)}
+            units = {'duration_ms': 'Milliseconds'}
+            for stage, (calls, seconds) in self.stages.items():
+                values[f'{stage}_ms'] = round(seconds * 1000, 1)
+                units[f'{stage}_ms'] = 'Milliseconds'
+                if calls > 1:
+                    values[f'{stage}_calls'] = calls
+                    units[f'{stage}_calls'] = 'Count'
+            for name, count in self.counters.items():
+                values[name] = count
+                units[name] = 'Count'
+            properties = dict(self.properties)
+        return {
+            '_aws': {
+                'Timestamp': int(time.time() * 1000),
+                'CloudWatchMetrics': [{
+                    'Namespace': ESG_METRICS_NAMESPACE,
+                    'Dimensions': [['operation']],
+                    'Metrics': [{'Name': name, 'Unit': unit} for name, unit in units.items()]
+                }]
+            },
+            'operation': self.operation,
+            **properties,
+            **values
+        }
+
+
+_current: contextvars.ContextVar[Optional[RequestMetrics]] = contextvars.ContextVar('request_metrics', default=None)
+
+
+def current_metrics() -> Optional[RequestMetrics]:
+    return _current.get()
+
+
+@contextmanager
+def request_metrics(operation: str, profile: Optional[bool] = None, **properties) -> Iterator[RequestMetrics]:
+    """
+    Measure one request and log its metrics as a single JSON line on exit.
+
+    With ``ESG_PROFILE_SAMPLE_RATE`` set, that fraction of requests also runs
+    under cProfile (stage worker threads included) and logs its top functions.
+    """
+    if profile is None:
+        profile = ESG_PROFILE_SAMPLE_RATE > 0 and random.random() < ESG_PROFILE_SAMPLE_RATE
+    metrics = RequestMetrics(operation, profile)
+    metrics.properties.update(properties)
+    profiler = _start_profile(metrics) if profile else None
+    token = _current.set(metrics)
+    try:
+        yield metrics
+    finally:
+        _current.reset(token)
+        if profiler is not None:
+            profiler.disable()
+        # Printed rather than logged: CloudWatch only extracts metrics from lines that are pure JSON
+        if ESG_METRICS_ENABLED:
+            print(json.dumps(metrics.record(), default=str), flush=True)
+        if metrics.profiles:
+            logger.info(f"Profile for {operation}:\n{_profile_report(metrics.profiles)}")
+
+
+@contextmanager
+def timed(stage: str) -> Iterator[None]:
+    """
+    Add the wall time of the block to the current request's ``stage`` timer
+    (no-op outside a request). Also works as a decorator on plain functions.
+    """
+    metrics = _current.get()
+    if metrics is None:
+        yield
+        return
+    # A profiled request's stages on worker threads get profilers of their own
+    profiler = None
+    if metrics.profile and threading.get_ident() != metrics.thread_id:
+        profiler = _start_profile(metrics)
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        metrics.add_time(stage, time.perf_counter() - started)
+        if profiler is not None:
+            profiler.disable()
+
+
+def annotate(**properties):
+    """Attach properties (not metrics), e.g. the request mode, to the current request's log line"""
+    metrics = _current.get()
+    if metrics is not None:
+        with metrics._lock:
+            metrics.properties.update(properties)
+
+
+def incr(name: str, amount: int = 1):
+    """Bump a counter on the current request, if there is one"""
+    metrics = _current.get()
+    if metrics is not None:
+        metrics.incr(name, amount)
+
+
+def record_usage(usage: Optional[Dict[str, Any]]):
+    """Add a Bedrock response's ``usage`` block to the current request's token counters"""
+    metrics = _current.get()
+    if metrics is None or not usage:
+        return
+    for key, value in usage.items():
+        if key.endswith('_tokens') and isinstance(value, int):
+            metrics.incr(key, value)
+
+
+def _start_profile(metrics: RequestMetrics) -> Optional['cProfile.Profile']:
+    # Imported on first use so the profiler stays off the cold-start path
+    import cProfile
+
+    profiler = cProfile.Profile()
+    try:
+        profiler.enable()
+    except ValueError:
+        # Python 3.12+ profiles every thread from the first profiler; this thread is already covered
+        return None
+    with metrics._lock:
+        metrics.profiles.append(profiler)
+    return profiler
+
+
+def _profile_report(profiles: List['cProfile.Profile']) -> str:
+    import pstats
+
+    out = io.StringIO()
+    stats = pstats.Stats(profiles[0], stream=out)
+    for profile in profiles[1:]:
+        stats.add(profile)
+    stats.sort_stats('cumulative').print_stats(ESG_PROFILE_TOP)
+    return out.getvalue()
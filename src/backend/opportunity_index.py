@@ -0,0 +1,244 @@
+# Opportunity retrieval for ESGenius
+# BM25 over a catalogue of grants, tax incentives, financing and certifications,
+# filtered by structured eligibility, so matches are reproducible and need no model call
+
+import csv
+import json
+import math
+import os
+import re
+import threading
+from collections import Counter
+from dataclasses import dataclass, field
+from typing import Dict, Iterable, List, Optional, Tuple
+
+from grant_catalog import SortedBitIndex
+
+OPPORTUNITY_CATALOG_PATH = os.getenv(
+    'ESG_OPPORTUNITY_CATALOG',
+    os.path.join(os.path.dirname(os.path.abspath(__file__)), 'data', 'opportunities.json')
+)
+
+# Candidates returned per request
+ESG_OPPORTUNITY_TOP_K = int(os.getenv('ESG_OPPORTUNITY_TOP_K', '5'))
+# When the LLM reranks and explains the candidates: 'never', 'ambiguous' (the top two
+# scores are within ESG_OPPORTUNITY_RERANK_MARGIN of each other) or 'always'
+ESG_OPPORTUNITY_RERANK = os.getenv('ESG_OPPORTUNITY_RERANK', 'never').lower()
+ESG_OPPORTUNITY_RERANK_MARGIN = float(os.getenv('ESG_OPPORTUNITY_RERANK_MARGIN', '0.05'))
+
+# BM25 term-frequency saturation and length normalisation
+BM25_K1 = 1.2
+BM25_B = 0.75
+# Keywords are repeated this many times in the indexed text, so they outweigh description words
+KEYWORD_BOOST = 2
+
+_TOKEN = re.compile(r'[a-z0-9]+')
+_STOPWORDS = frozenset(
+    'a an and are as at be by for from in into is it of on or per such than that the their this to up upon with'.split()
+)
+
+
+def tokenize(text: str) -> List[str]:
+    """Lower-cased word tokens without stopwords, plural 's' stripped"""
+    tokens = []
+    for token in _TOKEN.findall(text.lower()):
+        if token in _STOPWORDS:
+            continue
+        if len(token) > 3 and token.endswith('ies'):
+            token = token[:-3] + 'y'
+        elif len(token) > 3 and token.endswith('s') and not token.endswith('ss'):
+            token = token[:-1]
+        tokens.append(token)
+    return tokens
+
+
+@dataclass
+class OpportunityRecord:
+    name: str
+    type: str
+    authority: str
+    amount: str
+    description: str
+    eligibility: str
+    timeline: str
+    keywords: List[str] = field(default_factory=list)
+    # Empty lists mean no restriction
+    industries: List[str] = field(default_factory=list)
+    sizes: List[str] = field(default_factory=list)
+    locations: List[str] = field(default_factory=list)
+    min_esg_score: float = 0.0
+
+    def text(self) -> str:
+        return ' '.join([self.name, self.type.replace('_', ' '), self.description, self.eligibility,
+                         ' '.join(self.industries)] + self.keywords * KEYWORD_BOOST)
+
+
+@dataclass
+class OpportunityMatch:
+    record: OpportunityRecord
+    score: float
+    matched_terms: List[str]
+
+
+class _Facet:
+    """
+    Bitmasks of the records allowing each value of one eligibility field.
+
+    Records with no values for the field allow every value, so they sit in
+    ``unrestricted`` and join every lookup. A company value matches a record
+    value when either contains the other, so 'Food & Beverage Manufacturing'
+    matches both 'food' and 'manufacturing'.
+    """
+
+    def __init__(self, values_per_record: List[List[str]]):
+        self.masks: Dict[str, int] = {}
+        self.unrestricted = 0
+        for index, values in enumerate(values_per_record):
+            if not values:
+                self.unrestricted |= 1 << index
+            for value in values:
+                key = value.lower().strip()
+                self.masks[key] = self.masks.get(key, 0) | 1 << index
+
+    def allowing(self, value: Optional[str]) -> int:
+        """Records eligible for ``value``; unknown values only get unrestricted records"""
+        mask = self.unrestricted
+        value = (value or '').lower().strip()
+        if value:
+            for key, records in self.masks.items():
+                if key in value or value in key:
+                    mask |= records
+        return mask
+
+
+class OpportunityIndex:
+    """
+    Inverted index with BM25 scoring over opportunity records.
+
+    Postings map each term to ``(record, term frequency)`` pairs. Eligibility
+    (industry, size, location, minimum ESG score) is resolved to a bitmask
+    first, the same way as ``GrantCatalog``, and only eligible records are
+    scored. Ties keep catalogue order, so the same query always gives the same
+    ranking.
+    """
+
+    def __init__(self, records: List[OpportunityRecord]):
+        self.records = records
+        self._all = (1 << len(records)) - 1
+        self.postings: Dict[str, List[Tuple[int, int]]] = {}
+        self.lengths: List[int] = []
+        for index, record in enumerate(records):
+            counts = Counter(tokenize(record.text()))
+            self.lengths.append(sum(counts.values()))
+            for term, frequency in counts.items():
+                self.postings.setdefault(term, []).append((index, frequency))
+        self.average_length = sum(self.lengths) / len(records) if records else 0.0
+        self.idf = {
+            term: math.log(1 + (len(records) - len(postings) + 0.5) / (len(postings) + 0.5))
+            for term, postings in self.postings.items()
+        }
+        self._industries = _Facet([record.industries for record in records])
+        self._sizes = _Facet([record.sizes for record in records])
+        self._locations = _Facet([record.locations for record in records])
+        self._min_scores = SortedBitIndex([record.min_esg_score for record in records])
+
+    def eligible_mask(self, industry: Optional[str] = None, size: Optional[str] = None,
+                      location: Optional[str] = None, esg_score: Optional[float] = None) -> int:
+        """Records whose eligibility allows this company; ``None`` skips a filter"""
+        mask = self._all
+        if industry is not None:
+            mask &= self._industries.allowing(industry)
+        if size is not None:
+            mask &= self._sizes.allowing(size)
+        if location is not None:
+            mask &= self._locations.allowing(location)
+        if esg_score is not None:
+            mask &= self._min_scores.at_most(esg_score)
+        return mask
+
+    def search(self, query: str, k: int = 5, industry: Optional[str] = None, size: Optional[str] = None,
+               location: Optional[str] = None, esg_score: Optional[float] = None) -> List[OpportunityMatch]:
+        """
+        Top ``k`` eligible records for ``query`` by BM25. Eligible records that
+        match no query term still fill the list, after the scored ones.
+        """
+        eligible = self.eligible_mask(industry, size, location, esg_score)
+        scores: Dict[int, float] = {}
+        matched: Dict[int, List[str]] = {}
+        for term in dict.fromkeys(tokenize(query)):
+            idf = self.idf.get(term)
+            if idf is None:
+                continue
+            for index, frequency in self.postings[term]:
+                if not eligible >> index & 1:
+                    continue
+                norm = BM25_K1 * (1 - BM25_B + BM25_B * self.lengths[index] / self.average_length)
+                scores[index] = scores.get(index, 0.0) + idf * frequency * (BM25_K1 + 1) / (frequency + norm)
+                matched.setdefault(index, []).append(term)
+
+        ranked = sorted(scores, key=lambda index: (-scores[index], index))[:k]
+        remaining = eligible
+        for index in ranked:
+            remaining &= ~(1 << index)
+        while remaining and len(ranked) < k:
+            lowest = remaining & -remaining
+            ranked.append(lowest.bit_length() - 1)
+            remaining ^= lowest
+        return [OpportunityMatch(self.records[index], scores.get(index, 0.0), matched.get(index, []))
+                for index in ranked]
+
+
+def _list(value) -> List[str]:
+    if isinstance(value, str):
+        # CSV cells hold lists separated by semicolons
+        return [item.strip() for item in value.split(';') if item.strip()]
+    return list(value or [])
+
+
+def _record_from_row(row: Dict) -> OpportunityRecord:
+    return OpportunityRecord(
+        name=row['name'],
+        type=row.get('type', 'grant'),
+        authority=row.get('authority', ''),
+        amount=row.get('amount', ''),
+        description=row.get('description', ''),
+        eligibility=row.get('eligibility', ''),
+        timeline=row.get('timeline', ''),
+        keywords=_list(row.get('keywords')),
+        industries=_list(row.get('industries')),
+        sizes=_list(row.get('sizes')),
+        locations=_list(row.get('locations')),
+        min_esg_score=float(row.get('min_esg_score') or 0.0)
+    )
+
+
+def load_opportunity_index(path: str) -> OpportunityIndex:
+    """Build an index from a JSON array or a CSV file"""
+    with open(path, newline='', encoding='utf-8') as handle:
+        if path.endswith('.csv'):
+            rows = list(csv.DictReader(handle))
+        else:
+            rows = json.load(handle)
+    return OpportunityIndex([_record_from_row(row) for row in rows])
+
+
+def company_query(company_data: Dict, extra_terms: Iterable[str] = ()) -> str:
+    """Query text from a company profile: industry, location, description and stated interests"""
+    parts = [str(company_data.get(key) or '') for key in ('industry', 'location', 'description', 'activities')]
+    interests = company_data.get('interests') or []
+    if isinstance(interests, str):
+        interests = [interests]
+    return ' '.join(parts + list(interests) + list(extra_terms))
+
+
+_indexes: Dict[str, OpportunityIndex] = {}
+_indexes_lock = threading.Lock()
+
+
+def get_opportunity_index(path: Optional[str] = None) -> OpportunityIndex:
+    """Index for ``path`` (default ESG_OPPORTUNITY_CATALOG), built once per process"""
+    path = path or OPPORTUNITY_CATALOG_PATH
+    with _indexes_lock:
+        if path not in _indexes:
+            _indexes[path] = load_opportunity_index(path)
+        return _indexes[path]
@@ -0,0 +1,390 @@
+# Peer benchmarks
+# Keeps a mergeable quantile sketch of completed scores per (framework, industry, size, pillar),
+# so each analysis can be placed at a percentile of its peers without storing any assessment;
+# only each company's latest scores are kept, so a company counts once however often it is analyzed
+
+import bisect
+import json
+import logging
+import os
+import re
+import sqlite3
+import threading
+import time
+import zlib
+from array import array
+from typing import Any, Dict, Iterable, Iterator, List, Optional, Tuple
+
+from incremental import fingerprint
+
+# Sketch bucket width in points; percentiles are exact to within one bucket
+ESG_BENCHMARK_RESOLUTION = float(os.getenv('ESG_BENCHMARK_RESOLUTION', '0.5'))
+# Fewer peers than this and the next broader peer group is used (industry, then the framework)
+ESG_BENCHMARK_MIN_PEERS = int(os.getenv('ESG_BENCHMARK_MIN_PEERS', '20'))
+# e.g. /tmp/benchmarks.sqlite, shared by the processes on one host; unset keeps the sketches
+# in memory, fed only by the analyses this process ran
+ESG_BENCHMARK_PATH = os.getenv('ESG_BENCHMARK_PATH')
+# Recorded scores held locally before they are merged into the shared file
+ESG_BENCHMARK_FLUSH_EVERY = int(os.getenv('ESG_BENCHMARK_FLUSH_EVERY', '10'))
+# Seconds between reloads of the shared file, picking up other workers' scores
+ESG_BENCHMARK_REFRESH = float(os.getenv('ESG_BENCHMARK_REFRESH', '300'))
+
+PILLARS = ('environmental', 'social', 'governance', 'overall')
+# Peer groups from narrowest to broadest; '*' matches any value
+PEER_GROUPS = ('industry+size', 'industry', 'framework')
+
+logger = logging.getLogger(__name__)
+
+_SPACE = re.compile(r'\s+')
+
+
+def _label(value: Any) -> str:
+    if value is None or value == '':
+        return 'unknown'
+    return _SPACE.sub(' ', str(value)).strip().lower()
+
+
+class ScoreSketch:
+    """
+    Counts of 0-100 scores in fixed-width buckets.
+
+    Scores are bounded, so a fixed grid is a quantile sketch with a constant
+    error of one bucket and no compression step: sketches of disjoint sets
+    ``merge`` by adding counts, in any order and in any process. ``percentile``
+    reads one bucket and a cached prefix sum; ``quantile`` bisects the prefix
+    sums, O(log buckets).
+    """
+
+    __slots__ = ('resolution', 'counts', '_cumulative')
+
+    def __init__(self, resolution: float = None, counts: Iterable[int] = None):
+        self.resolution = resolution or ESG_BENCHMARK_RESOLUTION
+        buckets = int(round(100.0 / self.resolution)) + 1
+        self.counts = array('I', counts if counts is not None else bytes(4 * buckets))
+        if len(self.counts) != buckets:
+            raise ValueError(f"Sketch has {len(self.counts)} buckets, expected {buckets}")
+        self._cumulative: Optional[List[int]] = None
+
+    @property
+    def total(self) -> int:
+        return self.cumulative[-1]
+
+    @property
+    def cumulative(self) -> List[int]:
+        if self._cumulative is None:
+            running, cumulative = 0, []
+            for count in self.counts:
+                running += count
+                cumulative.append(running)
+            self._cumulative = cumulative
+        return self._cumulative
+
+    def bucket(self, score: float) -> int:
+        return int(round(min(max(float(score), 0.0), 100.0) / self.resolution))
+
+    def add(self, score: float, count: int = 1):
+        self.counts[self.bucket(score)] += count
+        self._cumulative = None
+
+    def remove(self, score: float):
+        """Take back one ``add`` of ``score``; a no-op if its bucket is already empty"""
+        i = self.bucket(score)
+        if self.counts[i]:
+            self.counts[i] -= 1
+            self._cumulative = None
+
+    def merge(self, other: 'ScoreSketch') -> 'ScoreSketch':
+        if other.resolution != self.resolution:
+            raise ValueError("Cannot merge sketches of different resolutions")
+        for i, count in enumerate(other.counts):
+            if count:
+                self.counts[i] += count
+        self._cumulative = None
+        return self
+
+    def percentile(self, score: float) -> Optional[float]:
+        """Share of the sketch below ``score``, counting ties as half, 0-100; None when empty"""
+        cumulative = self.cumulative
+        if not cumulative[-1]:
+            return None
+        i = self.bucket(score)
+        below = cumulative[i - 1] if i else 0
+        return 100.0 * (below + self.counts[i] / 2) / cumulative[-1]
+
+    def quantile(self, q: float) -> Optional[float]:
+        """Score at fraction ``q`` (0-1) of the sketch; None when empty"""
+        cumulative = self.cumulative
+        if not cumulative[-1]:
+            return None
+        rank = min(max(q, 0.0), 1.0) * (cumulative[-1] - 1) + 1
+        return bisect.bisect_left(cumulative, rank) * self.resolution
+
+    def to_bytes(self) -> bytes:
+        """Compressed counts; mostly-empty sketches take a few dozen bytes"""
+        return zlib.compress(self.counts.tobytes())
+
+    @classmethod
+    def from_bytes(cls, data: bytes, resolution: float = None) -> 'ScoreSketch':
+        counts = array('I')
+        counts.frombytes(zlib.decompress(data))
+        return cls(resolution, counts)
+
+
+class PeerBenchmarks:
+    """
+    Score sketches per (framework, industry, size, pillar), with rollups per
+    industry and per framework for thin peer groups.
+
+    Each company (``member_key``: a hash of the framework and its business
+    profile) counts once: recording it again replaces its earlier scores in
+    every sketch, and recording the same scores again changes nothing. Only
+    the latest scores per company are kept for that, not its assessment.
+
+    Scores recorded here are merged into the SQLite file at ``path`` every
+    ``flush_every`` records, under a write lock so concurrent workers add
+    rather than overwrite, and the merged sketches are reloaded every
+    ``refresh_after`` seconds. Without a path the sketches stay in memory.
+
+    The file keeps SQLite's default rollback journal rather than WAL, which
+    needs memory shared between the processes and so only works on one host.
+    On a network filesystem such as EFS it relies on NFS file locks.
+    """
+
+    def __init__(self, path: str = None, min_peers: int = None, flush_every: int = None,
+                 refresh_after: float = None, resolution: float = None):
+        self.path = path
+        self.min_peers = ESG_BENCHMARK_MIN_PEERS if min_peers is None else min_peers
+        self.flush_every = flush_every or ESG_BENCHMARK_FLUSH_EVERY
+        self.refresh_after = ESG_BENCHMARK_REFRESH if refresh_after is None else refresh_after
+        self.resolution = resolution or ESG_BENCHMARK_RESOLUTION
+        self.sketches: Dict[str, ScoreSketch] = {}
+        # Latest scores per company: (framework, industry, size, *pillar scores)
+        self._members: Dict[str, Tuple] = {}
+        self._pending: Dict[str, Tuple] = {}
+        self._pending_records = 0
+        self._loaded = 0.0
+        self._lock = threading.RLock()
+        self._conn = None
+        if path:
+            self._conn = sqlite3.connect(path, check_same_thread=False, isolation_level=None, timeout=30)
+            # Also switches back a file an earlier version left in WAL mode
+            self._conn.execute('PRAGMA journal_mode=DELETE')
+            self._conn.execute('CREATE TABLE IF NOT EXISTS sketches (key TEXT PRIMARY KEY, counts BLOB NOT NULL)')
+            self._conn.execute('CREATE TABLE IF NOT EXISTS members (member TEXT PRIMARY KEY, scores TEXT NOT NULL)')
+
+    def peer_keys(self, framework: str, business_data: Dict, pillar: str) -> List[Tuple[str, str]]:
+        """(peer group, sketch key) pairs for a company, narrowest group first"""
+        framework, industry, size = (_label(framework), _label(business_data.get('industry')),
+                                     _label(business_data.get('size')))
+        keys = (f'{framework}|{industry}|{size}|{pillar}', f'{framework}|{industry}|*|{pillar}',
+                f'{framework}|*|*|{pillar}')
+        return list(zip(PEER_GROUPS, keys))
+
+    def _sketch(self, sketches: Dict[str, ScoreSketch], key: str) -> ScoreSketch:
+        sketch = sketches.get(key)
+        if sketch is None:
+            sketch = sketches[key] = ScoreSketch(self.resolution)
+        return sketch
+
+    def percentiles(self, framework: str, business_data: Dict, scores: Dict[str, Any]) -> Dict[str, Any]:
+        """
+        Each pillar's percentile among peers, from the narrowest group with at
+        least ``min_peers`` scores: ``{percentile, peers, peer_group, median}``,
+        or None for a pillar without enough peers anywhere.
+        """
+        self._refresh()
+        result = {}
+        with self._lock:
+            for pillar in PILLARS:
+                score = scores.get(f'{pillar}_score')
+                result[pillar] = None
+                if not isinstance(score, (int, float)):
+                    continue
+                for group, key in self.peer_keys(framework, business_data, pillar):
+                    sketch = self.sketches.get(key)
+                    if sketch is not None and sketch.total >= max(self.min_peers, 1):
+                        result[pillar] = {
+                            'percentile': round(sketch.percentile(score), 1),
+                            'peers': sketch.total,
+                            'peer_group': group,
+                            'median': sketch.quantile(0.5)
+                        }
+                        break
+        return result
+
+    @staticmethod
+    def member_key(framework: str, business_data: Dict) -> str:
+        """Identity of a company within a framework's peers"""
+        return fingerprint({'framework': _label(framework), 'business': business_data})
+
+    def _entries(self, member: Optional[Tuple]) -> Iterator[Tuple[str, float]]:
+        # (sketch key, score) for every peer group and pillar a member's scores count toward
+        if member is None:
+            return
+        framework, industry, size, *scores = member
+        business = {'industry': industry, 'size': size}
+        for pillar, score in zip(PILLARS, scores):
+            if score is not None:
+                for _, key in self.peer_keys(framework, business, pillar):
+                    yield key, score
+
+    def _replace(self, sketches: Dict[str, ScoreSketch], old: Optional[Tuple], new: Tuple):
+        for key, score in self._entries(old):
+            sketch = sketches.get(key)
+            if sketch is not None:
+                sketch.remove(score)
+        for key, score in self._entries(new):
+            self._sketch(sketches, key).add(score)
+
+    def _member(self, member: str) -> Optional[Tuple]:
+        # A company this process has not seen may already be in the shared file
+        if member not in self._members and self._conn is not None:
+            stored = self._read_members([member]).get(member)
+            if stored is not None:
+                self._members[member] = stored
+        return self._members.get(member)
+
+    def _put(self, member: str, scores: Tuple) -> bool:
+        with self._lock:
+            old = self._member(member)
+            if old == scores:
+                return False
+            self._replace(self.sketches, old, scores)
+            self._members[member] = scores
+            if self._conn is not None:
+                self._pending[member] = scores
+                self._pending_records += 1
+                if self._pending_records >= self.flush_every:
+                    self.flush()
+            return True
+
+    def record(self, framework: str, business_data: Dict, scores: Dict[str, Any], member: str = None) -> bool:
+        """
+        Add a completed analysis's pillar and overall scores to every peer
+        group it belongs to, replacing the company's earlier scores. False
+        when the company was already recorded with these scores.
+        """
+        values = tuple(score if isinstance(score, (int, float)) else None
+                       for score in (scores.get(f'{pillar}_score') for pillar in PILLARS))
+        entry = (framework, business_data.get('industry'), business_data.get('size')) + values
+        return self._put(member or self.member_key(framework, business_data), entry)
+
+    def observe(self, framework: str, business_data: Dict, scores: Dict[str, Any],
+                member: str = None) -> Dict[str, Any]:
+        """``percentiles`` against the peers so far, then ``record`` this analysis"""
+        placed = self.percentiles(framework, business_data, scores)
+        self.record(framework, business_data, scores, member)
+        return placed
+
+    def peer_context(self, framework: str, business_data: Dict) -> str:
+        """One prompt line of peer quartiles per pillar, or '' while no group has enough peers"""
+        self._refresh()
+        parts, largest = [], None
+        with self._lock:
+            for pillar in PILLARS:
+                for group, key in self.peer_keys(framework, business_data, pillar):
+                    sketch = self.sketches.get(key)
+                    if sketch is not None and sketch.total >= max(self.min_peers, 1):
+                        parts.append(f"{pillar} median {sketch.quantile(0.5):g} "
+                                     f"(p25 {sketch.quantile(0.25):g}, p75 {sketch.quantile(0.75):g})")
+                        largest = largest or (group, sketch.total)
+                        break
+        if not parts:
+            return ''
+        return f"Peer benchmarks ({largest[0]} peers, {largest[1]} assessments): " + '; '.join(parts)
+
+    def merge(self, other: 'PeerBenchmarks') -> 'PeerBenchmarks':
+        """Fold another worker's companies in, e.g. when combining offline runs; theirs replace ours"""
+        with other._lock:
+            members = dict(other._members)
+        for member, scores in members.items():
+            self._put(member, scores)
+        return self
+
+    def flush(self):
+        """Add the locally recorded scores to the shared file and reload the merged sketches"""
+        if self._conn is None:
+            return
+        with self._lock:
+            if not self._pending:
+                return
+            self._conn.execute('BEGIN IMMEDIATE')
+            try:
+                # Replace each company's stored scores, which another worker may have written
+                members = self._read_members(list(self._pending))
+                keys = {key for member, scores in self._pending.items()
+                        for entry in (members.get(member), scores) for key, _ in self._entries(entry)}
+                stored = self._read(list(keys))
+                for member, scores in self._pending.items():
+                    self._replace(stored, members.get(member), scores)
+                    self._conn.execute('INSERT OR REPLACE INTO members (member, scores) VALUES (?, ?)',
+                                       (member, json.dumps(scores)))
+                for key in keys:
+                    self._conn.execute('INSERT OR REPLACE INTO sketches (key, counts) VALUES (?, ?)',
+                                       (key, stored[key].to_bytes()))
+                self._conn.execute('COMMIT')
+            except BaseException:
+                self._conn.execute('ROLLBACK')
+                raise
+            self._pending.clear()
+            self._pending_records = 0
+            self._load()
+
+    def _select(self, query: str, keys: List[str]) -> List[Tuple]:
+        rows = []
+        for start in range(0, len(keys), 500):
+            batch = keys[start:start + 500]
+            rows += self._conn.execute(query.format(', '.join('?' * len(batch))), batch).fetchall()
+        return rows
+
+    def _read(self, keys: Optional[List[str]] = None) -> Dict[str, ScoreSketch]:
+        if keys is None:
+            rows = self._conn.execute('SELECT key, counts FROM sketches').fetchall()
+        else:
+            rows = self._select('SELECT key, counts FROM sketches WHERE key IN ({})', keys)
+        return {key: ScoreSketch.from_bytes(counts, self.resolution) for key, counts in rows}
+
+    def _read_members(self, members: List[str]) -> Dict[str, Tuple]:
+        rows = self._select('SELECT member, scores FROM members WHERE member IN ({})', members)
+        return {member: tuple(json.loads(scores)) for member, scores in rows}
+
+    def _load(self):
+        """The shared sketches plus what this process has recorded but not flushed"""
+        sketches = self._read()
+        members = self._read_members(list(self._pending))
+        for member, scores in self._pending.items():
+            self._replace(sketches, members.get(member), scores)
+        self.sketches = sketches
+        self._loaded = time.monotonic()
+
+    def _refresh(self):
+        if self._conn is None or (self._loaded and time.monotonic() - self._loaded < self.refresh_after):
+            return
+        with self._lock:
+            try:
+                self._load()
+            except sqlite3.Error as e:
+                logger.warning(f"Could not load peer benchmarks: {str(e)}")
+                self._loaded = time.monotonic()
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            frameworks = [key for key in self.sketches if key.endswith('|*|*|overall')]
+            return {
+                'groups': len(self.sketches),
+                'companies': sum(self.sketches[key].total for key in frameworks),
+                'pending': self._pending_records
+            }
+
+
+_benchmarks: Optional[PeerBenchmarks] = None
+_benchmarks_lock = threading.Lock()
+
+
+def get_peer_benchmarks() -> PeerBenchmarks:
+    """Process-wide peer benchmarks, shared through ESG_BENCHMARK_PATH when set"""
+    global _benchmarks
+    with _benchmarks_lock:
+        if _benchmarks is None:
+            _benchmarks = PeerBenchmarks(ESG_BENCHMARK_PATH)
+        return _benchmarks
@@ -0,0 +1,397 @@
+# Portfolio analytics
+# Streams assessment records from CSV, JSONL or Parquet in chunks, scores each chunk in one
+# rubric matrix pass and folds it into fixed-size aggregates per framework, industry and size
+#
+#     python portfolio.py book.csv --out portfolio.json --workers 8
+
+import argparse
+import csv
+import json
+import os
+import re
+import sys
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+from itertools import chain, islice
+from typing import Any, Dict, Iterable, Iterator, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+from scoring_engine import COMPLIANCE_LEVELS, PILLARS, CompiledRubric, get_rubric
+
+# Records read, scored and aggregated at a time; memory per worker grows with this, not the input
+ESG_PORTFOLIO_CHUNK_SIZE = int(os.getenv('ESG_PORTFOLIO_CHUNK_SIZE', '5000'))
+# Scoring processes for inputs of more than one chunk; 1 scores in this process
+ESG_PORTFOLIO_WORKERS = int(os.getenv('ESG_PORTFOLIO_WORKERS', str(os.cpu_count() or 1)))
+# Width of the overall-score histogram bins, in points
+ESG_PORTFOLIO_BIN_WIDTH = float(os.getenv('ESG_PORTFOLIO_BIN_WIDTH', '10'))
+
+# Columns that describe the company rather than hold a criterion score
+ID_COLUMNS = ('id', 'name', 'industry', 'size', 'framework')
+# Aggregated values, in order: the three pillars then overall
+SCORE_COLUMNS = tuple(f'{pillar}_score' for pillar in PILLARS) + ('overall_score',)
+
+_SPACE = re.compile(r'\s+')
+
+Chunk = Dict[str, List[Any]]
+
+
+def _label(value: Any) -> str:
+    """Segment label for a free-text field, e.g. ' Food  &  Beverage' -> 'food & beverage'"""
+    if value is None or value == '':
+        return 'unknown'
+    return _SPACE.sub(' ', str(value)).strip().lower()
+
+
+def _numeric(values: Sequence[Any]) -> np.ndarray:
+    """A column as floats, NaN where the cell is empty or not a number"""
+    try:
+        return np.asarray(values, dtype=float)
+    except (TypeError, ValueError):
+        pass
+    # CSV columns are text with '' for unanswered
+    try:
+        return np.array(['nan' if value is None or value == '' else value for value in values]).astype(float)
+    except (TypeError, ValueError):
+        column = np.full(len(values), np.nan)
+        for i, value in enumerate(values):
+            try:
+                column[i] = float(value)
+            except (TypeError, ValueError):
+                pass
+        return column
+
+
+class Segment:
+    """Running totals for one (framework, industry, size) segment; a few hundred bytes whatever its size"""
+
+    __slots__ = ('count', 'sums', 'histogram', 'levels')
+
+    def __init__(self, bins: int):
+        self.count = 0
+        self.sums = np.zeros(len(SCORE_COLUMNS))
+        self.histogram = np.zeros(bins, dtype=np.int64)
+        self.levels = np.zeros(len(COMPLIANCE_LEVELS), dtype=np.int64)
+
+    def merge(self, other: 'Segment'):
+        self.count += other.count
+        self.sums += other.sums
+        self.histogram += other.histogram
+        self.levels += other.levels
+
+    def to_dict(self, bin_width: float) -> Dict[str, Any]:
+        averages = self.sums / self.count if self.count else self.sums
+        return {
+            'count': self.count,
+            'averages': {name: round(float(value), 1) for name, value in zip(SCORE_COLUMNS, averages)},
+            'compliance_levels': {level: int(n) for level, n in zip(COMPLIANCE_LEVELS, self.levels)},
+            'histogram': [
+                {'from': round(i * bin_width, 1), 'to': round(min((i + 1) * bin_width, 100.0), 1), 'count': int(n)}
+                for i, n in enumerate(self.histogram)
+            ]
+        }
+
+
+class PortfolioSummary:
+    """
+    Score distributions of a book of assessments, by segment.
+
+    Summaries of disjoint chunks ``merge`` into the summary of their union,
+    so chunks can be scored in any order and in any process. Records with no
+    response on their framework's rubric are counted in ``unscored`` only.
+    """
+
+    def __init__(self, bin_width: float = None):
+        self.bin_width = bin_width or ESG_PORTFOLIO_BIN_WIDTH
+        self.bins = int(np.ceil(100.0 / self.bin_width))
+        self.segments: Dict[Tuple[str, str, str], Segment] = {}
+        self.records = 0
+        self.unscored = 0
+
+    def segment(self, key: Tuple[str, str, str]) -> Segment:
+        segment = self.segments.get(key)
+        if segment is None:
+            segment = self.segments[key] = Segment(self.bins)
+        return segment
+
+    def add_scores(self, keys: Sequence[Tuple[str, str, str]], scores: np.ndarray, levels: np.ndarray):
+        """
+        Fold scored rows in: ``scores`` is N x 4 (E, S, G, overall) and
+        ``levels`` the N compliance-level indices, row i belonging to ``keys[i]``.
+        """
+        codes: Dict[Tuple[str, str, str], int] = {}
+        rows = np.fromiter((codes.setdefault(key, len(codes)) for key in keys), dtype=np.int64, count=len(keys))
+        groups = len(codes)
+        counts = np.bincount(rows, minlength=groups)
+        sums = np.stack([np.bincount(rows, weights=scores[:, j], minlength=groups)
+                         for j in range(scores.shape[1])], axis=1)
+        bins = np.minimum((scores[:, -1] // self.bin_width).astype(np.int64), self.bins - 1)
+        histogram = np.bincount(rows * self.bins + bins, minlength=groups * self.bins).reshape(groups, self.bins)
+        level_counts = np.bincount(rows * len(COMPLIANCE_LEVELS) + levels,
+                                   minlength=groups * len(COMPLIANCE_LEVELS)).reshape(groups, -1)
+        for key, code in codes.items():
+            segment = self.segment(key)
+            segment.count += int(counts[code])
+            segment.sums += sums[code]
+            segment.histogram += histogram[code]
+            segment.levels += level_counts[code]
+
+    def merge(self, other: 'PortfolioSummary') -> 'PortfolioSummary':
+        self.records += other.records
+        self.unscored += other.unscored
+        for key, segment in other.segments.items():
+            self.segment(key).merge(segment)
+        return self
+
+    def rollup(self, by: Iterable[int]) -> Dict[Tuple[str, ...], Segment]:
+        """Segments merged on the key fields at positions ``by`` (0 framework, 1 industry, 2 size)"""
+        by = tuple(by)
+        rolled: Dict[Tuple[str, ...], Segment] = {}
+        for key, segment in self.segments.items():
+            group = tuple(key[i] for i in by)
+            if group not in rolled:
+                rolled[group] = Segment(self.bins)
+            rolled[group].merge(segment)
+        return rolled
+
+    def to_dict(self) -> Dict[str, Any]:
+        def entries(rolled, fields):
+            return [{**dict(zip(fields, key)), **segment.to_dict(self.bin_width)}
+                    for key, segment in sorted(rolled.items())]
+
+        return {
+            'records': self.records,
+            'scored': self.records - self.unscored,
+            'unscored': self.unscored,
+            'frameworks': entries(self.rollup([0]), ('framework',)),
+            'by_industry': entries(self.rollup([0, 1]), ('framework', 'industry')),
+            'by_size': entries(self.rollup([0, 2]), ('framework', 'size')),
+            'segments': entries(self.segments, ('framework', 'industry', 'size'))
+        }
+
+
+def score_columns(rubric: CompiledRubric, chunk: Chunk, rows: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Score matrix (N x C) and answered mask for ``rows`` of a columnar chunk,
+    one criterion column at a time. Scores are clipped to 0-100, as in
+    ``CompiledRubric.encode``.
+    """
+    scores = np.zeros((len(rows), len(rubric.criteria)))
+    answered = np.zeros((len(rows), len(rubric.criteria)), dtype=bool)
+    for criterion, column in rubric.criterion_index.items():
+        if criterion not in chunk:
+            continue
+        values = _numeric(chunk[criterion])[rows]
+        present = ~np.isnan(values)
+        scores[present, column] = values[present]
+        answered[:, column] = present
+    np.clip(scores, 0.0, 100.0, out=scores)
+    return scores, answered
+
+
+def summarize_chunk(chunk: Chunk, framework: str = 'NSRF', bin_width: float = None) -> PortfolioSummary:
+    """
+    Score one columnar chunk with the rubric, as ``ESGProcessor._rubric_scores``
+    does per request, and aggregate it. Rows are scored per framework in one
+    matrix pass each.
+    """
+    summary = PortfolioSummary(bin_width)
+    size = len(next(iter(chunk.values()), []))
+    summary.records = size
+    if not size:
+        return summary
+    frameworks = chunk.get('framework') or [None] * size
+    industries = chunk.get('industry') or [None] * size
+    sizes = chunk.get('size') or [None] * size
+
+    rubrics: Dict[Any, CompiledRubric] = {}
+    by_rubric: Dict[str, Tuple[CompiledRubric, List[int]]] = {}
+    for row, name in enumerate(frameworks):
+        rubric = rubrics.get(name)
+        if rubric is None:
+            rubric = rubrics[name] = get_rubric(name or framework)
+        by_rubric.setdefault(rubric.framework_id, (rubric, []))[1].append(row)
+
+    for framework_id, (rubric, rows) in by_rubric.items():
+        rows = np.asarray(rows)
+        scores, answered = score_columns(rubric, chunk, rows)
+        scored = answered.any(axis=1)
+        summary.unscored += int((~scored).sum())
+        if not scored.any():
+            continue
+        rows, scores, answered = rows[scored], scores[scored], answered[scored]
+        result = rubric.score_matrix(scores, answered)
+        values = np.column_stack([result.pillar_scores, result.overall_scores])
+        levels = np.fromiter((COMPLIANCE_LEVELS.index(level) for level in result.compliance_levels),
+                             dtype=np.int64, count=len(rows))
+        labels: Dict[Tuple[Any, Any], Tuple[str, str, str]] = {}
+        keys = []
+        for row in rows:
+            raw = (industries[row], sizes[row])
+            key = labels.get(raw)
+            if key is None:
+                key = labels[raw] = (framework_id, _label(raw[0]), _label(raw[1]))
+            keys.append(key)
+        summary.add_scores(keys, values, levels)
+    return summary
+
+
+def _columns(records: List[Dict[str, Any]]) -> Chunk:
+    """Row dicts to columns; a column missing from a row is None there"""
+    names = dict.fromkeys(name for record in records for name in record)
+    return {name: [record.get(name) for record in records] for name in names}
+
+
+def _flatten(record: Dict[str, Any]) -> Dict[str, Any]:
+    """A request-shaped record ({business, responses, framework}) as one flat row of criterion scores"""
+    business = record.get('business') or {}
+    row = {name: record.get(name, business.get(name)) for name in ID_COLUMNS}
+    for response in record.get('responses') or []:
+        if response.get('criterionId'):
+            row[response['criterionId']] = response.get('score')
+    return row
+
+
+def _line_chunks(handle, chunk_size: int, quoted: bool = False) -> Iterator[List[str]]:
+    """
+    Lists of ``chunk_size`` raw lines. With ``quoted``, a chunk only ends
+    where the double quotes balance, so a CSV field holding a newline is not
+    split between chunks.
+    """
+    lines, quotes = [], 0
+    for line in handle:
+        lines.append(line)
+        if quoted:
+            quotes += line.count('"')
+        if len(lines) >= chunk_size and quotes % 2 == 0:
+            yield lines
+            lines, quotes = [], 0
+    if lines:
+        yield lines
+
+
+def read_csv(path: str, chunk_size: int) -> Iterator[List[str]]:
+    """
+    Raw chunks of a wide CSV: ``industry``, ``size`` and optionally
+    ``framework``, ``id`` and ``name``, then one column of scores per
+    criterion id (empty for unanswered). Each chunk starts with the header line.
+    """
+    with open(path, newline='', encoding='utf-8') as handle:
+        header = handle.readline()
+        if not header:
+            return
+        for lines in _line_chunks(handle, chunk_size, quoted=True):
+            yield [header] + lines
+
+
+def parse_csv(lines: List[str]) -> Chunk:
+    reader = csv.reader(lines)
+    header = [name.strip() for name in next(reader)]
+    rows = [row for row in reader if row]
+    columns = list(zip(*(row + [''] * (len(header) - len(row)) for row in rows))) or [()] * len(header)
+    return {name: list(values) for name, values in zip(header, columns)}
+
+
+def read_jsonl(path: str, chunk_size: int) -> Iterator[List[str]]:
+    """Raw chunks of a JSONL file holding one request body (business, responses, framework) per line"""
+    with open(path, encoding='utf-8') as handle:
+        yield from _line_chunks(handle, chunk_size)
+
+
+def parse_jsonl(lines: List[str]) -> Chunk:
+    return _columns([_flatten(json.loads(line)) for line in lines if line.strip()])
+
+
+def read_parquet(path: str, chunk_size: int) -> Iterator[Any]:
+    """Record batches of a Parquet file with the CSV layout"""
+    try:
+        import pyarrow.parquet as pq
+    except ImportError:
+        raise RuntimeError("Reading Parquet needs the pyarrow package")
+    yield from pq.ParquetFile(path).iter_batches(batch_size=chunk_size)
+
+
+def parse_parquet(batch: Any) -> Chunk:
+    return batch.to_pydict()
+
+
+# Format -> (reader of raw chunks, parser of one raw chunk into columns). Raw chunks are what
+# cross to worker processes, so parsing is spread over the workers along with scoring
+FORMATS = {
+    'csv': (read_csv, parse_csv),
+    'jsonl': (read_jsonl, parse_jsonl),
+    'ndjson': (read_jsonl, parse_jsonl),
+    'parquet': (read_parquet, parse_parquet)
+}
+
+
+def read_records(path: str, chunk_size: int = None, fmt: str = None) -> Iterator[Tuple[str, Any]]:
+    """``(format, raw chunk)`` pairs of an assessment file, its format taken from the extension unless given"""
+    fmt = (fmt or os.path.splitext(path)[1].lstrip('.')).lower()
+    if fmt not in FORMATS:
+        raise ValueError(f"Unsupported portfolio format: {fmt or path}")
+    for raw in FORMATS[fmt][0](path, chunk_size or ESG_PORTFOLIO_CHUNK_SIZE):
+        yield fmt, raw
+
+
+def summarize_raw(fmt: str, raw: Any, framework: str = 'NSRF', bin_width: float = None) -> PortfolioSummary:
+    """Parse and summarize one raw chunk; what each worker process runs"""
+    return summarize_chunk(FORMATS[fmt][1](raw), framework, bin_width)
+
+
+def summarize(chunks: Iterable[Tuple[str, Any]], framework: str = 'NSRF', workers: int = None,
+              bin_width: float = None) -> PortfolioSummary:
+    """
+    Aggregate the raw chunks from ``read_records``. Input of more than one
+    chunk is parsed and scored by ``workers`` processes, with at most two
+    chunks per worker read ahead, so memory stays bounded by the chunk size
+    and the number of segments.
+    """
+    workers = ESG_PORTFOLIO_WORKERS if workers is None else workers
+    summary = PortfolioSummary(bin_width)
+    chunks = iter(chunks)
+    head = list(islice(chunks, 2))
+    if workers <= 1 or len(head) < 2:
+        for chunk in chain(head, chunks):
+            summary.merge(summarize_raw(*chunk, framework, bin_width))
+        return summary
+
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        pending = set()
+        for chunk in chain(head, chunks):
+            if len(pending) >= workers * 2:
+                done, pending = wait(pending, return_when=FIRST_COMPLETED)
+                for future in done:
+                    summary.merge(future.result())
+            pending.add(pool.submit(summarize_raw, *chunk, framework, bin_width))
+        for future in pending:
+            summary.merge(future.result())
+    return summary
+
+
+def summarize_file(path: str, framework: str = 'NSRF', workers: int = None, chunk_size: int = None,
+                   fmt: str = None, bin_width: float = None) -> Dict[str, Any]:
+    """Portfolio summary of an assessment file, as a JSON-ready dict"""
+    return summarize(read_records(path, chunk_size, fmt), framework, workers, bin_width).to_dict()
+
+
+def main(argv: Optional[List[str]] = None):
+    parser = argparse.ArgumentParser(description='Score distributions for a book of SME assessments')
+    parser.add_argument('input', help='CSV, JSONL or Parquet file of assessments')
+    parser.add_argument('--out', help='JSON file for the summary; stdout when omitted')
+    parser.add_argument('--format', choices=sorted(FORMATS), help='input format when not given by the extension')
+    parser.add_argument('--framework', default='NSRF', help='framework for records without one')
+    parser.add_argument('--workers', type=int, default=None)
+    parser.add_argument('--chunk-size', type=int, default=None)
+    parser.add_argument('--bin-width', type=float, default=None)
+    args = parser.parse_args(argv)
+
+    result = summarize_file(args.input, args.framework, args.workers, args.chunk_size, args.format, args.bin_width)
+    if args.out:
+        with open(args.out, 'w', encoding='utf-8') as handle:
+            json.dump(result, handle, indent=2)
+    else:
+        json.dump(result, sys.stdout, indent=2)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,140 @@
+# Token budgeting for Bedrock prompts
+# Encodes assessment responses compactly and splits oversized assessments into chunks that fit
+
+import os
+import re
+from typing import Any, Callable, Dict, List, Optional, Sequence
+
+# Token budget for the assessment-responses block of a single prompt
+PROMPT_TOKEN_BUDGET = int(os.getenv('ESG_PROMPT_TOKEN_BUDGET', '4000'))
+
+# Claude tokenizers average a little under four characters per token on English prose
+CHARS_PER_TOKEN = 3.5
+
+# Evidence/notes lengths tried, longest first, before an assessment is chunked
+EVIDENCE_LIMITS = (None, 400, 200, 80)
+
+_SPACE = re.compile(r'\s+')
+_INDENT = re.compile(r'^[ \t]+|[ \t]+$', re.MULTILINE)
+_BLANK_LINES = re.compile(r'\n{3,}')
+
+
+def estimate_tokens(text: str) -> int:
+    """Rough token count for a prompt; errs high so budgets hold"""
+    return int(len(text) / CHARS_PER_TOKEN) + 1
+
+
+def compact_prompt(prompt: str) -> str:
+    """Strip the indentation triple-quoted prompts inherit and collapse blank runs"""
+    return _BLANK_LINES.sub('\n\n', _INDENT.sub('', prompt)).strip()
+
+
+def _cell(value, limit: Optional[int]) -> str:
+    text = _SPACE.sub(' ', str(value)).strip().replace('|', '/')
+    if limit is not None and len(text) > limit:
+        text = text[:max(limit - 1, 0)].rstrip() + '…' if limit else ''
+    return text
+
+
+def _fields(field_responses: Any, limit: Optional[int]) -> str:
+    """The structured answers (``fieldResponses``) as ``key=value;`` pairs, each value cut to ``limit``"""
+    if not isinstance(field_responses, dict):
+        return _cell(field_responses or '', limit)
+    pairs = []
+    for key, value in field_responses.items():
+        text = _cell('' if value is None else value, limit).replace(';', ',')
+        if text:
+            pairs.append(f"{_cell(key, None).replace(';', ',')}={text}")
+    return ';'.join(pairs)
+
+
+def encode_responses(responses: Sequence[Dict], evidence_limit: Optional[int] = None) -> str:
+    """
+    Responses as a pipe-separated table, one row per criterion.
+
+    The structured answers in ``fieldResponses`` are written as ``key=value``
+    pairs. Evidence or notes repeated across criteria are written once under
+    ``Shared evidence`` and referenced as ``[E1]``, ``[E2]``...; answer values,
+    evidence and notes longer than ``evidence_limit`` characters are cut short.
+    """
+    counts: Dict[str, int] = {}
+    for response in responses:
+        for field in ('evidence', 'notes'):
+            text = _cell(response.get(field) or '', evidence_limit)
+            if text:
+                counts[text] = counts.get(text, 0) + 1
+    shared = {text: f'[E{i}]' for i, text in enumerate((t for t, c in counts.items() if c > 1), 1)}
+
+    rows = ['criterion|score|fields|evidence|notes']
+    for response in responses:
+        cells = [_cell(response.get('criterionId', ''), None), _cell(response.get('score', ''), None),
+                 _fields(response.get('fieldResponses'), evidence_limit)]
+        for field in ('evidence', 'notes'):
+            text = _cell(response.get(field) or '', evidence_limit)
+            cells.append(shared.get(text, text))
+        rows.append('|'.join(cells).rstrip('|'))
+    if shared:
+        rows.append('Shared evidence:')
+        rows.extend(f'{ref} {text}' for text, ref in shared.items())
+    return '\n'.join(rows)
+
+
+def fit_responses(responses: Sequence[Dict], budget: int = None,
+                  limits: Sequence[Optional[int]] = EVIDENCE_LIMITS) -> Optional[str]:
+    """
+    The most detailed table of every response that fits ``budget`` tokens.
+
+    Tries each evidence limit in turn; returns None if even the tightest one
+    does not fit, in which case the caller should chunk.
+    """
+    budget = budget or PROMPT_TOKEN_BUDGET
+    for limit in limits:
+        table = encode_responses(responses, limit)
+        if estimate_tokens(table) <= budget:
+            return table
+    return None
+
+
+def _by_criterion(response: Dict) -> str:
+    return str(response.get('criterionId', ''))
+
+
+def chunk_responses(responses: Sequence[Dict], budget: int = None,
+                    evidence_limit: Optional[int] = EVIDENCE_LIMITS[-1],
+                    key: Callable[[Dict], Any] = _by_criterion) -> List[List[Dict]]:
+    """
+    Split responses into consecutive chunks whose tables each fit ``budget``.
+
+    Responses are ordered by ``key`` first; the default, criterion id, keeps
+    related criteria in the same chunk.
+    """
+    budget = budget or PROMPT_TOKEN_BUDGET
+    ordered = sorted(responses, key=key)
+    header = estimate_tokens(encode_responses([]))
+    chunks: List[List[Dict]] = []
+    current: List[Dict] = []
+    used = header
+    for response in ordered:
+        cost = estimate_tokens(encode_responses([response], evidence_limit)) - header
+        if current and used + cost > budget:
+            chunks.append(current)
+            current, used = [], header
+        current.append(response)
+        used += cost
+    if current:
+        chunks.append(current)
+    return chunks
+
+
+def summarize_responses(responses: Sequence[Dict], budget: int = None) -> str:
+    """
+    A table that always fits ``budget``: every response if possible, with
+    answer values and evidence dropped as a last resort, otherwise the
+    lowest-scoring responses.
+    """
+    budget = budget or PROMPT_TOKEN_BUDGET
+    table = fit_responses(responses, budget, EVIDENCE_LIMITS + (0,))
+    if table is not None:
+        return table
+    weakest = chunk_responses(responses, budget, 0, key=lambda response: response.get('score') or 0)
+    return encode_responses(weakest[0], 0)
@@ -0,0 +1,113 @@
+# Shared ESG guidance for prompts
+# One system block every prompt can open with: how to read the responses table, each framework's
+# rubric and the scoring and recommendation rules; long enough for Bedrock to cache as a prefix
+
+import json
+import os
+import threading
+from typing import Dict, List, Optional
+
+from prompt_budget import compact_prompt
+
+RUBRICS_PATH = os.getenv(
+    'ESG_RUBRICS_PATH',
+    os.path.join(os.path.dirname(os.path.abspath(__file__)), 'data', 'rubrics.json')
+)
+
+PILLARS = ('environmental', 'social', 'governance')
+
+_INTRODUCTION = """
+    You are an ESG analyst for Malaysian micro, small and medium enterprises (MSMEs).
+    You assess self-reported ESG questionnaires against Malaysian frameworks: the
+    National Sustainability Reporting Framework (NSRF) and the National Industry ESG
+    (i-ESG) Framework. Your readers run small businesses with limited staff and
+    budgets, so every judgement must be explainable from the answers they gave.
+
+    How the assessment data is laid out:
+    - Each response row is criterion|score|fields|evidence|notes.
+    - score is the company's own 0-100 rating of that criterion; treat it as a claim
+      to check against the fields and evidence, not as the answer.
+    - fields holds the questionnaire answers as key=value pairs separated by ";".
+      The keys are the field ids listed under each criterion below; units are given
+      in brackets after the id.
+    - Evidence or notes shared by several criteria are written once under "Shared
+      evidence" and referenced as [E1], [E2] and so on.
+    - Text cut short to fit the prompt ends early; do not guess what is missing.
+    """
+
+_SCORING_RULES = """
+    How to score:
+    - Score each criterion 0-100 from its fields and evidence, using its benchmark
+      and guideline above:
+      0-24: no practice in place, or the answers contradict the claim;
+      25-49: informal or occasional practice, nothing measured;
+      50-74: an established practice that is tracked, but with gaps;
+      75-89: a documented, measured practice with records or targets;
+      90-100: all of that, plus certification, external verification or
+      sustained improvement.
+    - A pillar score is the weighted mean of its answered criteria, using the
+      weights above; unanswered criteria drop out rather than scoring 0.
+    - The overall score weights the pillars as listed for the framework.
+    - Never raise a score above what the fields and evidence support. A "true"
+      with no detail earns less than a measured value or a described practice.
+    """
+
+_RECOMMENDATION_RULES = """
+    How to recommend:
+    - Target the lowest-scoring, highest-weighted criteria first.
+    - Each recommendation names concrete actions an MSME can take with its own
+      staff, a realistic timeframe, and a measurable expected impact (for example
+      a percentage cut in electricity spend or a share of waste recycled).
+    - Refer to the criterion ids a recommendation improves in relatedCriteria.
+    - Prefer Malaysian programmes, certifications and support where they fit:
+      green financing and government incentives, ISO 14001, the Green Building
+      Index, and training offered by industry bodies.
+    - Do not invent grant names, amounts or deadlines; the service matches grants
+      separately from a maintained catalogue.
+    """
+
+
+def _criterion_lines(criterion: Dict) -> List[str]:
+    lines = [f"- {criterion['id']} ({criterion.get('title', criterion['id'])}), weight {criterion['weight']:g}"]
+    if criterion.get('benchmark'):
+        lines.append(f"  Benchmark: {criterion['benchmark']}")
+    if criterion.get('guideline'):
+        lines.append(f"  Guideline: {criterion['guideline']}")
+    if criterion.get('fields'):
+        lines.append(f"  Fields: {', '.join(criterion['fields'])}")
+    return lines
+
+
+def _rubric_section(rubric: Dict) -> str:
+    pillars = rubric['pillars']
+    weights = ', '.join(f"{pillar} {pillars[pillar]['weight']:g}" for pillar in PILLARS if pillar in pillars)
+    lines = [f"{rubric.get('name')} (pillar weights: {weights})"]
+    for pillar in PILLARS:
+        for category in pillars.get(pillar, {}).get('categories', []):
+            lines.append(f"{pillar.capitalize()} / {category['id']}, weight {category['weight']:g} within the pillar:")
+            for criterion in category['criteria']:
+                lines.extend(_criterion_lines(criterion))
+    return '\n'.join(lines)
+
+
+def build_guidance(path: str = RUBRICS_PATH) -> str:
+    """The guidance block for every rubric in the file, compacted like a template prefix"""
+    with open(path, encoding='utf-8') as handle:
+        rubrics = json.load(handle)
+    sections = [compact_prompt(_INTRODUCTION), 'Framework rubrics:']
+    sections += [_rubric_section(rubric) for rubric in rubrics.values()]
+    sections += [compact_prompt(_SCORING_RULES), compact_prompt(_RECOMMENDATION_RULES)]
+    return '\n\n'.join(sections)
+
+
+_guidance: Optional[str] = None
+_guidance_lock = threading.Lock()
+
+
+def get_guidance() -> str:
+    """Process-wide guidance block, built on first use; byte-identical for every call"""
+    global _guidance
+    with _guidance_lock:
+        if _guidance is None:
+            _guidance = build_guidance()
+        return _guidance
@@ -0,0 +1,91 @@
+# Prompt templates
+# Each prompt is an invariant block of instructions and output schema, compacted once at import,
+# followed by the per-request data; the invariant block goes first, as the system prompt
+
+import os
+from typing import Any, Dict, NamedTuple, Optional, Union
+
+from prompt_budget import compact_prompt
+from prompt_guidance import get_guidance
+
+# 'true' opens every system prompt with the shared guidance block (prompt_guidance.py) and marks
+# it, and the template's own prefix, as Bedrock prompt-cache points. Only for models with prompt
+# caching (e.g. Claude 3.5 Haiku, Claude 3.7 Sonnet); Claude 3 Sonnet rejects the marker
+BEDROCK_PROMPT_CACHING = os.getenv('BEDROCK_PROMPT_CACHING', 'false').lower() == 'true'
+
+ANTHROPIC_VERSION = 'bedrock-2023-05-31'
+
+
+class Prompt(NamedTuple):
+    """A rendered template: the invariant ``prefix`` and this request's ``data``"""
+    prefix: str
+    data: str
+
+    @property
+    def text(self) -> str:
+        return f"{self.prefix}\n\n{self.data}"
+
+
+class PromptTemplate:
+    """
+    A prompt split into an invariant ``prefix`` (role, instructions, output
+    schema) and a ``data`` format string holding the per-request fields.
+
+    Both are compacted when the template is defined, so ``render`` only fills
+    the data fields and the prefix is byte-identical on every call.
+
+    The prefix is never formatted, so JSON braces in a schema need no
+    escaping there.
+    """
+
+    __slots__ = ('name', 'prefix', 'data')
+
+    def __init__(self, name: str, prefix: str, data: str):
+        self.name = name
+        self.prefix = compact_prompt(prefix)
+        self.data = compact_prompt(data)
+
+    def render(self, **fields: Any) -> Prompt:
+        return Prompt(self.prefix, self.data.format_map(fields))
+
+
+def request_body(prompt: Union[Prompt, str], max_tokens: int, temperature: Optional[float] = None,
+                 caching: Optional[bool] = None) -> Dict[str, Any]:
+    """
+    Anthropic messages body for a prompt: a rendered template's prefix as the
+    system block and its data as the user turn. A plain string is sent as the
+    user turn alone.
+
+    With ``caching`` (default BEDROCK_PROMPT_CACHING) the shared guidance
+    block goes first, and both system blocks are cache points. The guidance
+    alone is over the 1024-token minimum, so every prompt shares one cached
+    prefix, and each template adds its own.
+    """
+    body: Dict[str, Any] = {"anthropic_version": ANTHROPIC_VERSION, "max_tokens": max_tokens}
+    content = prompt
+    if isinstance(prompt, Prompt):
+        if BEDROCK_PROMPT_CACHING if caching is None else caching:
+            body["system"] = [{"type": "text", "text": text, "cache_control": {"type": "ephemeral"}}
+                              for text in (get_guidance(), prompt.prefix)]
+        else:
+            body["system"] = [{"type": "text", "text": prompt.prefix}]
+        content = prompt.data
+    body["messages"] = [{"role": "user", "content": content}]
+    if temperature is not None:
+        body["temperature"] = temperature
+    return body
+
+
+def prompt_text(body: Dict[str, Any]) -> str:
+    """All the text a request body sends: system blocks, then the messages"""
+    parts = []
+    system = body.get('system') or []
+    for block in ([{'text': system}] if isinstance(system, str) else system):
+        parts.append(block.get('text', ''))
+    for message in body.get('messages', []):
+        content = message.get('content')
+        if isinstance(content, str):
+            parts.append(content)
+        else:
+            parts.extend(block.get('text', '') for block in content or [])
+    return '\n\n'.join(part for part in parts if part)
@@ -0,0 +1,415 @@
+# Resilience layer for Bedrock calls
+# Per-model circuit breakers, deadline-aware timeouts and hedged requests, shared by
+# every caller in the process so a brownout is detected once and not hammered
+
+import contextvars
+import os
+import threading
+import time
+from collections import deque
+from concurrent.futures import FIRST_COMPLETED, Future, ThreadPoolExecutor, wait
+from contextlib import contextmanager
+from typing import TYPE_CHECKING, Any, Awaitable, Callable, Deque, Dict, Iterable, Iterator, List, Optional, Tuple, TypeVar
+
+if TYPE_CHECKING:
+    import asyncio
+
+T = TypeVar('T')
+
+# Consecutive failures that open a model's breaker, and seconds before it lets a probe through
+BEDROCK_BREAKER_FAILURES = int(os.getenv('BEDROCK_BREAKER_FAILURES', '5'))
+BEDROCK_BREAKER_RESET = float(os.getenv('BEDROCK_BREAKER_RESET', '30'))
+# Send a duplicate request once the first has run past this latency percentile (0 disables)
+BEDROCK_HEDGE_PERCENTILE = float(os.getenv('BEDROCK_HEDGE_PERCENTILE', '0'))
+# Per-call timeout as a multiple of the observed p99 latency (0 disables)
+BEDROCK_TIMEOUT_MULTIPLIER = float(os.getenv('BEDROCK_TIMEOUT_MULTIPLIER', '4'))
+BEDROCK_MIN_TIMEOUT = float(os.getenv('BEDROCK_MIN_TIMEOUT', '10'))
+# Seconds of Lambda time kept back for the fallback path and the response
+BEDROCK_DEADLINE_RESERVE = float(os.getenv('BEDROCK_DEADLINE_RESERVE', '2'))
+
+# Latency samples needed before percentiles drive timeouts or hedging
+_MIN_SAMPLES = 20
+
+# Quota errors mean we are sending too fast, not that the service is down; the scheduler handles them
+THROTTLING_ERRORS = ('ThrottlingException', 'TooManyRequestsException', 'ServiceQuotaExceededException')
+# Client errors caused by the request itself say nothing about the service's health either
+_NON_HEALTH_ERRORS = ('ValidationException',) + THROTTLING_ERRORS
+
+
+class ResilienceError(Exception):
+    """A call was refused or abandoned by the resilience layer rather than failed by Bedrock"""
+    # Whether the error says the service is unhealthy, i.e. counts toward opening the breaker
+    service_fault = True
+
+
+class CircuitOpenError(ResilienceError):
+    pass
+
+
+class DeadlineExceeded(ResilienceError, TimeoutError):
+    pass
+
+
+_deadline: contextvars.ContextVar[Optional[float]] = contextvars.ContextVar('bedrock_deadline', default=None)
+
+
+@contextmanager
+def deadline_scope(seconds: Optional[float]) -> Iterator[None]:
+    """Bound every Bedrock call made in this context (and threads started via ``run_in_context``)"""
+    token = _deadline.set(time.monotonic() + seconds if seconds is not None else None)
+    try:
+        yield
+    finally:
+        _deadline.reset(token)
+
+
+def lambda_deadline(context) -> Optional[float]:
+    """Seconds Bedrock calls may use in this invocation: remaining Lambda time less the reserve"""
+    remaining = getattr(context, 'get_remaining_time_in_millis', None)
+    if remaining is None:
+        return None
+    return max(remaining() / 1000.0 - BEDROCK_DEADLINE_RESERVE, 0.0)
+
+
+def remaining_time() -> Optional[float]:
+    """Seconds left before the current deadline, or None when there is none"""
+    deadline = _deadline.get()
+    return None if deadline is None else deadline - time.monotonic()
+
+
+def run_in_context(executor, fn: Callable[..., T], *args, **kwargs) -> 'Future[T]':
+    """``executor.submit`` that carries the caller's deadline over to the worker thread"""
+    return executor.submit(contextvars.copy_context().run, fn, *args, **kwargs)
+
+
+class CircuitBreaker:
+    """
+    Closed, open or half-open.
+
+    ``failure_threshold`` consecutive failures open the breaker and calls are
+    refused for ``reset_timeout`` seconds. Then one probe is let through
+    (half-open); its success closes the breaker, its failure reopens it.
+    """
+
+    def __init__(self, failure_threshold: int = None, reset_timeout: float = None):
+        self.failure_threshold = failure_threshold or BEDROCK_BREAKER_FAILURES
+        self.reset_timeout = reset_timeout if reset_timeout is not None else BEDROCK_BREAKER_RESET
+        self.failures = 0
+        self.opened_at: Optional[float] = None
+        self.probing = False
+        self.rejected = 0
+        self.opened = 0
+        self._lock = threading.Lock()
+
+    @property
+    def state(self) -> str:
+        if self.opened_at is None:
+            return 'closed'
+        if self.probing or time.monotonic() - self.opened_at >= self.reset_timeout:
+            return 'half_open'
+        return 'open'
+
+    def available(self) -> bool:
+        """Whether a call would be let through, without claiming the half-open probe"""
+        return self.state != 'open' and not self.probing
+
+    def allow(self) -> bool:
+        with self._lock:
+            state = self.state
+            if state == 'closed':
+                return True
+            if state == 'half_open' and not self.probing:
+                self.probing = True
+                return True
+            self.rejected += 1
+            return False
+
+    def record_success(self):
+        with self._lock:
+            self.failures = 0
+            self.opened_at = None
+            self.probing = False
+
+    def release_probe(self):
+        """End a half-open probe without a verdict on the service"""
+        with self._lock:
+            self.probing = False
+
+    def record_failure(self):
+        with self._lock:
+            self.failures += 1
+            if self.probing or self.failures >= self.failure_threshold:
+                if self.opened_at is None or self.probing:
+                    self.opened += 1
+                self.opened_at = time.monotonic()
+                self.probing = False
+
+    def snapshot(self) -> Dict[str, Any]:
+        return {'state': self.state, 'consecutive_failures': self.failures,
+                'times_opened': self.opened, 'rejected': self.rejected}
+
+
+class LatencyTracker:
+    """Latencies of the last ``size`` successful calls"""
+
+    def __init__(self, size: int = 200):
+        self._samples: Deque[float] = deque(maxlen=size)
+        self._lock = threading.Lock()
+
+    def add(self, seconds: float):
+        with self._lock:
+            self._samples.append(seconds)
+
+    def percentile(self, p: float) -> Optional[float]:
+        """The ``p``th percentile, or None until enough samples have been seen"""
+        with self._lock:
+            if len(self._samples) < _MIN_SAMPLES:
+                return None
+            ordered = sorted(self._samples)
+        return ordered[min(int(len(ordered) * p / 100.0), len(ordered) - 1)]
+
+
+def _counts_against_health(error: BaseException) -> bool:
+    code = getattr(error, 'response', {}).get('Error', {}).get('Code')
+    return code not in _NON_HEALTH_ERRORS
+
+
+def _close(stream: Any):
+    # botocore's EventStream (and any generator) releases its connection on close()
+    close = getattr(stream, 'close', None)
+    if close is not None:
+        close()
+
+
+class BedrockResilience:
+    """
+    Guards calls per model id.
+
+    A call is refused with CircuitOpenError while the model's breaker is open.
+    Its timeout is the remaining deadline, tightened to ``timeout_multiplier``
+    times the model's p99 latency once that is known. With hedging enabled, a
+    duplicate request starts when the first one passes the ``hedge_percentile``
+    latency and whichever finishes first wins. An abandoned blocking call keeps
+    its worker thread until botocore's own read timeout ends it.
+    """
+
+    def __init__(self, hedge_percentile: float = None, timeout_multiplier: float = None,
+                 failure_threshold: int = None, reset_timeout: float = None, max_workers: int = 16):
+        self.hedge_percentile = BEDROCK_HEDGE_PERCENTILE if hedge_percentile is None else hedge_percentile
+        self.timeout_multiplier = BEDROCK_TIMEOUT_MULTIPLIER if timeout_multiplier is None else timeout_multiplier
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.max_workers = max_workers
+        self._breakers: Dict[str, CircuitBreaker] = {}
+        self._latencies: Dict[str, LatencyTracker] = {}
+        self._executor: Optional[ThreadPoolExecutor] = None
+        self._lock = threading.Lock()
+        self.hedged = 0
+        self.hedge_wins = 0
+        self.timeouts = 0
+
+    def breaker(self, model_id: str) -> CircuitBreaker:
+        with self._lock:
+            if model_id not in self._breakers:
+                self._breakers[model_id] = CircuitBreaker(self.failure_threshold, self.reset_timeout)
+                self._latencies[model_id] = LatencyTracker()
+            return self._breakers[model_id]
+
+    def available(self, model_id: str) -> bool:
+        """False while the model's breaker is refusing calls or the deadline has passed"""
+        remaining = remaining_time()
+        return self.breaker(model_id).available() and (remaining is None or remaining > 0)
+
+    def _timeout(self, model_id: str) -> Optional[float]:
+        timeout = remaining_time()
+        if timeout is not None and timeout <= 0:
+            raise DeadlineExceeded(f"No time left for a {model_id} call")
+        p99 = self._latencies[model_id].percentile(99) if self.timeout_multiplier else None
+        if p99 is not None:
+            adaptive = max(p99 * self.timeout_multiplier, BEDROCK_MIN_TIMEOUT)
+            timeout = adaptive if timeout is None else min(timeout, adaptive)
+        return timeout
+
+    def _hedge_delay(self, model_id: str) -> Optional[float]:
+        if not self.hedge_percentile:
+            return None
+        return self._latencies[model_id].percentile(self.hedge_percentile)
+
+    def _admit(self, model_id: str) -> Tuple[CircuitBreaker, Optional[float]]:
+        """(breaker, timeout) for a new call; running out of time is not held against the service"""
+        breaker = self.breaker(model_id)
+        timeout = self._timeout(model_id)
+        if not breaker.allow():
+            raise CircuitOpenError(f"Circuit open for {model_id}")
+        return breaker, timeout
+
+    def _record(self, model_id: str, breaker: CircuitBreaker, started: float, error: Optional[BaseException]):
+        if error is None:
+            breaker.record_success()
+            self._latencies[model_id].add(time.monotonic() - started)
+        elif getattr(error, 'service_fault', True) and _counts_against_health(error):
+            breaker.record_failure()
+        else:
+            # The request was at fault, not the service
+            breaker.release_probe()
+
+    def call(self, model_id: str, fn: Callable[[], T]) -> T:
+        """Run a blocking call under the model's breaker, timeout and hedging policy"""
+        breaker, timeout = self._admit(model_id)
+        started = time.monotonic()
+        try:
+            hedge_delay = self._hedge_delay(model_id)
+            if timeout is None and hedge_delay is None:
+                result = fn()
+            else:
+                result = self._call_guarded(fn, timeout, hedge_delay)
+        except BaseException as e:
+            self._record(model_id, breaker, started, e)
+            raise
+        self._record(model_id, breaker, started, None)
+        return result
+
+    def guard_stream(self, model_id: str, start: Callable[[], Iterable[T]]) -> Iterator[T]:
+        """
+        Iterate a streaming response under the model's breaker.
+
+        The deadline is checked between events rather than enforced as a timeout,
+        since a stream that is still producing is not stuck.
+        """
+        breaker, _ = self._admit(model_id)
+        started = time.monotonic()
+        stream = None
+        try:
+            stream = start()
+            for item in stream:
+                remaining = remaining_time()
+                if remaining is not None and remaining <= 0:
+                    self.timeouts += 1
+                    raise DeadlineExceeded(f"Deadline passed while streaming from {model_id}")
+                yield item
+        except GeneratorExit:
+            # The consumer stopped early; not a verdict on the service
+            breaker.release_probe()
+            _close(stream)
+            raise
+        except BaseException as e:
+            self._record(model_id, breaker, started, e)
+            _close(stream)
+            raise
+        self._record(model_id, breaker, started, None)
+
+    def _pool(self) -> ThreadPoolExecutor:
+        with self._lock:
+            if self._executor is None:
+                self._executor = ThreadPoolExecutor(max_workers=self.max_workers, thread_name_prefix='bedrock-guard')
+            return self._executor
+
+    def _call_guarded(self, fn: Callable[[], T], timeout: Optional[float], hedge_delay: Optional[float]) -> T:
+        deadline = None if timeout is None else time.monotonic() + timeout
+        attempts: List[Future] = [run_in_context(self._pool(), fn)]
+        error: Optional[BaseException] = None
+        while attempts:
+            wait_for = None if deadline is None else max(deadline - time.monotonic(), 0)
+            hedge_now = hedge_delay is not None and len(attempts) == 1 and error is None
+            if hedge_now and (wait_for is None or hedge_delay < wait_for):
+                wait_for = hedge_delay
+            done, _ = wait(attempts, timeout=wait_for, return_when=FIRST_COMPLETED)
+            if not done:
+                if hedge_now and wait_for == hedge_delay:
+                    self.hedged += 1
+                    hedge_delay = None
+                    attempts.append(run_in_context(self._pool(), fn))
+                    continue
+                self.timeouts += 1
+                raise DeadlineExceeded(f"Bedrock call exceeded its {timeout:.2f}s timeout")
+            for future in done:
+                if future.exception() is None:
+                    if future is not attempts[0]:
+                        self.hedge_wins += 1
+                    return future.result()
+                error = future.exception()
+                attempts.remove(future)
+        raise error
+
+    async def call_async(self, model_id: str, factory: Callable[[], Awaitable[T]]) -> T:
+        """Async counterpart of ``call``; ``factory`` starts one attempt each time it is called"""
+        import asyncio
+
+        breaker, timeout = self._admit(model_id)
+        started = time.monotonic()
+        try:
+            hedge_delay = self._hedge_delay(model_id)
+            result = await self._call_guarded_async(factory, timeout, hedge_delay)
+        except asyncio.CancelledError:
+            # Cancelled by our caller, not a verdict on the service
+            breaker.release_probe()
+            raise
+        except BaseException as e:
+            self._record(model_id, breaker, started, e)
+            raise
+        self._record(model_id, breaker, started, None)
+        return result
+
+    async def _call_guarded_async(self, factory, timeout: Optional[float], hedge_delay: Optional[float]):
+        import asyncio
+
+        loop = asyncio.get_running_loop()
+        deadline = None if timeout is None else loop.time() + timeout
+        first = asyncio.ensure_future(factory())
+        attempts: List['asyncio.Future'] = [first]
+        error: Optional[BaseException] = None
+        try:
+            while attempts:
+                wait_for = None if deadline is None else max(deadline - loop.time(), 0)
+                hedge_now = hedge_delay is not None and len(attempts) == 1 and error is None
+                if hedge_now and (wait_for is None or hedge_delay < wait_for):
+                    wait_for = hedge_delay
+                done, _ = await asyncio.wait(attempts, timeout=wait_for, return_when=asyncio.FIRST_COMPLETED)
+                if not done:
+                    if hedge_now and wait_for == hedge_delay:
+                        self.hedged += 1
+                        hedge_delay = None
+                        attempts.append(asyncio.ensure_future(factory()))
+                        continue
+                    self.timeouts += 1
+                    raise DeadlineExceeded(f"Bedrock call exceeded its {timeout:.2f}s timeout")
+                for future in done:
+                    if future.exception() is None:
+                        if future is not first:
+                            self.hedge_wins += 1
+                        return future.result()
+                    error = future.exception()
+                    attempts.remove(future)
+            raise error
+        finally:
+            for attempt in attempts:
+                attempt.cancel()
+
+    def stats(self) -> Dict[str, Any]:
+        """Breaker state and latency percentiles per model, plus hedging and timeout counters"""
+        with self._lock:
+            models = list(self._breakers)
+        per_model = {}
+        for model_id in models:
+            latencies = self._latencies[model_id]
+            p50, p99 = latencies.percentile(50), latencies.percentile(99)
+            per_model[model_id] = dict(
+                self._breakers[model_id].snapshot(),
+                p50_ms=None if p50 is None else round(p50 * 1000),
+                p99_ms=None if p99 is None else round(p99 * 1000)
+            )
+        return {'models': per_model, 'hedged': self.hedged, 'hedge_wins': self.hedge_wins,
+                'timeouts': self.timeouts}
+
+
+_resilience: Optional[BedrockResilience] = None
+_resilience_lock = threading.Lock()
+
+
+def get_resilience() -> BedrockResilience:
+    """Process-wide BedrockResilience, so every service shares one breaker per model"""
+    global _resilience
+    with _resilience_lock:
+        if _resilience is None:
+            _resilience = BedrockResilience()
+        return _resilience
@@ -0,0 +1,181 @@
+# Response cache for Bedrock invocations
+# Keys are content hashes of the request, so byte-identical calls share one entry
+
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Dict, List, Optional
+
+BEDROCK_CACHE_TTL = float(os.getenv('BEDROCK_CACHE_TTL', '900'))
+BEDROCK_CACHE_SIZE = int(os.getenv('BEDROCK_CACHE_SIZE', '256'))
+# e.g. /tmp/bedrock-cache.sqlite on Lambda; unset keeps the cache in memory only
+BEDROCK_CACHE_PATH = os.getenv('BEDROCK_CACHE_PATH')
+
+
+def cache_key(model_id: str, prompt: str, temperature: Optional[float], max_tokens: Optional[int]) -> str:
+    """Hash of everything that determines a completion"""
+    material = json.dumps([model_id, prompt, temperature, max_tokens], separators=(',', ':'))
+    return hashlib.sha256(material.encode('utf-8')).hexdigest()
+
+
+def request_cache_key(model_id: str, body: Dict[str, Any]) -> str:
+    """Cache key for an Anthropic messages request body"""
+    prompt = json.dumps(body.get('messages', []), separators=(',', ':'), sort_keys=True)
+    if body.get('system'):
+        prompt = json.dumps(body['system'], sort_keys=True) + prompt
+    return cache_key(model_id, prompt, body.get('temperature'), body.get('max_tokens'))
+
+
+class CacheTier:
+    """Storage backend for cached responses; subclass to plug in another store"""
+
+    def get(self, key: str) -> Optional[Any]:
+        raise NotImplementedError
+
+    def put(self, key: str, value: Any):
+        raise NotImplementedError
+
+    def clear(self):
+        raise NotImplementedError
+
+
+class MemoryTier(CacheTier):
+    """Thread-safe in-process LRU with per-entry expiry"""
+
+    def __init__(self, max_entries: int = BEDROCK_CACHE_SIZE, ttl: float = BEDROCK_CACHE_TTL):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self._entries: 'OrderedDict[str, tuple]' = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key: str) -> Optional[Any]:
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            expires_at, value = entry
+            if expires_at < time.monotonic():
+                del self._entries[key]
+                return None
+            self._entries.move_to_end(key)
+            return value
+
+    def put(self, key: str, value: Any):
+        with self._lock:
+            self._entries[key] = (time.monotonic() + self.ttl, value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+
+class SQLiteTier(CacheTier):
+    """Persistent tier that outlives the process, e.g. across warm Lambda invocations via /tmp"""
+
+    def __init__(self, path: str, ttl: float = BEDROCK_CACHE_TTL):
+        self.path = path
+        self.ttl = ttl
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+        self._conn.execute('PRAGMA journal_mode=WAL')
+        self._conn.execute(
+            'CREATE TABLE IF NOT EXISTS responses (key TEXT PRIMARY KEY, value TEXT NOT NULL, expires_at REAL NOT NULL)'
+        )
+
+    def get(self, key: str) -> Optional[Any]:
+        with self._lock:
+            row = self._conn.execute(
+                'SELECT value FROM responses WHERE key = ? AND expires_at >= ?', (key, time.time())
+            ).fetchone()
+        return json.loads(row[0]) if row else None
+
+    def put(self, key: str, value: Any):
+        with self._lock:
+            self._conn.execute(
+                'INSERT OR REPLACE INTO responses (key, value, expires_at) VALUES (?, ?, ?)',
+                (key, json.dumps(value), time.time() + self.ttl)
+            )
+
+    def purge_expired(self):
+        """Drop expired rows; lookups already ignore them"""
+        with self._lock:
+            self._conn.execute('DELETE FROM responses WHERE expires_at < ?', (time.time(),))
+
+    def clear(self):
+        with self._lock:
+            self._conn.execute('DELETE FROM responses')
+
+
+class ResponseCache:
+    """
+    Tiered cache for decoded Bedrock responses.
+
+    Tiers are checked fastest first; a hit in a slower tier is copied into the
+    faster ones. Hit and miss counters are available from ``stats()``.
+    """
+
+    def __init__(self, tiers: List[CacheTier]):
+        self.tiers = tiers
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.tier_hits = [0] * len(tiers)
+
+    def get(self, key: str) -> Optional[Any]:
+        for index, tier in enumerate(self.tiers):
+            value = tier.get(key)
+            if value is not None:
+                for faster in self.tiers[:index]:
+                    faster.put(key, value)
+                with self._lock:
+                    self.hits += 1
+                    self.tier_hits[index] += 1
+                return value
+        with self._lock:
+            self.misses += 1
+        return None
+
+    def put(self, key: str, value: Any):
+        for tier in self.tiers:
+            tier.put(key, value)
+
+    def clear(self):
+        for tier in self.tiers:
+            tier.clear()
+
+    def stats(self) -> Dict[str, Any]:
+        lookups = self.hits + self.misses
+        return {
+            'hits': self.hits,
+            'misses': self.misses,
+            'hit_rate': round(self.hits / lookups, 4) if lookups else 0.0,
+            'tier_hits': {type(tier).__name__: count for tier, count in zip(self.tiers, self.tier_hits)}
+        }
+
+
+_default_cache: Optional[ResponseCache] = None
+_default_lock = threading.Lock()
+
+
+def get_default_cache() -> Optional[ResponseCache]:
+    """Process-wide cache configured from the environment; None when BEDROCK_CACHE_TTL is 0"""
+    global _default_cache
+    if BEDROCK_CACHE_TTL <= 0:
+        return None
+    with _default_lock:
+        if _default_cache is None:
+            tiers: List[CacheTier] = [MemoryTier()]
+            if BEDROCK_CACHE_PATH:
+                tiers.append(SQLiteTier(BEDROCK_CACHE_PATH))
+            _default_cache = ResponseCache(tiers)
+    return _default_cache
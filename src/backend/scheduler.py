@@ -0,0 +1,276 @@
+# Throttle-aware scheduler for Bedrock calls
+# Paces requests per model with token buckets, lets interactive work ahead of bulk
+# work, and retries throttled calls with jittered backoff
+
+import contextvars
+import heapq
+import itertools
+import json
+import os
+import random
+import threading
+import time
+from contextlib import contextmanager
+from typing import Any, Awaitable, Callable, Dict, Iterator, List, Optional, Tuple, TypeVar
+
+from prompt_budget import estimate_tokens
+from resilience import THROTTLING_ERRORS, DeadlineExceeded, remaining_time
+
+T = TypeVar('T')
+
+# Per-model quotas applied on our side; 0 leaves that dimension unlimited
+BEDROCK_REQUESTS_PER_SECOND = float(os.getenv('BEDROCK_REQUESTS_PER_SECOND', '0'))
+BEDROCK_TOKENS_PER_MINUTE = float(os.getenv('BEDROCK_TOKENS_PER_MINUTE', '0'))
+# Per-model overrides, e.g. {"anthropic.claude-3-sonnet-20240229-v1:0": {"rps": 2, "tpm": 200000}}
+BEDROCK_RATE_LIMITS = os.getenv('BEDROCK_RATE_LIMITS', '')
+
+# Retries after a throttling error, and the full-jitter backoff bounds in seconds
+BEDROCK_THROTTLE_RETRIES = int(os.getenv('BEDROCK_THROTTLE_RETRIES', '4'))
+BEDROCK_BACKOFF_BASE = float(os.getenv('BEDROCK_BACKOFF_BASE', '0.25'))
+BEDROCK_BACKOFF_CAP = float(os.getenv('BEDROCK_BACKOFF_CAP', '8'))
+
+# Lanes, lowest value served first
+PRIORITY_INTERACTIVE = 0
+PRIORITY_BULK = 1
+
+
+class QueueDeadlineExceeded(DeadlineExceeded):
+    """The deadline would pass before the call got its turn; says nothing about the service"""
+    service_fault = False
+
+
+_priority: contextvars.ContextVar[int] = contextvars.ContextVar('bedrock_priority', default=PRIORITY_INTERACTIVE)
+
+
+@contextmanager
+def priority_scope(priority: int) -> Iterator[None]:
+    """Run the Bedrock calls made in this context in the given lane"""
+    token = _priority.set(priority)
+    try:
+        yield
+    finally:
+        _priority.reset(token)
+
+
+def is_throttling_error(error: BaseException) -> bool:
+    code = getattr(error, 'response', {}).get('Error', {}).get('Code')
+    return code in THROTTLING_ERRORS
+
+
+def request_tokens(body: Dict[str, Any]) -> int:
+    """Tokens a request counts against a tokens/minute quota: the system and user prompt plus ``max_tokens``"""
+    prompt = json.dumps([body.get('system', []), body.get('messages', [])])
+    return estimate_tokens(prompt) + int(body.get('max_tokens', 0))
+
+
+def response_tokens(result: Dict[str, Any]) -> Optional[int]:
+    """Tokens actually used, from the response's ``usage`` block"""
+    usage = result.get('usage') if isinstance(result, dict) else None
+    if not usage:
+        return None
+    return int(usage.get('input_tokens', 0)) + int(usage.get('output_tokens', 0))
+
+
+class TokenBucket:
+    """``rate`` units per second refilled up to ``capacity``; a rate of 0 never limits"""
+
+    def __init__(self, rate: float, capacity: float):
+        self.rate = rate
+        self.capacity = capacity
+        self.level = capacity
+        self.updated = time.monotonic()
+
+    def _refill(self, now: float):
+        self.level = min(self.capacity, self.level + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def wait_time(self, amount: float, now: float) -> float:
+        """Seconds until ``amount`` is available (0 if it is now)"""
+        if not self.rate:
+            return 0.0
+        self._refill(now)
+        amount = min(amount, self.capacity)
+        return 0.0 if self.level >= amount else (amount - self.level) / self.rate
+
+    def take(self, amount: float):
+        if self.rate:
+            self.level -= min(amount, self.capacity)
+
+    def give(self, amount: float):
+        if self.rate:
+            self.level = min(self.capacity, self.level + amount)
+
+    def drain(self, now: float):
+        """Empty the bucket, e.g. after the service throttled us despite it"""
+        if self.rate:
+            self._refill(now)
+            self.level = min(self.level, 0.0)
+
+
+class _ModelQueue:
+    """Request and token buckets for one model, plus the callers waiting on them"""
+
+    def __init__(self, requests_per_second: float, tokens_per_minute: float):
+        self.requests = TokenBucket(requests_per_second, 1.0)
+        self.tokens = TokenBucket(tokens_per_minute / 60.0, tokens_per_minute)
+        self.waiting: List[Tuple[int, int]] = []
+        self.condition = threading.Condition()
+        self.throttled = 0
+        self.admitted = {PRIORITY_INTERACTIVE: 0, PRIORITY_BULK: 0}
+        self.queue_seconds = 0.0
+
+
+class BedrockScheduler:
+    """
+    Admission control in front of every Bedrock call.
+
+    Each model has a requests/second and a tokens/minute bucket. Callers queue
+    per model in (priority, arrival) order and only the head of the queue may
+    draw from the buckets, so a bulk job never overtakes an interactive one.
+    Admission sits outside the resilience guard, so time spent queued never
+    counts toward a call's timeout.
+
+    A throttling error drains the model's buckets, so every caller backs off,
+    and the call is retried after a full-jitter exponential delay. Waiting
+    never runs past the current Bedrock deadline.
+    """
+
+    def __init__(self, requests_per_second: float = None, tokens_per_minute: float = None,
+                 limits: Optional[Dict[str, Dict[str, float]]] = None, retries: int = None):
+        self.requests_per_second = BEDROCK_REQUESTS_PER_SECOND if requests_per_second is None else requests_per_second
+        self.tokens_per_minute = BEDROCK_TOKENS_PER_MINUTE if tokens_per_minute is None else tokens_per_minute
+        self.limits = limits if limits is not None else json.loads(BEDROCK_RATE_LIMITS or '{}')
+        self.retries = BEDROCK_THROTTLE_RETRIES if retries is None else retries
+        self._queues: Dict[str, _ModelQueue] = {}
+        self._sequence = itertools.count()
+        self._lock = threading.Lock()
+
+    def _queue(self, model_id: str) -> _ModelQueue:
+        with self._lock:
+            if model_id not in self._queues:
+                limits = self.limits.get(model_id, {})
+                self._queues[model_id] = _ModelQueue(
+                    limits.get('rps', self.requests_per_second),
+                    limits.get('tpm', self.tokens_per_minute)
+                )
+            return self._queues[model_id]
+
+    def acquire(self, model_id: str, tokens: int, priority: Optional[int] = None):
+        """Block until this call may start; raises DeadlineExceeded rather than wait past the deadline"""
+        queue = self._queue(model_id)
+        priority = _priority.get() if priority is None else priority
+        entry = (priority, next(self._sequence))
+        started = time.monotonic()
+        with queue.condition:
+            heapq.heappush(queue.waiting, entry)
+            try:
+                while True:
+                    delay = None
+                    if queue.waiting[0] == entry:
+                        now = time.monotonic()
+                        delay = max(queue.requests.wait_time(1, now), queue.tokens.wait_time(tokens, now))
+                        if delay == 0:
+                            queue.requests.take(1)
+                            queue.tokens.take(tokens)
+                            queue.admitted[priority] = queue.admitted.get(priority, 0) + 1
+                            queue.queue_seconds += now - started
+                            return
+                    remaining = remaining_time()
+                    if remaining is not None:
+                        if remaining <= 0 or (delay is not None and delay > remaining):
+                            raise QueueDeadlineExceeded(f"Deadline would pass while queued for {model_id}")
+                        delay = remaining if delay is None else delay
+                    queue.condition.wait(delay)
+            finally:
+                queue.waiting.remove(entry)
+                heapq.heapify(queue.waiting)
+                queue.condition.notify_all()
+
+    def settle(self, model_id: str, reserved: int, used: Optional[int]):
+        """Return the unused part of a tokens/minute reservation once actual usage is known"""
+        if used is None or used >= reserved:
+            return
+        queue = self._queue(model_id)
+        with queue.condition:
+            queue.tokens.give(reserved - used)
+            queue.condition.notify_all()
+
+    def _backoff(self, model_id: str, error: Exception, attempt: int) -> float:
+        """Seconds to wait before retrying ``error``; re-raises it if it should not be retried"""
+        if not is_throttling_error(error) or attempt >= self.retries:
+            raise error
+        queue = self._queue(model_id)
+        with queue.condition:
+            queue.throttled += 1
+            queue.requests.drain(time.monotonic())
+            queue.tokens.drain(time.monotonic())
+        delay = random.uniform(0, min(BEDROCK_BACKOFF_CAP, BEDROCK_BACKOFF_BASE * 2 ** attempt))
+        remaining = remaining_time()
+        if remaining is not None and delay >= remaining:
+            raise error
+        return delay
+
+    def run(self, model_id: str, fn: Callable[[], T], tokens: int = 0, priority: Optional[int] = None,
+            used_tokens: Optional[Callable[[T], Optional[int]]] = None) -> T:
+        """Call ``fn`` once admitted, retrying throttling errors with jittered backoff"""
+        attempt = 0
+        while True:
+            self.acquire(model_id, tokens, priority)
+            try:
+                result = fn()
+            except Exception as e:
+                time.sleep(self._backoff(model_id, e, attempt))
+                attempt += 1
+                continue
+            if used_tokens is not None:
+                self.settle(model_id, tokens, used_tokens(result))
+            return result
+
+    async def run_async(self, model_id: str, fn: Callable[[], Awaitable[T]], tokens: int = 0,
+                        priority: Optional[int] = None,
+                        used_tokens: Optional[Callable[[T], Optional[int]]] = None) -> T:
+        """``run`` for coroutines; queueing happens on a worker thread so the event loop stays free"""
+        import asyncio
+
+        loop = asyncio.get_running_loop()
+        attempt = 0
+        while True:
+            await loop.run_in_executor(None, contextvars.copy_context().run,
+                                       self.acquire, model_id, tokens, priority)
+            try:
+                result = await fn()
+            except Exception as e:
+                await asyncio.sleep(self._backoff(model_id, e, attempt))
+                attempt += 1
+                continue
+            if used_tokens is not None:
+                self.settle(model_id, tokens, used_tokens(result))
+            return result
+
+    def stats(self) -> Dict[str, Any]:
+        """Per-model queue depth, admissions per lane, throttles and time spent queued"""
+        with self._lock:
+            queues = dict(self._queues)
+        return {
+            model_id: {
+                'waiting': len(queue.waiting),
+                'admitted_interactive': queue.admitted.get(PRIORITY_INTERACTIVE, 0),
+                'admitted_bulk': queue.admitted.get(PRIORITY_BULK, 0),
+                'throttled': queue.throttled,
+                'queue_seconds': round(queue.queue_seconds, 3)
+            }
+            for model_id, queue in queues.items()
+        }
+
+
+_scheduler: Optional[BedrockScheduler] = None
+_scheduler_lock = threading.Lock()
+
+
+def get_scheduler() -> BedrockScheduler:
+    """Process-wide BedrockScheduler, so every caller shares one set of buckets per model"""
+    global _scheduler
+    with _scheduler_lock:
+        if _scheduler is None:
+            _scheduler = BedrockScheduler()
+        return _scheduler
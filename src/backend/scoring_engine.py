@@ -0,0 +1,248 @@
+# Deterministic ESG scoring engine
+# Compiles a framework rubric into weight matrices and scores assessments without an LLM call
+
+import json
+import os
+import threading
+from dataclasses import dataclass
+from typing import Dict, Iterable, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+RUBRICS_PATH = os.getenv(
+    'ESG_RUBRICS_PATH',
+    os.path.join(os.path.dirname(os.path.abspath(__file__)), 'data', 'rubrics.json')
+)
+
+PILLARS = ('environmental', 'social', 'governance')
+
+# Bands shared with the frontend (src/data/mockScoringData.ts)
+COMPLIANCE_BANDS = (50.0, 75.0)
+COMPLIANCE_LEVELS = ('needs-foundation', 'progressing', 'financing-ready')
+
+
+def determine_compliance_level(score: float) -> str:
+    """0-49 needs-foundation, 50-74 progressing, 75+ financing-ready"""
+    return COMPLIANCE_LEVELS[int(np.searchsorted(COMPLIANCE_BANDS, score, side='right'))]
+
+
+@dataclass
+class RubricScores:
+    """Scores for N assessments; row i of every array belongs to assessment i"""
+    categories: List[str]
+    category_scores: np.ndarray   # (N, K), NaN where no criterion in the category was answered
+    pillar_scores: np.ndarray     # (N, 3) in PILLARS order
+    overall_scores: np.ndarray    # (N,)
+    compliance_levels: List[str]
+
+    def row(self, index: int) -> Dict:
+        """Plain-dict view of one assessment's scores"""
+        return {
+            'category_scores': {
+                category: round(float(score), 1)
+                for category, score in zip(self.categories, self.category_scores[index])
+                if not np.isnan(score)
+            },
+            'environmental_score': round(float(self.pillar_scores[index, 0]), 1),
+            'social_score': round(float(self.pillar_scores[index, 1]), 1),
+            'governance_score': round(float(self.pillar_scores[index, 2]), 1),
+            'overall_score': round(float(self.overall_scores[index]), 1),
+            'compliance_level': self.compliance_levels[index]
+        }
+
+
+class CompiledRubric:
+    """
+    A framework rubric as matrices.
+
+    ``criterion_weights`` (C x K) holds each criterion's weight within its
+    category, ``category_weights`` (K x 3) each category's weight within its
+    pillar, and ``pillar_weights`` (3,) the pillar weights. Unanswered criteria
+    and categories drop out and the remaining weights are renormalised; a pillar
+    with no answers scores 0 but still counts toward the overall score.
+
+    The weights at each level must sum to 1, so the file states the weighting
+    that is actually applied; a rubric that does not is rejected on load.
+    """
+
+    def __init__(self, framework_id: str, rubric: Dict):
+        self.framework_id = framework_id
+        self.name = rubric.get('name', framework_id)
+        self.criteria: List[str] = []
+        self.categories: List[str] = []
+        criterion_entries: List[Tuple[str, int, float]] = []
+        category_entries: List[Tuple[int, int, float]] = []
+
+        for pillar_index, pillar in enumerate(PILLARS):
+            for category in rubric['pillars'].get(pillar, {}).get('categories', []):
+                category_index = len(self.categories)
+                self.categories.append(category['id'])
+                category_entries.append((category_index, pillar_index, category['weight']))
+                for criterion in category['criteria']:
+                    criterion_entries.append((criterion['id'], category_index, criterion['weight']))
+                    if criterion['id'] not in self.criteria:
+                        self.criteria.append(criterion['id'])
+
+        self.criterion_index = {criterion: i for i, criterion in enumerate(self.criteria)}
+        self.category_index = {category: k for k, category in enumerate(self.categories)}
+        self.criterion_weights = np.zeros((len(self.criteria), len(self.categories)))
+        for criterion, category_index, weight in criterion_entries:
+            self.criterion_weights[self.criterion_index[criterion], category_index] = weight
+        self.category_weights = np.zeros((len(self.categories), len(PILLARS)))
+        for category_index, pillar_index, weight in category_entries:
+            self.category_weights[category_index, pillar_index] = weight
+        self.pillar_weights = np.array([
+            rubric['pillars'].get(pillar, {}).get('weight', 0.0) for pillar in PILLARS
+        ])
+        self._check_weights()
+        # Non-zero entries of the weight matrix, for updating one category at a time
+        self.category_criteria = [np.flatnonzero(self.criterion_weights[:, k]) for k in range(len(self.categories))]
+        self.criterion_categories = {
+            criterion: [self.categories[k] for k in np.flatnonzero(self.criterion_weights[i])]
+            for criterion, i in self.criterion_index.items()
+        }
+
+    def _check_weights(self):
+        sums = [(f"criteria of category '{category}'", total)
+                for category, total in zip(self.categories, self.criterion_weights.sum(axis=0))]
+        sums += [(f"categories of pillar '{pillar}'", total)
+                 for pillar, total in zip(PILLARS, self.category_weights.sum(axis=0)) if total]
+        sums.append(('pillars', self.pillar_weights.sum()))
+        wrong = [f"{label} sum to {total:g}" for label, total in sums if not np.isclose(total, 1.0)]
+        if wrong:
+            raise ValueError(f"Rubric '{self.framework_id}' weights must sum to 1: {'; '.join(wrong)}")
+
+    def encode(self, assessments: Sequence[Sequence[Dict]]) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        Response lists to a score matrix (N x C) and an answered mask (N x C).
+
+        Criteria outside the rubric are ignored; scores are clipped to 0-100.
+        """
+        scores = np.zeros((len(assessments), len(self.criteria)))
+        answered = np.zeros((len(assessments), len(self.criteria)), dtype=bool)
+        for row, responses in enumerate(assessments):
+            for response in responses:
+                column = self.criterion_index.get(response.get('criterionId'))
+                score = response.get('score')
+                if column is None or not isinstance(score, (int, float)):
+                    continue
+                scores[row, column] = score
+                answered[row, column] = True
+        np.clip(scores, 0.0, 100.0, out=scores)
+        return scores, answered
+
+    def score_matrix(self, scores: np.ndarray, answered: np.ndarray) -> RubricScores:
+        """Score every row of an encoded batch in one pass"""
+        mask = answered.astype(float)
+        with np.errstate(invalid='ignore', divide='ignore'):
+            category_weight = mask @ self.criterion_weights
+            category_scores = (scores * mask) @ self.criterion_weights / category_weight
+        return self._score_categories(category_scores)
+
+    def _score_categories(self, category_scores: np.ndarray) -> RubricScores:
+        """Pillar, overall and compliance-level scores from category scores (N x K, NaN if unanswered)"""
+        with np.errstate(invalid='ignore', divide='ignore'):
+            category_answered = (~np.isnan(category_scores)).astype(float)
+            pillar_weight = category_answered @ self.category_weights
+            pillar_scores = np.nan_to_num(category_scores) @ self.category_weights / pillar_weight
+        pillar_scores = np.nan_to_num(pillar_scores)
+        overall = pillar_scores @ self.pillar_weights
+        levels = np.searchsorted(COMPLIANCE_BANDS, overall, side='right')
+        return RubricScores(
+            categories=list(self.categories),
+            category_scores=category_scores,
+            pillar_scores=pillar_scores,
+            overall_scores=overall,
+            compliance_levels=[COMPLIANCE_LEVELS[level] for level in levels]
+        )
+
+    def score_many(self, assessments: Sequence[Sequence[Dict]]) -> RubricScores:
+        return self.score_matrix(*self.encode(assessments))
+
+    def score(self, responses: Sequence[Dict]) -> Dict:
+        """Category, pillar, overall and compliance-level scores for one assessment"""
+        return self.score_many([responses]).row(0)
+
+    def criterion_scores(self, responses: Sequence[Dict]) -> Dict[str, float]:
+        """Scores of the responses that map onto the rubric, by criterion id, clipped to 0-100"""
+        scores = {}
+        for response in responses:
+            criterion = response.get('criterionId')
+            score = response.get('score')
+            if criterion in self.criterion_index and isinstance(score, (int, float)):
+                scores[criterion] = min(max(float(score), 0.0), 100.0)
+        return scores
+
+    def affected_categories(self, criteria: Iterable[str]) -> List[str]:
+        """Categories whose score a change to these criteria can move, in rubric order"""
+        affected = {category for criterion in criteria for category in self.criterion_categories.get(criterion, ())}
+        return [category for category in self.categories if category in affected]
+
+    def update_contributions(self, contributions: Dict[str, List[float]], scores: Dict[str, float],
+                             categories: Iterable[str]) -> Dict[str, List[float]]:
+        """
+        Recompute ``[weighted score sum, answered weight]`` for the given
+        categories from criterion scores, leaving the others untouched.
+        """
+        for category in categories:
+            k = self.category_index[category]
+            total = weight = 0.0
+            for i in self.category_criteria[k]:
+                score = scores.get(self.criteria[i])
+                if score is not None:
+                    total += self.criterion_weights[i, k] * score
+                    weight += self.criterion_weights[i, k]
+            contributions[category] = [total, weight]
+        return contributions
+
+    def contributions(self, scores: Dict[str, float]) -> Dict[str, List[float]]:
+        """Per-category contributions for every category; see ``update_contributions``"""
+        return self.update_contributions({}, scores, self.categories)
+
+    def score_contributions(self, contributions: Dict[str, List[float]]) -> Dict:
+        """``score`` computed from per-category contributions instead of responses"""
+        category_scores = np.array([[
+            total / weight if weight else np.nan
+            for total, weight in (contributions.get(category, (0.0, 0.0)) for category in self.categories)
+        ]])
+        return self._score_categories(category_scores).row(0)
+
+    def coverage(self, responses: Sequence[Dict]) -> int:
+        """Number of responses that map onto a rubric criterion"""
+        return sum(1 for response in responses if response.get('criterionId') in self.criterion_index)
+
+
+_rubrics: Optional[Dict[str, CompiledRubric]] = None
+_rubrics_lock = threading.Lock()
+
+
+def load_rubrics(path: str = RUBRICS_PATH) -> Dict[str, CompiledRubric]:
+    """Compile every rubric in the file, keyed by lower-cased framework id and alias"""
+    with open(path, encoding='utf-8') as handle:
+        data = json.load(handle)
+    rubrics = {}
+    for framework_id, rubric in data.items():
+        compiled = CompiledRubric(framework_id, rubric)
+        for name in [framework_id] + rubric.get('aliases', []):
+            rubrics[name.lower()] = compiled
+    return rubrics
+
+
+def get_rubric(framework: str) -> CompiledRubric:
+    """Compiled rubric for a framework name such as 'NSRF' or 'i-ESG'; NSRF when unknown"""
+    global _rubrics
+    with _rubrics_lock:
+        if _rubrics is None:
+            _rubrics = load_rubrics()
+    return _rubrics.get((framework or '').lower(), _rubrics['nsrf'])
+
+
+def framework_ids() -> List[str]:
+    """Id of every compiled rubric, once each (aliases left out), in file order"""
+    get_rubric('nsrf')
+    return list(dict.fromkeys(rubric.framework_id for rubric in _rubrics.values()))
+
+
+def calculate_weighted_score(responses: Sequence[Dict], framework: str = 'NSRF') -> Dict:
+    """Convenience wrapper: rubric scores for one assessment"""
+    return get_rubric(framework).score(responses)
@@ -0,0 +1,108 @@
+# Single-flight de-duplication of in-flight work
+# Concurrent calls with the same key share one running computation: the first caller runs it,
+# later callers wait for its result instead of repeating the work (and its Bedrock calls)
+
+import copy
+import os
+import threading
+from typing import Any, Callable, Dict, List, Optional
+
+from incremental import fingerprint
+from metrics import incr
+from resilience import remaining_time
+
+# 'false' runs every analysis on its own, even when an identical one is already running
+ESG_SINGLE_FLIGHT = os.getenv('ESG_SINGLE_FLIGHT', 'true').lower() == 'true'
+# Longest a duplicate waits for the running analysis, in seconds (0: until the request's deadline)
+ESG_SINGLE_FLIGHT_TIMEOUT = float(os.getenv('ESG_SINGLE_FLIGHT_TIMEOUT', '0'))
+
+
+class SingleFlightTimeout(TimeoutError):
+    """A duplicate gave up waiting; the shared computation carries on for the others"""
+
+
+def analysis_key(business_data: Dict, responses: List[Dict], framework: str) -> str:
+    """Canonical hash of an analysis' inputs: key order and whitespace in the request do not matter"""
+    return fingerprint({'business': business_data, 'responses': responses, 'framework': framework})
+
+
+class _Call:
+    __slots__ = ('done', 'result', 'error', 'waiters')
+
+    def __init__(self):
+        self.done = threading.Event()
+        self.result: Any = None
+        self.error: Optional[BaseException] = None
+        self.waiters = 0
+
+
+class SingleFlight:
+    """
+    In-flight calls by key. ``do(key, fn)`` runs ``fn`` in the caller's thread
+    unless a call with the same key is already running, in which case it waits
+    for that call's result, or exception, and returns a deep copy so callers
+    never share a mutable result. Each waiter has its own timeout; giving up
+    raises ``SingleFlightTimeout`` for that waiter alone. Results are not kept
+    once the call finishes: that is the response cache's job.
+    """
+
+    def __init__(self, timeout: float = None):
+        self.timeout = ESG_SINGLE_FLIGHT_TIMEOUT if timeout is None else timeout
+        self._calls: Dict[str, _Call] = {}
+        self._lock = threading.Lock()
+        self.calls = 0
+        self.collapsed = 0
+        self.timeouts = 0
+
+    def _wait_time(self, timeout: Optional[float]) -> Optional[float]:
+        # The tighter of the configured wait and what is left of the request's deadline
+        limit = self.timeout if timeout is None else timeout
+        limits = [value for value in (limit or None, remaining_time()) if value is not None]
+        return max(min(limits), 0.0) if limits else None
+
+    def do(self, key: str, fn: Callable[[], Any], timeout: float = None) -> Any:
+        with self._lock:
+            call = self._calls.get(key)
+            leader = call is None
+            if leader:
+                call = self._calls[key] = _Call()
+                self.calls += 1
+            else:
+                call.waiters += 1
+                self.collapsed += 1
+        if leader:
+            try:
+                result = fn()
+            except BaseException as e:
+                self._finish(key, call, error=e)
+                raise
+            self._finish(key, call, result=result)
+            return result
+
+        incr('single_flight_collapsed')
+        if not call.done.wait(self._wait_time(timeout)):
+            with self._lock:
+                self.timeouts += 1
+            incr('single_flight_timeouts')
+            raise SingleFlightTimeout(f"Gave up waiting for in-flight call {key[:12]}")
+        if call.error is not None:
+            raise call.error
+        return copy.deepcopy(call.result)
+
+    def _finish(self, key: str, call: _Call, result: Any = None, error: BaseException = None):
+        with self._lock:
+            del self._calls[key]
+            waiters = call.waiters
+        # Copied before the leader's caller gets the result and can change it
+        call.result = copy.deepcopy(result) if waiters else None
+        call.error = error
+        call.done.set()
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                'in_flight': len(self._calls),
+                'calls': self.calls,
+                'collapsed': self.collapsed,
+                'timeouts': self.timeouts
+            }
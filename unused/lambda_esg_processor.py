@@ -1,24 +1,93 @@
+import bisect
+import contextvars
 import json
-import boto3
-from typing import Dict, List, Any
+import threading
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from typing import Dict, List, Any, Iterator, Optional
 from dataclasses import dataclass, asdict
 import logging
 import os
 
-# Configure logging
+from bedrock_client import get_client, invoke_model, stream_model
+from cohort_cache import CohortCache, get_cohort_cache, personalize
+from grant_catalog import SME_SIZES, get_grant_catalog
+from incremental import (ESG_INCREMENTAL_THRESHOLD, SCORE_FIELDS, diff_results, fingerprint, get_assessment_store,
+                         new_state, response_changes, responses_by_criterion, score_drift)
+from job_store import FAILED, describe, get_job_store, request_hash, run_job
+from metrics import annotate, incr, request_metrics, timed
+from peer_benchmarks import PeerBenchmarks, get_peer_benchmarks
+from llm_parser import IncrementalArrayParser, build_dataclass, extract_scores, parse_json, parse_json_array
+from prompt_budget import PROMPT_TOKEN_BUDGET, chunk_responses, fit_responses, summarize_responses
+from prompt_templates import Prompt, PromptTemplate, request_body
+from resilience import (BEDROCK_DEADLINE_RESERVE, ResilienceError, deadline_scope, get_resilience, lambda_deadline,
+                        remaining_time, run_in_context)
+from scheduler import PRIORITY_BULK, get_scheduler, priority_scope
+from response_cache import ResponseCache, get_default_cache
+from serialization import dumps, encode_body, record_dict
+from single_flight import ESG_SINGLE_FLIGHT, SingleFlight, SingleFlightTimeout, analysis_key
+
+# Configure logging; LOG_LEVEL=DEBUG adds the container-wide cache, breaker and scheduler stats per request
 logger = logging.getLogger()
-logger.setLevel(logging.INFO)
+logger.setLevel(os.getenv('LOG_LEVEL', 'INFO').upper())
 
 # Configuration constants for Lambda endpoint and AWS region
 # These can be overridden by environment variables if available
 LAMBDA_ENDPOINT_URL = os.getenv('LAMBDA_ENDPOINT_URL', 'https://your-lambda-endpoint.amazonaws.com')
 AWS_REGION = os.getenv('AWS_REGION', 'ap-southeast-1')
 
-# Initialize AWS Bedrock client with configurable region
-bedrock_runtime = boto3.client('bedrock-runtime', region_name=AWS_REGION)
+def _get_rubric(framework: str):
+    # Imported on first use so numpy stays off the cold-start path
+    from scoring_engine import get_rubric
+    return get_rubric(framework)
+
+# Batch requests: assessments analyzed in parallel, and the most handled per invocation
+BATCH_WORKERS = int(os.getenv('ESG_BATCH_WORKERS', '8'))
+BATCH_PAGE_SIZE = int(os.getenv('ESG_BATCH_PAGE_SIZE', '50'))
+
+# Async jobs run on a background thread ('thread') or in an async invocation of this
+# function ('lambda'), which needs a job store shared between containers. On Lambda a
+# thread stops with the invocation that returned the 202, so 'lambda' is the default there
+JOB_WORKER = os.getenv('ESG_JOB_WORKER', 'lambda' if os.getenv('AWS_LAMBDA_FUNCTION_NAME') else 'thread').lower()
+JOB_WORKERS = int(os.getenv('ESG_JOB_WORKERS', '2'))
+_job_pool = None
+_job_pool_lock = threading.Lock()
+
+# Bedrock client override (e.g. a fake in benchmarks). When unset, the shared
+# client from bedrock_client.get_client is created on the first model call,
+# so cold starts and requests that never reach Bedrock skip importing boto3
+bedrock_runtime = None
+
+# Fallbacks ('scores', 'recommendations', 'analysis') the analysis running in this context
+# has used; listed on its result so degraded results are never kept as a baseline
+_fallbacks: contextvars.ContextVar[Optional[set]] = contextvars.ContextVar('esg_fallbacks', default=None)
+
+def _note_fallback(kind: str):
+    used = _fallbacks.get()
+    if used is not None:
+        used.add(kind)
+
+def _bedrock_runtime():
+    return bedrock_runtime or get_client('bedrock-runtime', AWS_REGION)
+
+# complianceLevel of the analysis response, as src/services/lambdaService.ts types it, by overall
+# score. Rubric levels (needs-foundation/progressing/financing-ready, which framework_scores keep)
+# and labels the model makes up are mapped onto it, so every path answers in one vocabulary
+COMPLIANCE_LABELS = ('Needs Improvement', 'Fair', 'Good', 'Excellent')
+COMPLIANCE_LABEL_BANDS = (40.0, 60.0, 80.0)
 
+def _compliance_label(overall_score: float, level: Any = None) -> str:
+    """``level`` if it is one of COMPLIANCE_LABELS (in any case), else the label for ``overall_score``"""
+    wanted = str(level or '').strip().lower()
+    for label in COMPLIANCE_LABELS:
+        if label.lower() == wanted:
+            return label
+    return COMPLIANCE_LABELS[bisect.bisect_right(COMPLIANCE_LABEL_BANDS, float(overall_score))]
+
+# Result records are slotted: no per-instance __dict__, and serialization.dumps
+# writes them from their fields without dataclasses.asdict's deep copies
 @dataclass
 class ESGScoring:
+    __slots__ = ('environmental_score', 'social_score', 'governance_score', 'overall_score', 'compliance_level')
     environmental_score: float
     social_score: float
     governance_score: float
@@ -27,6 +96,8 @@ class ESGScoring:
     
 @dataclass
 class ESGRecommendation:
+    __slots__ = ('id', 'type', 'title', 'description', 'priority', 'estimatedImpact', 'timeframe',
+                 'requiredActions', 'relatedCriteria', 'resources')
     id: str
     type: str  # 'improvement', 'grant', 'market_opportunity', 'certification'
     title: str
@@ -40,6 +111,7 @@ class ESGRecommendation:
     
 @dataclass
 class GrantOpportunity:
+    __slots__ = ('name', 'provider', 'amount', 'eligibility_match_score', 'description', 'deadline', 'requirements')
     name: str
     provider: str
     amount: str
@@ -48,282 +120,794 @@ class GrantOpportunity:
     deadline: str
     requirements: List[str]
 
+# Prompts: the invariant instructions and output schema first, as the system block, then the
+# company's data
+SCORING_PROMPT = PromptTemplate('scoring', """
+    Analyze a Malaysian SME's ESG assessment and provide numerical scores (0-100).
+    Consider Malaysian ESG standards and SME context in scoring.
+
+    Provide scores in this exact format:
+    Environmental Score: [0-100]
+    Social Score: [0-100]
+    Governance Score: [0-100]
+    Overall Score: [0-100]
+    Compliance Level: [Excellent|Good|Fair|Needs Improvement]
+    """, """
+    {scope}
+    Company: {name}
+    Industry: {industry}
+    Size: {size} ({employees} employees)
+    Framework: {framework}
+
+    Assessment Responses:
+    {responses}
+    """)
+
+RECOMMENDATIONS_PROMPT = PromptTemplate('recommendations', """
+    Generate 3-5 specific, actionable ESG improvement recommendations for a Malaysian SME,
+    based on its ESG assessment results below.
+    Focus on practical steps with clear timeframes and expected impacts.
+
+    Return as JSON array with format:
+    [{
+        "id": "rec_001",
+        "type": "improvement",
+        "title": "Short recommendation title",
+        "description": "Detailed recommendation description",
+        "priority": "high|medium|low",
+        "estimatedImpact": "Expected impact description with specific metrics",
+        "timeframe": "Implementation timeframe (e.g., 3-6 months)",
+        "requiredActions": ["Specific action 1", "Specific action 2", "Specific action 3"],
+        "relatedCriteria": ["Environmental management", "Energy efficiency"],
+        "resources": [{"title": "Resource name", "type": "document", "description": "Resource description"}]
+    }]
+    """, """
+    ESG assessment results for {name}
+    in the {industry} industry with {employees} employees:
+
+    ESG Scores:
+    - Environmental: {environmental}
+    - Social: {social}
+    - Governance: {governance}
+    - Overall: {overall}
+
+    Assessment Responses:
+    {responses}
+    """)
+
+FALLBACK_RECOMMENDATIONS_PROMPT = PromptTemplate('fallback_recommendations', """
+    Generate 4-5 diverse ESG improvement recommendations for Malaysian SMEs.
+
+    Focus Areas (vary priorities and timeframes):
+    - Environmental: Energy efficiency, waste reduction, sustainable sourcing
+    - Social: Employee welfare, community engagement, workplace safety
+    - Governance: Transparency, ethics, stakeholder engagement
+    - Operational: Digital transformation, supply chain sustainability
+
+    Return as JSON array with this exact format:
+    [{
+        "id": "rec_001",
+        "type": "improvement",
+        "title": "Specific actionable title",
+        "description": "Detailed implementation description",
+        "priority": "high|medium|low",
+        "estimatedImpact": "Specific measurable outcomes with percentages/metrics",
+        "timeframe": "Realistic timeframe (e.g., 2-3 months, 6-12 months)",
+        "requiredActions": ["Action 1", "Action 2", "Action 3", "Action 4"],
+        "relatedCriteria": ["ESG Category 1", "ESG Category 2"],
+        "resources": [{"title": "Resource name", "type": "document|website|tool", "description": "Brief description"}]
+    }]
+
+    Ensure recommendations are practical for Malaysian SMEs with limited resources.
+    """, """
+    Business Context: {industry} industry
+    Company Size: {size}
+    """)
+
+COMBINED_PROMPT = PromptTemplate('combined', """
+    Analyze a Malaysian SME's ESG assessment.
+
+    Return a single JSON object and nothing else, with these keys in this order:
+    {
+        "environmental_score": 0-100,
+        "social_score": 0-100,
+        "governance_score": 0-100,
+        "overall_score": 0-100,
+        "compliance_level": "Excellent|Good|Fair|Needs Improvement",
+        "recommendations": [{
+            "id": "rec_001",
+            "type": "improvement",
+            "title": "Short recommendation title",
+            "description": "Detailed recommendation description",
+            "priority": "high|medium|low",
+            "estimatedImpact": "Expected impact with specific metrics",
+            "timeframe": "Implementation timeframe (e.g., 3-6 months)",
+            "requiredActions": ["Specific action 1", "Specific action 2"],
+            "relatedCriteria": ["Criterion id"],
+            "resources": [{"title": "Resource name", "type": "document", "description": "Resource description"}]
+        }],
+        "compliance_gaps": ["Specific gap tied to a criterion"]
+    }
+
+    Give 3-5 recommendations that target the weakest criteria. Consider Malaysian
+    ESG standards and SME context.
+    """, """
+    Company: {name}
+    Industry: {industry}
+    Size: {size} ({employees} employees)
+    Framework: {framework}
+    {peer_context}
+
+    Assessment Responses:
+    {responses}
+    """)
+
 class ESGProcessor:
-    def __init__(self):
+    def __init__(self, speculative_recommendations: bool = None, stage_workers: int = None,
+                 cache: ResponseCache = None, scoring_mode: str = None, prompt_budget: int = None,
+                 combined_analysis: bool = None, incremental_threshold: float = None,
+                 cohort_cache: CohortCache = None, peer_benchmarks: PeerBenchmarks = None,
+                 single_flight: SingleFlight = None):
         self.model_id = "anthropic.claude-3-sonnet-20240229-v1:0"
+        # Identical prompts within the TTL are served from the cache instead of Bedrock
+        self.cache = cache if cache is not None else get_default_cache()
+        # Speculative mode drafts recommendations from provisional scores while the scoring call runs;
+        # otherwise each stage runs after the last
+        if speculative_recommendations is None:
+            speculative_recommendations = os.getenv('ESG_SPECULATIVE_RECOMMENDATIONS', 'false').lower() == 'true'
+        self.speculative_recommendations = speculative_recommendations
+        self.stage_workers = stage_workers or int(os.getenv('ESG_STAGE_WORKERS', '4'))
+        # 'llm' asks Bedrock for scores; 'rubric' computes them from the framework's weighted rubric
+        self.scoring_mode = scoring_mode or os.getenv('ESG_SCORING_MODE', 'llm')
+        # Tokens allowed for the responses block of a prompt; larger assessments are scored in chunks
+        self.prompt_budget = prompt_budget or PROMPT_TOKEN_BUDGET
+        # Combined mode asks for scores, recommendations and gaps in one completion
+        if combined_analysis is None:
+            combined_analysis = os.getenv('ESG_COMBINED_ANALYSIS', 'false').lower() == 'true'
+        self.combined_analysis = combined_analysis
+        # Score drift, in points, after which an incremental re-assessment asks the LLM again
+        self.incremental_threshold = (ESG_INCREMENTAL_THRESHOLD if incremental_threshold is None
+                                      else incremental_threshold)
+        # Cohort mode shares one recommendation set between companies with the same profile and score bands
+        if cohort_cache is None and os.getenv('ESG_COHORT_CACHE', 'false').lower() == 'true':
+            cohort_cache = get_cohort_cache()
+        self.cohort_cache = cohort_cache
+        # Completed scores feed per-industry/size sketches that place each new analysis among its peers
+        if peer_benchmarks is None and os.getenv('ESG_PEER_BENCHMARKS', 'true').lower() == 'true':
+            peer_benchmarks = get_peer_benchmarks()
+        self.peer_benchmarks = peer_benchmarks
+        # Identical analyses running at the same time in this container share one run and its Bedrock calls
+        if single_flight is None and ESG_SINGLE_FLIGHT:
+            single_flight = SingleFlight()
+        self.single_flight = single_flight
         
     def analyze_esg_assessment(self, business_data: Dict, responses: List[Dict], framework: str) -> Dict[str, Any]:
         """
         Main function to analyze ESG assessment using AWS Bedrock LLM
+        
+        A request identical to one already running (double-clicks, client retries,
+        repeated batch items) waits for that run's result instead of starting its
+        own; one that waits past its timeout gets the fallback analysis with
+        static recommendations, so giving up never adds a model call.
+        
+        A result that used any fallback lists them in ``fallbacks``.
         """
+        def analyze():
+            return self._tracking_fallbacks(self._analyze_esg_assessment, business_data, responses, framework)
+        
+        if self.single_flight is None:
+            return analyze()
         try:
-            # Calculate ESG scores using LLM
-            scores = self._calculate_esg_scores(business_data, responses, framework)
-            
-            # Generate recommendations
-            recommendations = self._generate_recommendations(business_data, responses, scores)
-            
-            # Find matching grants and opportunities
-            opportunities = self._find_grant_opportunities(business_data, scores)
+            return self.single_flight.do(analysis_key(business_data, responses, framework), analyze)
+        except SingleFlightTimeout as e:
+            logger.warning(str(e))
+            return self._tracking_fallbacks(self._fallback_analysis, business_data, responses, framework,
+                                            call_model=False)
+    
+    @staticmethod
+    def _tracking_fallbacks(analyze, *args, **kwargs) -> Dict[str, Any]:
+        """Run an analysis and list the fallbacks it used, if any, under ``fallbacks``"""
+        used = set()
+        token = _fallbacks.set(used)
+        try:
+            result = analyze(*args, **kwargs)
+        finally:
+            _fallbacks.reset(token)
+        if used:
+            result['fallbacks'] = sorted(used)
+        return result
+    
+    def _analyze_esg_assessment(self, business_data: Dict, responses: List[Dict], framework: str) -> Dict[str, Any]:
+        if self.combined_analysis:
+            table = fit_responses(responses, self.prompt_budget)
+            # Assessments too large for one prompt take the chunked multi-call path
+            if table is not None:
+                return self._analyze_combined(business_data, responses, framework, table)
+        
+        try:
+            if self.speculative_recommendations:
+                # The scoring call runs on a worker while recommendations are drafted here
+                with ThreadPoolExecutor(max_workers=1, thread_name_prefix='stage') as pool:
+                    scores_future = run_in_context(pool, self._calculate_esg_scores, business_data, responses, framework)
+                    recommendations = self._generate_recommendations(
+                        business_data, responses, self._provisional_scores(responses, framework), framework)
+                    scores = scores_future.result()
+            else:
+                scores = self._calculate_esg_scores(business_data, responses, framework)
+                recommendations = self._generate_recommendations(business_data, responses, scores, framework)
             
-            return {
-                "scores": asdict(scores),
-                "recommendations": [asdict(rec) for rec in recommendations],
-                "opportunities": [asdict(opp) for opp in opportunities],
+            return self._with_peer_benchmarks(business_data, framework, {
+                "scores": record_dict(scores),
+                "recommendations": [record_dict(rec) for rec in recommendations],
+                "opportunities": [record_dict(opp) for opp in self._find_grant_opportunities(business_data, scores)],
                 "analysis_timestamp": json.dumps({"timestamp": "2024-01-01T00:00:00Z"}),
                 "compliance_gaps": self._identify_compliance_gaps(responses, scores)
-            }
+            })
             
         except Exception as e:
             logger.error(f"Error in ESG analysis: {str(e)}")
-            return self._fallback_analysis(business_data, responses)
+            return self._fallback_analysis(business_data, responses, framework)
+    
+    @timed('combined')
+    def _analyze_combined(self, business_data: Dict, responses: List[Dict], framework: str,
+                          responses_table: str) -> Dict[str, Any]:
+        """
+        Single-call analysis: one completion carries scores, compliance level,
+        recommendations and gaps, decoded into the same dict as the multi-call path
+        """
+        try:
+            text = self._invoke_model(
+                self._build_combined_prompt(business_data, responses_table, framework),
+                max_tokens=3500, temperature=0.3)
+            analysis = parse_json(text)
+            if not isinstance(analysis, dict):
+                analysis = {}
+            values = extract_scores(text)
+            if not values and not analysis.get('recommendations'):
+                raise ValueError("Combined analysis response contained no scores or recommendations")
+            
+            scores = self._scoring_from_values(values)
+            if self.scoring_mode == 'rubric':
+                scores = self._rubric_scores(responses, framework) or scores
+            
+            recommendations_data = [rec for rec in analysis.get('recommendations') or [] if isinstance(rec, dict)]
+            recommendations = [
+                self._recommendation_from_dict(rec, i) for i, rec in enumerate(recommendations_data[:5])
+            ] or self._static_recommendations()
+            gaps = [str(gap) for gap in analysis.get('compliance_gaps') or [] if gap]
+            
+            return self._with_peer_benchmarks(business_data, framework, {
+                "scores": record_dict(scores),
+                "recommendations": [record_dict(rec) for rec in recommendations],
+                "opportunities": [record_dict(opp) for opp in self._find_grant_opportunities(business_data, scores)],
+                "analysis_timestamp": json.dumps({"timestamp": "2024-01-01T00:00:00Z"}),
+                "compliance_gaps": gaps or self._identify_compliance_gaps(responses, scores)
+            })
+            
+        except Exception as e:
+            logger.error(f"Error in combined ESG analysis: {str(e)}")
+            return self._fallback_analysis(business_data, responses, framework)
     
+    def _with_peer_benchmarks(self, business_data: Dict, framework: str, result: Dict[str, Any]) -> Dict[str, Any]:
+        """
+        Add ``peer_benchmarks`` (each pillar's percentile among peers) to a
+        completed analysis and record its scores. A company counts once: a
+        repeat (a resubmission, a re-run answered from the response cache, a
+        repeated batch item) replaces its earlier scores, and single-flight
+        followers share the leader's result without getting here.
+
+        Analyses whose scores, or any chunk of them, came from
+        ``_fallback_scores`` are neither placed nor recorded, and full
+        fallback analyses never get here.
+        """
+        used = _fallbacks.get()
+        if self.peer_benchmarks is None or (used and 'scores' in used):
+            return result
+        try:
+            result['peer_benchmarks'] = self.peer_benchmarks.observe(framework, business_data, result['scores'])
+        except Exception as e:
+            logger.warning(f"Peer benchmarks unavailable: {str(e)}")
+        return result
+    
+    def analyze_multi_framework(self, business_data: Dict, responses: List[Dict],
+                                frameworks: List[str]) -> Dict[str, Any]:
+        """
+        Analyze one set of responses against several frameworks in a single pass.
+        
+        The responses are projected through the criterion crosswalk onto the
+        first framework and analyzed once, so shared evidence costs one set of
+        LLM calls. Every framework is then scored by its rubric on its own
+        projection, shifted by the gap between the LLM and rubric overall
+        scores for the analyzed framework, and returned as ``framework_scores``.
+        """
+        # Imported on first use so numpy stays off the cold-start path
+        from crosswalk import get_crosswalk
+        crosswalk = get_crosswalk()
+        primary = frameworks[0]
+        rubric = _get_rubric(primary)
+        projected = crosswalk.project(responses, rubric, keep_unmapped=True)
+        result = self.analyze_esg_assessment(business_data, projected, primary)
+        
+        offset = 0.0
+        if rubric.coverage(projected):
+            offset = result['scores']['overall_score'] - rubric.score(projected)['overall_score']
+        result['framework_scores'] = crosswalk.framework_scores(responses, frameworks, offset)
+        return result
+    
+    def reassess_esg_assessment(self, assessment_id: str, business_data: Dict, responses: List[Dict],
+                                framework: str) -> Dict[str, Any]:
+        """
+        Re-analyze an assessment the user has edited, reusing its previous result.
+        
+        Only the rubric categories holding edited criteria are re-scored, and
+        the scores, compliance level, gaps and opportunities that depend on them
+        are updated. The full analysis, LLM calls included, runs again only when
+        a pillar or the overall score has drifted ``incremental_threshold``
+        points since the last one, the compliance band changes, or there is no
+        usable previous state. The result carries an ``incremental`` block with
+        the response changes and a ``diff`` against the previous result.
+        """
+        store = get_assessment_store()
+        key = f"assessment:{assessment_id}"
+        state = store.get(key)
+        rubric = _get_rubric(framework)
+        current = responses_by_criterion(responses)
+        criterion_scores = rubric.criterion_scores(responses)
+        changes = response_changes(state['responses'] if state else {}, current)
+        edited = changes['added'] + changes['removed'] + changes['changed']
+        
+        # Without rubric coverage there is nothing to measure an edit by
+        restart = (state is None or state['framework'] != framework or not criterion_scores
+                   or state['business'] != fingerprint(business_data))
+        if restart:
+            affected = list(rubric.categories)
+            contributions = rubric.contributions(criterion_scores)
+        else:
+            affected = rubric.affected_categories(edited)
+            contributions = rubric.update_contributions(dict(state['contributions']), criterion_scores, affected)
+        rubric_scores = rubric.score_contributions(contributions)
+        
+        reuse = not restart and (score_drift(state['baseline'], rubric_scores) < self.incremental_threshold
+                                 and rubric_scores['compliance_level'] == state['baseline']['compliance_level'])
+        if reuse:
+            incr('incremental_reused')
+            baseline = state['baseline']
+            result = (self._update_result(business_data, responses, framework, state, rubric_scores)
+                      if edited else state['result'])
+        else:
+            baseline = rubric_scores
+            result = self.analyze_esg_assessment(business_data, responses, framework)
+        # A degraded result is not a baseline: the next edit runs the full analysis again
+        if not result.get('fallbacks'):
+            store.put(key, new_state(framework, business_data, current, contributions, rubric_scores, result,
+                                     baseline))
+        
+        return {
+            **result,
+            "incremental": {
+                "llm_called": not reuse,
+                "responses": changes,
+                "rescored_categories": affected,
+                "diff": diff_results(state['result'], result) if state is not None else None
+            }
+        }
+    
+    @timed('incremental_update')
+    def _update_result(self, business_data: Dict, responses: List[Dict], framework: str,
+                       state: Dict[str, Any], rubric_scores: Dict) -> Dict[str, Any]:
+        """
+        The previous result with its scores moved by the rubric change, and the
+        compliance gaps and grant matches that depend on them recomputed
+        """
+        previous = state['result']
+        previous_scores = ESGScoring(**previous['scores'])
+        if self.scoring_mode == 'rubric':
+            scores = self._rubric_scores(responses, framework)
+        else:
+            # LLM scores keep their own calibration and move by as much as the rubric did
+            shifted = {
+                field: round(min(max(previous['scores'][field] + rubric_scores[field]
+                                      - state['rubric_scores'][field], 0.0), 100.0), 1)
+                for field in SCORE_FIELDS
+            }
+            scores = ESGScoring(compliance_level=previous_scores.compliance_level, **shifted)
+        
+        # Gaps the model wrote are kept; the score-driven ones are re-derived
+        stale = self._identify_compliance_gaps(responses, previous_scores)
+        gaps = [gap for gap in previous['compliance_gaps'] if gap not in stale]
+        gaps += [gap for gap in self._identify_compliance_gaps(responses, scores) if gap not in gaps]
+        
+        return {
+            **previous,
+            "scores": record_dict(scores),
+            "opportunities": [record_dict(opp) for opp in self._find_grant_opportunities(business_data, scores)],
+            "compliance_gaps": gaps
+        }
+    
+    def analyze_batch(self, assessments: List[Dict], max_workers: int = None) -> List[Dict[str, Any]]:
+        """
+        Analyze many assessments in one call, sharing this processor's clients and cache.
+        
+        Returns one entry per assessment in input order; a failing item is reported
+        in its own entry instead of failing the batch.
+        """
+        results = [None] * len(assessments)
+        for entry in self.iter_batch(assessments, max_workers):
+            results[entry['index']] = entry
+        return results
+    
+    def iter_batch(self, assessments: List[Dict], max_workers: int = None) -> Iterator[Dict[str, Any]]:
+        """Yield per-assessment results as they complete, with at most max_workers in flight"""
+        with ThreadPoolExecutor(max_workers=max_workers or BATCH_WORKERS, thread_name_prefix='batch') as pool:
+            # Batch work queues behind interactive requests for Bedrock capacity
+            with priority_scope(PRIORITY_BULK):
+                futures = {
+                    run_in_context(pool, self._analyze_batch_item, item): index
+                    for index, item in enumerate(assessments)
+                }
+            for future in as_completed(futures):
+                index = futures[future]
+                item = assessments[index]
+                entry = {'index': index, 'id': item.get('id') if isinstance(item, dict) else None}
+                try:
+                    entry.update(success=True, data=future.result())
+                except Exception as e:
+                    logger.error(f"Batch item {index} failed: {str(e)}")
+                    entry.update(success=False, error=str(e))
+                yield entry
+    
+    def _analyze_batch_item(self, item: Dict) -> Dict[str, Any]:
+        """Validate a single batch entry and analyze it"""
+        if not isinstance(item, dict):
+            raise ValueError("Assessment must be an object")
+        business_data = item.get('business')
+        responses = item.get('responses', [])
+        if not isinstance(business_data, dict) or not business_data:
+            raise ValueError("Assessment is missing 'business'")
+        if not isinstance(responses, list):
+            raise ValueError("'responses' must be a list")
+        return self.analyze_esg_assessment(business_data, responses, item.get('framework', 'NSRF'))
+    
+    def _invoke_model(self, prompt: Prompt, max_tokens: int, temperature: float) -> str:
+        """Send a rendered prompt to Bedrock, its invariant prefix as the system block, and return the completion text"""
+        result = invoke_model(_bedrock_runtime(), self.model_id, request_body(prompt, max_tokens, temperature),
+                              cache=self.cache)
+        return result['content'][0]['text']
+    
+    @timed('scores')
     def _calculate_esg_scores(self, business_data: Dict, responses: List[Dict], framework: str) -> ESGScoring:
         """
         Calculate ESG scores using Claude 3 Sonnet via AWS Bedrock
+        
+        In rubric scoring mode the weighted rubric is used directly and no model is called.
         """
-        prompt = self._build_scoring_prompt(business_data, responses, framework)
+        if self.scoring_mode == 'rubric':
+            rubric_scores = self._rubric_scores(responses, framework)
+            if rubric_scores is not None:
+                return rubric_scores
         
         try:
-            response = bedrock_runtime.invoke_model(
-                modelId=self.model_id,
-                contentType="application/json",
-                accept="application/json",
-                body=json.dumps({
-                    "anthropic_version": "bedrock-2023-05-31",
-                    "max_tokens": 2000,
-                    "messages": [{
-                        "role": "user",
-                        "content": prompt
-                    }],
-                    "temperature": 0.3
-                })
-            )
+            table = fit_responses(responses, self.prompt_budget)
+            if table is None:
+                return self._map_reduce_scores(business_data, responses, framework)
             
-            result = json.loads(response['body'].read())
-            scores_text = result['content'][0]['text']
+            prompt = self._build_scoring_prompt(business_data, table, framework)
+            scores_text = self._invoke_model(prompt, max_tokens=2000, temperature=0.3)
             
             # Parse LLM response to extract scores
             return self._parse_scores_from_llm(scores_text)
             
         except Exception as e:
             logger.error(f"Error calculating scores: {str(e)}")
-            return self._fallback_scores(responses)
+            return self._fallback_scores(responses, framework)
     
-    def _generate_recommendations(self, business_data: Dict, responses: List[Dict], scores: ESGScoring) -> List[ESGRecommendation]:
+    def _map_reduce_scores(self, business_data: Dict, responses: List[Dict], framework: str) -> ESGScoring:
         """
-        Generate ESG improvement recommendations using LLM
+        Score an assessment too large for one prompt: each chunk of criteria is
+        scored in parallel, then pillar scores are averaged weighted by chunk size
         """
-        prompt = f"""
-        Based on the ESG assessment results for {business_data.get('name', 'this company')} 
-        in the {business_data.get('industry', 'unknown')} industry with {business_data.get('employees', 'unknown')} employees:
-        
-        ESG Scores:
-        - Environmental: {scores.environmental_score}
-        - Social: {scores.social_score} 
-        - Governance: {scores.governance_score}
-        - Overall: {scores.overall_score}
+        chunks = chunk_responses(responses, self.prompt_budget)
         
-        Assessment Responses: {json.dumps(responses[:3])}  # Limit for token efficiency
+        def score_chunk(index: int, chunk: List[Dict]) -> Dict[str, Any]:
+            prompt = self._build_scoring_prompt(
+                business_data, fit_responses(chunk, self.prompt_budget) or summarize_responses(chunk, self.prompt_budget),
+                framework, part=(index + 1, len(chunks)))
+            return extract_scores(self._invoke_model(prompt, max_tokens=2000, temperature=0.3))
         
-        Generate 3-5 specific, actionable ESG improvement recommendations for Malaysian SMEs.
-        Focus on practical steps with clear timeframes and expected impacts.
+        with ThreadPoolExecutor(max_workers=min(len(chunks), self.stage_workers)) as executor:
+            futures = [run_in_context(executor, score_chunk, i, chunk) for i, chunk in enumerate(chunks)]
+            partials = [future.result() for future in futures]
         
-        Return as JSON array with format:
-        [{{
-            "id": "rec_001",
-            "type": "improvement",
-            "title": "Short recommendation title",
-            "description": "Detailed recommendation description",
-            "priority": "high|medium|low",
-            "estimatedImpact": "Expected impact description with specific metrics",
-            "timeframe": "Implementation timeframe (e.g., 3-6 months)",
-            "requiredActions": ["Specific action 1", "Specific action 2", "Specific action 3"],
-            "relatedCriteria": ["Environmental management", "Energy efficiency"],
-            "resources": [{{"title": "Resource name", "type": "document", "description": "Resource description"}}]
-        }}]
+        merged: Dict[str, Any] = {}
+        for key in ('environmental', 'social', 'governance', 'overall'):
+            weighted = [(scores[key], len(chunk)) for scores, chunk in zip(partials, chunks) if key in scores]
+            if weighted:
+                merged[key] = round(sum(score * size for score, size in weighted) / sum(size for _, size in weighted), 1)
+        levels: Dict[str, int] = {}
+        for scores, chunk in zip(partials, chunks):
+            if 'compliance' in scores:
+                levels[scores['compliance']] = levels.get(scores['compliance'], 0) + len(chunk)
+        if levels:
+            merged['compliance'] = max(levels, key=levels.get)
+        return self._scoring_from_values(merged)
+    
+    @timed('recommendations')
+    def _generate_recommendations(self, business_data: Dict, responses: List[Dict], scores: ESGScoring,
+                                  framework: str = 'NSRF') -> List[ESGRecommendation]:
+        """
+        Generate ESG improvement recommendations using LLM, or from the cohort cache when enabled
         """
-        
         try:
-            response = bedrock_runtime.invoke_model(
-                modelId=self.model_id,
-                contentType="application/json", 
-                accept="application/json",
-                body=json.dumps({
-                    "anthropic_version": "bedrock-2023-05-31",
-                    "max_tokens": 3000,
-                    "messages": [{
-                        "role": "user",
-                        "content": prompt
-                    }],
-                    "temperature": 0.5
-                })
-            )
-            
-            result = json.loads(response['body'].read())
-            recommendations_text = result['content'][0]['text']
-            
-            # Parse JSON from LLM response
-            recommendations_data = self._extract_json_from_text(recommendations_text)
-            
-            # Convert to ESGRecommendation objects with proper field mapping
-            recommendations = []
-            for i, rec in enumerate(recommendations_data[:5]):
-                recommendations.append(ESGRecommendation(
-                    id=rec.get('id', f'rec_{i+1:03d}'),
-                    type=rec.get('type', 'improvement'),
-                    title=rec.get('title', 'ESG Improvement'),
-                    description=rec.get('description', 'No description available'),
-                    priority=rec.get('priority', 'medium').lower(),
-                    estimatedImpact=rec.get('estimatedImpact', 'Positive impact on ESG score'),
-                    timeframe=rec.get('timeframe', '3-6 months'),
-                    requiredActions=rec.get('requiredActions', ['Review current practices', 'Implement improvements']),
-                    relatedCriteria=rec.get('relatedCriteria', []),
-                    resources=rec.get('resources', [])
-                ))
+            if self.cohort_cache is not None:
+                recommendations = self._cohort_recommendations(business_data, responses, scores, framework)
+            else:
+                recommendations = self._llm_recommendations(business_data, responses, scores)
+            if not recommendations:
+                # The model answered but not with anything usable; asking again rarely helps
+                logger.warning("No recommendations could be parsed from the LLM response")
+                return self._static_recommendations()
             return recommendations
             
+        except ResilienceError as e:
+            # Breaker open or out of time: another model call would only add load
+            logger.warning(f"Skipping LLM recommendations: {str(e)}")
+            return self._static_recommendations()
         except Exception as e:
             logger.error(f"Error generating recommendations: {str(e)}")
             return self._fallback_recommendations(business_data, scores)
     
+    def _llm_recommendations(self, business_data: Dict, responses: List[Dict], scores: ESGScoring) -> List[ESGRecommendation]:
+        """Up to five recommendations parsed from one Bedrock call; empty when nothing parsed"""
+        prompt = self._build_recommendations_prompt(business_data, responses, scores)
+        recommendations_text = self._invoke_model(prompt, max_tokens=3000, temperature=0.5)
+        
+        # Parse JSON from LLM response
+        recommendations_data = self._extract_json_from_text(recommendations_text)
+        
+        # Convert to ESGRecommendation objects with proper field mapping
+        return [self._recommendation_from_dict(rec, i) for i, rec in enumerate(recommendations_data[:5])]
+    
+    def _cohort_key(self, business_data: Dict, scores: ESGScoring, framework: str) -> str:
+        return self.cohort_cache.key(framework, business_data,
+                                     (scores.environmental_score, scores.social_score, scores.governance_score))
+    
+    def _personalize(self, entry: Dict, business_data: Dict, responses: List[Dict]) -> List[ESGRecommendation]:
+        """A cohort's recommendation set adapted to this company, its three weakest criteria first"""
+        answered = [r for r in responses if isinstance(r.get('score'), (int, float)) and r.get('criterionId')]
+        weakest = [r['criterionId'] for r in sorted(answered, key=lambda r: r['score'])[:3]]
+        adapted = personalize(entry['recommendations'], entry.get('company'), business_data.get('name'), weakest)
+        return [ESGRecommendation(**rec) for rec in adapted]
+    
+    def _cohort_recommendations(self, business_data: Dict, responses: List[Dict], scores: ESGScoring,
+                                framework: str) -> List[ESGRecommendation]:
+        """
+        The cohort's stored recommendation set, generated by this request on a
+        miss and regenerated in the background once it ages
+        """
+        def generate() -> List[Dict]:
+            return [asdict(rec) for rec in self._llm_recommendations(business_data, responses, scores)]
+        
+        entry = self.cohort_cache.get_or_create(self._cohort_key(business_data, scores, framework),
+                                                generate, business_data.get('name'))
+        if entry is None:
+            return []
+        return self._personalize(entry, business_data, responses)
+    
+    def iter_recommendations(self, business_data: Dict, responses: List[Dict], scores: ESGScoring,
+                             framework: str = 'NSRF') -> Iterator[ESGRecommendation]:
+        """
+        Stream recommendations from Bedrock, yielding each one as soon as its JSON object closes.
+        
+        In cohort mode a stored set for the cohort is yielded at once, and a
+        streamed set is stored for the rest of the cohort.
+        """
+        key = None
+        if self.cohort_cache is not None:
+            key = self._cohort_key(business_data, scores, framework)
+            entry = self.cohort_cache.lookup(key, lambda: [
+                asdict(rec) for rec in self._llm_recommendations(business_data, responses, scores)
+            ], business_data.get('name'))
+            if entry is not None:
+                yield from self._personalize(entry, business_data, responses)
+                return
+        
+        streamed = []
+        for rec in self._stream_recommendations(business_data, responses, scores, streamed):
+            yield rec
+        if key is not None:
+            self.cohort_cache.put(key, [asdict(rec) for rec in streamed], business_data.get('name'))
+    
+    def _stream_recommendations(self, business_data: Dict, responses: List[Dict], scores: ESGScoring,
+                                streamed: List[ESGRecommendation]) -> Iterator[ESGRecommendation]:
+        """Recommendations as Bedrock streams them; those parsed from the model are also appended to ``streamed``"""
+        body = request_body(self._build_recommendations_prompt(business_data, responses, scores),
+                            max_tokens=3000, temperature=0.5)
+        parser = IncrementalArrayParser()
+        count = 0
+        try:
+            for delta in stream_model(_bedrock_runtime(), self.model_id, body, cache=self.cache):
+                for rec in parser.feed(delta):
+                    if not isinstance(rec, dict):
+                        continue
+                    streamed.append(self._recommendation_from_dict(rec, count))
+                    yield streamed[-1]
+                    count += 1
+                    if count == 5:
+                        return
+            # A truncated stream can still hold one usable recommendation
+            for rec in parser.finish():
+                if isinstance(rec, dict) and count < 5:
+                    streamed.append(self._recommendation_from_dict(rec, count))
+                    yield streamed[-1]
+                    count += 1
+        except Exception as e:
+            logger.error(f"Error streaming recommendations: {str(e)}")
+            # A broken-off set is not worth sharing with the cohort
+            streamed.clear()
+            if count == 0:
+                yield from self._fallback_recommendations(business_data, scores)
+            return
+        
+        # The stream completed but held nothing usable; asking again rarely helps
+        if count == 0:
+            yield from self._static_recommendations()
+    
+    def iter_assessment_events(self, business_data: Dict, responses: List[Dict], framework: str) -> Iterator[tuple]:
+        """
+        Yield (event, data) pairs as each part of the analysis becomes available.
+        
+        Order: scores, one recommendation event per recommendation, opportunities,
+        compliance_gaps. In speculative mode recommendations start streaming
+        before the scores are in, and the scores event follows them.
+        """
+        with ThreadPoolExecutor(max_workers=1, thread_name_prefix='stage') as pool:
+            scores_future = run_in_context(pool, self._calculate_esg_scores, business_data, responses, framework)
+            if self.speculative_recommendations:
+                draft_scores = self._provisional_scores(responses, framework)
+            else:
+                draft_scores = scores_future.result()
+                yield 'scores', record_dict(draft_scores)
+            
+            for rec in self.iter_recommendations(business_data, responses, draft_scores, framework):
+                yield 'recommendation', record_dict(rec)
+            
+            scores = scores_future.result()
+            if self.speculative_recommendations:
+                yield 'scores', record_dict(scores)
+        
+        yield 'opportunities', [record_dict(opp) for opp in self._find_grant_opportunities(business_data, scores)]
+        yield 'compliance_gaps', self._identify_compliance_gaps(responses, scores)
+    
+    @timed('prompt')
+    def _build_recommendations_prompt(self, business_data: Dict, responses: List[Dict], scores: ESGScoring) -> Prompt:
+        return RECOMMENDATIONS_PROMPT.render(
+            name=business_data.get('name', 'this company'),
+            industry=business_data.get('industry', 'unknown'),
+            employees=business_data.get('employees', 'unknown'),
+            environmental=scores.environmental_score,
+            social=scores.social_score,
+            governance=scores.governance_score,
+            overall=scores.overall_score,
+            responses=summarize_responses(responses, self.prompt_budget)
+        )
+    
+    def _peer_context(self, business_data: Dict, framework: str) -> str:
+        """Peer score quartiles for the prompt, so 'benchmarks' are data rather than the model's guess"""
+        if self.peer_benchmarks is None:
+            return ''
+        return self.peer_benchmarks.peer_context(framework, business_data)
+    
+    @timed('prompt')
+    def _build_combined_prompt(self, business_data: Dict, responses_table: str, framework: str) -> Prompt:
+        return COMBINED_PROMPT.render(
+            name=business_data.get('name', 'Unknown'),
+            industry=business_data.get('industry', 'Unknown'),
+            size=business_data.get('size', 'Unknown'),
+            employees=business_data.get('employees', 'Unknown'),
+            framework=framework,
+            peer_context=self._peer_context(business_data, framework),
+            responses=responses_table
+        )
+    
+    def _recommendation_from_dict(self, rec: Dict, index: int) -> ESGRecommendation:
+        """Map one LLM recommendation object onto ESGRecommendation, filling gaps with defaults"""
+        recommendation = build_dataclass(
+            ESGRecommendation, rec,
+            defaults={
+                'id': f'rec_{index+1:03d}',
+                'type': 'improvement',
+                'title': 'ESG Improvement',
+                'description': 'No description available',
+                'priority': 'medium',
+                'estimatedImpact': 'Positive impact on ESG score',
+                'timeframe': '3-6 months',
+                'requiredActions': lambda: ['Review current practices', 'Implement improvements'],
+                'relatedCriteria': list,
+                'resources': list
+            },
+            aliases={
+                'estimatedImpact': ['impact'],
+                'requiredActions': ['actions', 'steps'],
+                'relatedCriteria': ['criteria']
+            }
+        )
+        recommendation.priority = recommendation.priority.lower()
+        return recommendation
+    
+    @timed('opportunities')
     def _find_grant_opportunities(self, business_data: Dict, scores: ESGScoring) -> List[GrantOpportunity]:
         """
         Find matching Malaysian government grants and opportunities
         """
-        # Malaysian grant database (simplified for demo)
-        available_grants = [
+        # Indexed catalog loaded once per container; expired programmes are skipped
+        matches = get_grant_catalog().top_eligible(
             {
-                "name": "Malaysian Green Technology Financing Scheme",
-                "provider": "Malaysia Green Technology Corporation",
-                "amount": "Up to RM 50 million",
-                "description": "Funding for green technology adoption and sustainable practices",
-                "deadline": "2024-12-31",
-                "requirements": ["Green tech project", "60% local content", "Environmental impact assessment"],
-                "min_environmental_score": 65
+                'environmental': scores.environmental_score,
+                'social': scores.social_score,
+                'governance': scores.governance_score,
+                'overall': scores.overall_score
             },
-            {
-                "name": "SME ESG Excellence Grant",
-                "provider": "SME Corporation Malaysia", 
-                "amount": "Up to RM 200,000",
-                "description": "Grant for SMEs achieving ESG excellence",
-                "deadline": "2024-06-30",
-                "requirements": ["SME status", "ESG assessment completion", "Sustainability plan"],
-                "min_overall_score": 60
-            },
-            {
-                "name": "Digital Sustainability Fund",
-                "provider": "Malaysia Digital Economy Corporation",
-                "amount": "Up to RM 1 million",
-                "description": "Digital solutions for sustainability and ESG compliance",
-                "deadline": "2024-09-30", 
-                "requirements": ["Digital solution focus", "Sustainability metrics", "Malaysian company"],
-                "min_governance_score": 70
-            }
+            sme=business_data.get('size') in SME_SIZES,
+            k=3
+        )
+        return [
+            GrantOpportunity(
+                name=grant.name,
+                provider=grant.provider,
+                amount=grant.amount,
+                eligibility_match_score=eligibility_score,
+                description=grant.description,
+                deadline=grant.deadline,
+                requirements=grant.requirements
+            )
+            for grant, eligibility_score in matches
         ]
-        
-        opportunities = []
-        for grant in available_grants:
-            eligibility_score = self._calculate_eligibility_score(grant, scores, business_data)
-            if eligibility_score > 0.5:  # 50% match threshold
-                opportunities.append(GrantOpportunity(
-                    name=grant["name"],
-                    provider=grant["provider"],
-                    amount=grant["amount"],
-                    eligibility_match_score=eligibility_score,
-                    description=grant["description"],
-                    deadline=grant["deadline"],
-                    requirements=grant["requirements"]
-                ))
-        
-        # Sort by eligibility score
-        return sorted(opportunities, key=lambda x: x.eligibility_match_score, reverse=True)[:3]
-    
-    def _build_scoring_prompt(self, business_data: Dict, responses: List[Dict], framework: str) -> str:
-        return f"""
-        Analyze this Malaysian SME's ESG assessment and provide numerical scores (0-100):
-
-        Company: {business_data.get('name', 'Unknown')}
-        Industry: {business_data.get('industry', 'Unknown')}
-        Size: {business_data.get('size', 'Unknown')} ({business_data.get('employees', 'Unknown')} employees)
-        Framework: {framework}
-
-        Assessment Responses: {json.dumps(responses[:5])}  # Limit for tokens
-
-        Provide scores in this exact format:
-        Environmental Score: [0-100]
-        Social Score: [0-100] 
-        Governance Score: [0-100]
-        Overall Score: [0-100]
-        Compliance Level: [Excellent|Good|Needs Improvement|Poor]
-
-        Consider Malaysian ESG standards and SME context in scoring.
-        """
     
+    @timed('prompt')
+    def _build_scoring_prompt(self, business_data: Dict, responses_table: str, framework: str,
+                              part: tuple = None) -> Prompt:
+        """Scoring prompt over a ``prompt_budget`` responses table; ``part`` is (i, n) in map-reduce mode"""
+        scope = ""
+        if part:
+            scope = (f"This is part {part[0]} of {part[1]} of a large assessment. "
+                     "Score only from the criteria below; omit any pillar with no criteria here.")
+        return SCORING_PROMPT.render(
+            scope=scope,
+            name=business_data.get('name', 'Unknown'),
+            industry=business_data.get('industry', 'Unknown'),
+            size=business_data.get('size', 'Unknown'),
+            employees=business_data.get('employees', 'Unknown'),
+            framework=framework,
+            responses=responses_table
+        )
+    
+    @timed('parse')
     def _parse_scores_from_llm(self, llm_text: str) -> ESGScoring:
-        """Parse scores from LLM response text"""
+        """Parse scores from LLM response text (label lines, markdown or JSON keys)"""
         try:
-            # Extract scores using simple parsing
-            lines = llm_text.split('\n')
-            scores = {}
-            
-            for line in lines:
-                if 'Environmental Score:' in line:
-                    scores['environmental'] = float(line.split(':')[1].strip())
-                elif 'Social Score:' in line:
-                    scores['social'] = float(line.split(':')[1].strip()) 
-                elif 'Governance Score:' in line:
-                    scores['governance'] = float(line.split(':')[1].strip())
-                elif 'Overall Score:' in line:
-                    scores['overall'] = float(line.split(':')[1].strip())
-                elif 'Compliance Level:' in line:
-                    scores['compliance'] = line.split(':')[1].strip()
-            
-            return ESGScoring(
-                environmental_score=scores.get('environmental', 65.0),
-                social_score=scores.get('social', 70.0),
-                governance_score=scores.get('governance', 60.0),
-                overall_score=scores.get('overall', 65.0),
-                compliance_level=scores.get('compliance', 'Good')
-            )
+            return self._scoring_from_values(extract_scores(llm_text))
             
         except Exception as e:
             logger.error(f"Error parsing scores: {str(e)}")
             return self._fallback_scores([])
     
+    def _scoring_from_values(self, scores: Dict[str, Any]) -> ESGScoring:
+        """ESGScoring from ``extract_scores`` output, defaulting anything the model left out"""
+        overall = scores.get('overall', 65.0)
+        return ESGScoring(
+            environmental_score=scores.get('environmental', 65.0),
+            social_score=scores.get('social', 70.0),
+            governance_score=scores.get('governance', 60.0),
+            overall_score=overall,
+            compliance_level=_compliance_label(overall, scores.get('compliance'))
+        )
+    
+    @timed('parse')
     def _extract_json_from_text(self, text: str) -> List[Dict]:
-        """Extract JSON array from LLM text response"""
-        try:
-            # Find JSON array in text
-            start = text.find('[')
-            end = text.rfind(']') + 1
-            if start != -1 and end > start:
-                json_str = text[start:end]
-                return json.loads(json_str)
-        except:
-            pass
-        return []
-    
-    def _calculate_eligibility_score(self, grant: Dict, scores: ESGScoring, business_data: Dict) -> float:
-        """Calculate eligibility score for a grant opportunity"""
-        score = 0.0
-        
-        # Check score requirements
-        if grant.get('min_environmental_score', 0) <= scores.environmental_score:
-            score += 0.3
-        if grant.get('min_social_score', 0) <= scores.social_score:
-            score += 0.3
-        if grant.get('min_governance_score', 0) <= scores.governance_score:
-            score += 0.3
-        if grant.get('min_overall_score', 0) <= scores.overall_score:
-            score += 0.4
-            
-        # Business criteria matching
-        if business_data.get('size') in ['micro', 'small', 'medium']:
-            score += 0.2
-            
-        return min(score, 1.0)
+        """Extract JSON array from LLM text response, repairing fenced, truncated or sloppy JSON"""
+        return parse_json_array(text)
     
+    @timed('compliance_gaps')
     def _identify_compliance_gaps(self, responses: List[Dict], scores: ESGScoring) -> List[str]:
         """Identify key compliance gaps"""
         gaps = []
@@ -337,93 +921,86 @@ class ESGProcessor:
             
         return gaps
     
-    def _fallback_scores(self, responses: List[Dict]) -> ESGScoring:
+    def _rubric_scores(self, responses: List[Dict], framework: str) -> Optional[ESGScoring]:
+        """Deterministic weighted scores from the framework rubric; None if no response maps onto it"""
+        rubric = _get_rubric(framework)
+        if not rubric.coverage(responses):
+            return None
+        scores = rubric.score(responses)
+        return ESGScoring(
+            environmental_score=scores['environmental_score'],
+            social_score=scores['social_score'],
+            governance_score=scores['governance_score'],
+            overall_score=scores['overall_score'],
+            compliance_level=_compliance_label(scores['overall_score'])
+        )
+    
+    def _fallback_scores(self, responses: List[Dict], framework: str = 'NSRF') -> ESGScoring:
         """Provide fallback scores when LLM fails"""
-        # Simple scoring based on response completeness
+        incr('fallback_scores')
+        _note_fallback('scores')
+        return self._rubric_scores(responses, framework) or self._completeness_scores(responses)
+    
+    def _completeness_scores(self, responses: List[Dict]) -> ESGScoring:
+        """Simple scoring based on response completeness"""
         base_score = 65 + (len(responses) * 2)
         return ESGScoring(
             environmental_score=min(base_score + 5, 100),
             social_score=min(base_score, 100),
             governance_score=min(base_score - 5, 100),
             overall_score=min(base_score, 100),
-            compliance_level="Good" if base_score > 70 else "Needs Improvement"
+            compliance_level=_compliance_label(min(base_score, 100))
+        )
+    
+    def _provisional_scores(self, responses: List[Dict], framework: str = 'NSRF') -> ESGScoring:
+        """Rough scores from the self-reported criterion scores, used before the LLM scores are available"""
+        rubric_scores = self._rubric_scores(responses, framework)
+        if rubric_scores is not None:
+            return rubric_scores
+        
+        reported = [r['score'] for r in responses if isinstance(r.get('score'), (int, float))]
+        if not reported:
+            return self._completeness_scores(responses)
+        average = round(sum(reported) / len(reported), 1)
+        return ESGScoring(
+            environmental_score=average,
+            social_score=average,
+            governance_score=average,
+            overall_score=average,
+            compliance_level=_compliance_label(average)
         )
     
     def _fallback_recommendations(self, business_data: Dict = None, scores: ESGScoring = None) -> List[ESGRecommendation]:
-        """Generate fallback recommendations using LLM"""
+        """Generate fallback recommendations using LLM, unless Bedrock is refusing calls or out of time"""
+        incr('fallback_recommendations')
+        _note_fallback('recommendations')
+        if not get_resilience().available(self.model_id):
+            return self._static_recommendations()
         try:
             # Use LLM to generate contextual recommendations
-            context = f"""
-            Generate 4-5 diverse ESG improvement recommendations for Malaysian SMEs.
-            
-            Business Context: {business_data.get('industry', 'General') if business_data else 'General'} industry
-            Company Size: {business_data.get('size', 'SME') if business_data else 'SME'}
-            
-            Focus Areas (vary priorities and timeframes):
-            - Environmental: Energy efficiency, waste reduction, sustainable sourcing
-            - Social: Employee welfare, community engagement, workplace safety
-            - Governance: Transparency, ethics, stakeholder engagement
-            - Operational: Digital transformation, supply chain sustainability
-            
-            Return as JSON array with this exact format:
-            [{{
-                "id": "rec_001",
-                "type": "improvement",
-                "title": "Specific actionable title",
-                "description": "Detailed implementation description",
-                "priority": "high|medium|low",
-                "estimatedImpact": "Specific measurable outcomes with percentages/metrics",
-                "timeframe": "Realistic timeframe (e.g., 2-3 months, 6-12 months)",
-                "requiredActions": ["Action 1", "Action 2", "Action 3", "Action 4"],
-                "relatedCriteria": ["ESG Category 1", "ESG Category 2"],
-                "resources": [{{"title": "Resource name", "type": "document|website|tool", "description": "Brief description"}}]
-            }}]
-            
-            Ensure recommendations are practical for Malaysian SMEs with limited resources.
-            """
-            
-            response = bedrock_runtime.invoke_model(
-                modelId=self.model_id,
-                contentType="application/json",
-                accept="application/json",
-                body=json.dumps({
-                    "anthropic_version": "bedrock-2023-05-31",
-                    "max_tokens": 4000,
-                    "messages": [{
-                        "role": "user",
-                        "content": context
-                    }],
-                    "temperature": 0.7
-                })
+            context = FALLBACK_RECOMMENDATIONS_PROMPT.render(
+                industry=business_data.get('industry', 'General') if business_data else 'General',
+                size=business_data.get('size', 'SME') if business_data else 'SME'
             )
             
-            result = json.loads(response['body'].read())
-            recommendations_text = result['content'][0]['text']
+            recommendations_text = self._invoke_model(context, max_tokens=4000, temperature=0.7)
             
             # Parse JSON from LLM response
             recommendations_data = self._extract_json_from_text(recommendations_text)
             
             if recommendations_data:
-                recommendations = []
-                for i, rec in enumerate(recommendations_data[:5]):
-                    recommendations.append(ESGRecommendation(
-                        id=rec.get('id', f'rec_{i+1:03d}'),
-                        type=rec.get('type', 'improvement'),
-                        title=rec.get('title', 'ESG Improvement'),
-                        description=rec.get('description', 'Improve ESG practices'),
-                        priority=rec.get('priority', 'medium').lower(),
-                        estimatedImpact=rec.get('estimatedImpact', 'Positive impact on ESG performance'),
-                        timeframe=rec.get('timeframe', '3-6 months'),
-                        requiredActions=rec.get('requiredActions', ['Review current practices', 'Implement improvements']),
-                        relatedCriteria=rec.get('relatedCriteria', ['ESG Management']),
-                        resources=rec.get('resources', [])
-                    ))
-                return recommendations
+                return [self._recommendation_from_dict(rec, i) for i, rec in enumerate(recommendations_data[:5])]
                 
         except Exception as e:
             logger.error(f"Error generating LLM fallback recommendations: {str(e)}")
         
         # Ultimate fallback with static recommendations
+        return self._static_recommendations()
+    
+    def _static_recommendations(self) -> List[ESGRecommendation]:
+        """Fixed recommendations used when no LLM output can be parsed"""
+        incr('static_recommendations')
+        _note_fallback('recommendations')
         return [
             ESGRecommendation(
                 id="rec_001",
@@ -475,76 +1052,314 @@ class ESGProcessor:
             )
         ]
     
-    def _fallback_analysis(self, business_data: Dict, responses: List[Dict]) -> Dict[str, Any]:
-        """Provide fallback analysis when main processing fails"""
-        fallback_scores = self._fallback_scores(responses)
+    def _fallback_analysis(self, business_data: Dict, responses: List[Dict], framework: str = 'NSRF',
+                           call_model: bool = True) -> Dict[str, Any]:
+        """Provide fallback analysis when main processing fails; ``call_model=False`` skips the LLM fallback recommendations"""
+        incr('fallback_analysis')
+        _note_fallback('analysis')
+        fallback_scores = self._fallback_scores(responses, framework)
+        recommendations = (self._fallback_recommendations(business_data, fallback_scores) if call_model
+                           else self._static_recommendations())
         return {
-            "scores": asdict(fallback_scores),
-            "recommendations": [asdict(rec) for rec in self._fallback_recommendations(business_data, fallback_scores)],
+            "scores": record_dict(fallback_scores),
+            "recommendations": [record_dict(rec) for rec in recommendations],
             "opportunities": [],
             "analysis_timestamp": json.dumps({"timestamp": "2024-01-01T00:00:00Z"}),
             "compliance_gaps": ["Assessment processing encountered issues - manual review recommended"]
         }
 
+# One processor per container, reused across warm invocations
+_processor = None
+
+def _get_processor() -> 'ESGProcessor':
+    global _processor
+    if _processor is None:
+        _processor = ESGProcessor()
+    return _processor
+
 def lambda_handler(event, context):
     """
     AWS Lambda entry point for ESG assessment processing
+    
+    A body with an ``assessments`` list is handled as a batch, see ``_handle_batch``.
+    A body with an ``assessmentId`` is re-assessed incrementally against the last
+    result for that id, see ``ESGProcessor.reassess_esg_assessment``.
+    Requests sent with ``Accept: text/event-stream`` get the analysis as server-sent events.
+    A body with ``"async": true`` (or ``Prefer: respond-async``) is stored as a job and
+    answered 202 with a ``jobId`` at once; a body with a ``jobId`` polls it, see ``_poll_job``.
     """
+    # Bedrock calls give up in time to leave room for the fallback response;
+    # timings, token usage and cache/fallback counters are logged as one JSON line on the way out
+    with deadline_scope(lambda_deadline(context)), request_metrics('lambda_handler'):
+        return _handle_request(event)
+
+def _handle_request(event) -> Dict[str, Any]:
     try:
+        if event.get('esgJob'):
+            # Worker invocation for an async job, see _dispatch_job
+            annotate(mode='job_worker')
+            with priority_scope(PRIORITY_BULK):
+                run_job(get_job_store(), event['esgJob'], _run_job_request)
+            return {'jobId': event['esgJob']}
+        
         # Parse incoming request
         if isinstance(event.get('body'), str):
             body = json.loads(event['body'])
         else:
             body = event.get('body', event)
         
-        business_data = body.get('business', {})
-        responses = body.get('responses', [])
-        framework = body.get('framework', 'NSRF')
+        processor = _get_processor()
         
-        logger.info(f"Processing ESG assessment for: {business_data.get('name', 'Unknown Company')}")
+        if body.get('jobId'):
+            annotate(mode='job_poll')
+            return _poll_job(body, _header(event, 'accept-encoding'))
         
-        # Initialize processor and analyze
-        processor = ESGProcessor()
-        results = processor.analyze_esg_assessment(business_data, responses, framework)
+        if body.get('async') or 'respond-async' in _header(event, 'prefer'):
+            annotate(mode='job_submit')
+            return _submit_job(body, _header(event, 'accept-encoding'))
+        
+        if 'assessments' not in body and _accepts_event_stream(event):
+            business_data = body.get('business', {})
+            annotate(mode='stream', framework=body.get('framework', 'NSRF'))
+            logger.info(f"Streaming ESG assessment for: {business_data.get('name', 'Unknown Company')}")
+            events = processor.iter_assessment_events(
+                business_data, body.get('responses', []), body.get('framework', 'NSRF')
+            )
+            return _event_stream_response(events)
+        
+        results, message = _process(processor, body)
         
         # Return successful response
-        return {
-            'statusCode': 200,
-            'headers': {
-                'Content-Type': 'application/json',
-                'Access-Control-Allow-Origin': '*',
-                'Access-Control-Allow-Headers': 'Content-Type',
-                'Access-Control-Allow-Methods': 'POST, OPTIONS'
-            },
-            'body': json.dumps({
-                'success': True,
-                'data': results,
-                'message': 'ESG assessment processed successfully'
-            })
-        }
+        return _api_response(200, {
+            'success': True,
+            'data': results,
+            'message': message
+        }, _header(event, 'accept-encoding'))
         
     except Exception as e:
         logger.error(f"Lambda execution error: {str(e)}")
         
         # Return error response with fallback
-        processor = ESGProcessor()
-        fallback_results = processor._fallback_analysis({}, [])
+        fallback_results = _get_processor()._fallback_analysis({}, [])
         
-        return {
-            'statusCode': 200,  # Still return 200 with fallback data
-            'headers': {
-                'Content-Type': 'application/json',
-                'Access-Control-Allow-Origin': '*',
-                'Access-Control-Allow-Headers': 'Content-Type', 
-                'Access-Control-Allow-Methods': 'POST, OPTIONS'
-            },
-            'body': json.dumps({
-                'success': False,
-                'data': fallback_results,
-                'error': str(e),
-                'message': 'ESG assessment processed with fallback data'
-            })
-        }
+        # Still return 200 with fallback data
+        return _api_response(200, {
+            'success': False,
+            'data': fallback_results,
+            'error': str(e),
+            'message': 'ESG assessment processed with fallback data'
+        }, _header(event, 'accept-encoding'))
+
+def _process(processor: ESGProcessor, body: Dict) -> tuple:
+    """Run a batch, incremental or single-assessment request; returns (results, message)"""
+    if 'assessments' in body:
+        annotate(mode='batch')
+        results = _handle_batch(processor, body)
+        message = f"Processed {len(results['results'])} of {results['total']} ESG assessments"
+    elif body.get('frameworks'):
+        from crosswalk import resolve_frameworks
+        business_data = body.get('business', {})
+        responses = body.get('responses', [])
+        frameworks = resolve_frameworks(body['frameworks'])
+        annotate(mode='multi_framework', frameworks=','.join(frameworks), responses=len(responses))
+        
+        logger.info(f"Processing {len(frameworks)}-framework ESG assessment for: "
+                    f"{business_data.get('name', 'Unknown Company')}")
+        results = processor.analyze_multi_framework(business_data, responses, frameworks)
+        message = 'Multi-framework ESG assessment processed successfully'
+    elif body.get('assessmentId'):
+        business_data = body.get('business', {})
+        annotate(mode='incremental', framework=body.get('framework', 'NSRF'))
+        logger.info(f"Re-assessing ESG assessment {body['assessmentId']} for: "
+                    f"{business_data.get('name', 'Unknown Company')}")
+        results = processor.reassess_esg_assessment(
+            str(body['assessmentId']), business_data, body.get('responses', []), body.get('framework', 'NSRF')
+        )
+        message = 'ESG assessment re-processed successfully'
+    else:
+        business_data = body.get('business', {})
+        responses = body.get('responses', [])
+        framework = body.get('framework', 'NSRF')
+        annotate(mode='single', framework=framework, responses=len(responses))
+        
+        logger.info(f"Processing ESG assessment for: {business_data.get('name', 'Unknown Company')}")
+        results = processor.analyze_esg_assessment(business_data, responses, framework)
+        message = 'ESG assessment processed successfully'
+    
+    if logger.isEnabledFor(logging.DEBUG):
+        logger.debug(f"Container stats: {json.dumps(_container_stats(processor), default=str)}")
+    return results, message
+
+def _container_stats(processor: ESGProcessor) -> Dict[str, Any]:
+    """Cumulative counters of the shared caches, breakers and scheduler in this container"""
+    stats = {'resilience': get_resilience().stats(), 'scheduler': get_scheduler().stats()}
+    for name, component in (('cache', processor.cache), ('cohort_cache', processor.cohort_cache),
+                            ('peer_benchmarks', processor.peer_benchmarks), ('single_flight', processor.single_flight)):
+        if component is not None:
+            stats[name] = component.stats()
+    return stats
+
+def _run_job_request(body: Dict) -> Dict[str, Any]:
+    results, message = _process(_get_processor(), body)
+    return {'data': results, 'message': message}
+
+def _submit_job(body: Dict, accept_encoding: str = None) -> Dict[str, Any]:
+    """
+    Store the request as a job and answer 202 with its id at once. A request
+    identical to one already queued, running or finished within ESG_JOB_TTL
+    gets that job instead of a new one.
+    
+    Refused with 501 on Lambda when jobs are only kept in memory: the worker
+    and the polls may land in other execution environments, which never see them.
+    """
+    store = get_job_store()
+    if os.getenv('AWS_LAMBDA_FUNCTION_NAME') and not store.shared:
+        return _api_response(501, {
+            'success': False,
+            'error': 'Async jobs need a job store shared between containers; set ESG_JOB_TABLE',
+            'message': 'ESG assessment job not accepted'
+        }, accept_encoding)
+    job, created = store.submit(request_hash(body), body)
+    annotate(job=job['id'], job_created=created)
+    if created:
+        _dispatch_job(job['id'])
+    return _api_response(202, {
+        'success': True,
+        'data': describe(job),
+        'message': 'ESG assessment job accepted' if created else 'ESG assessment job already submitted'
+    }, accept_encoding)
+
+def _dispatch_job(job_id: str):
+    """Start a worker for a job: an async invocation of this function, or a background thread"""
+    if JOB_WORKER == 'lambda' and os.getenv('AWS_LAMBDA_FUNCTION_NAME'):
+        get_client('lambda', AWS_REGION).invoke(
+            FunctionName=os.environ['AWS_LAMBDA_FUNCTION_NAME'],
+            InvocationType='Event',
+            Payload=json.dumps({'esgJob': job_id}).encode('utf-8')
+        )
+        return
+    global _job_pool
+    with _job_pool_lock:
+        if _job_pool is None:
+            _job_pool = ThreadPoolExecutor(max_workers=JOB_WORKERS, thread_name_prefix='esg-job')
+    # A fresh context: the job outlives this request's deadline and gets its own metrics line
+    _job_pool.submit(contextvars.Context().run, _run_job_thread, job_id)
+
+def _run_job_thread(job_id: str):
+    with request_metrics('esg_job', job=job_id), priority_scope(PRIORITY_BULK):
+        run_job(get_job_store(), job_id, _run_job_request)
+
+def _poll_job(body: Dict, accept_encoding: str = None) -> Dict[str, Any]:
+    """
+    Job status, and the result once finished. ``wait`` (seconds) holds the
+    request open until the job finishes, within the remaining Lambda time.
+    """
+    store = get_job_store()
+    wait = float(body.get('wait') or 0)
+    remaining = remaining_time()
+    if remaining is not None:
+        wait = min(wait, max(remaining - BEDROCK_DEADLINE_RESERVE, 0.0))
+    job = store.wait(str(body['jobId']), wait) if wait > 0 else store.get(str(body['jobId']))
+    if job is None:
+        return _api_response(404, {'success': False, 'error': 'Unknown or expired job', 'message': 'Job not found'},
+                             accept_encoding)
+    return _api_response(200, {
+        'success': job['status'] != FAILED,
+        'data': describe(job),
+        'message': f"ESG assessment job {job['status']}"
+    }, accept_encoding)
+
+def _handle_batch(processor: ESGProcessor, body: Dict) -> Dict[str, Any]:
+    """
+    Analyze one page of a batch request.
+    
+    Body shape: ``{"assessments": [{"id", "business", "responses", "framework"}, ...],
+    "cursor": 0, "page_size": 50}``. Up to ``page_size`` assessments starting at
+    ``cursor`` are processed; send the request again with ``next_cursor`` until it is null.
+    """
+    assessments = body['assessments']
+    if not isinstance(assessments, list):
+        raise ValueError("'assessments' must be a list")
+    cursor = max(int(body.get('cursor', 0)), 0)
+    page_size = min(max(int(body.get('page_size', BATCH_PAGE_SIZE)), 1), BATCH_PAGE_SIZE)
+    page = assessments[cursor:cursor + page_size]
+    
+    logger.info(f"Processing ESG batch: {len(page)} of {len(assessments)} assessments from cursor {cursor}")
+    results = processor.analyze_batch(page)
+    for entry in results:
+        entry['index'] += cursor
+    
+    end = cursor + len(page)
+    succeeded = sum(1 for entry in results if entry['success'])
+    return {
+        'results': results,
+        'total': len(assessments),
+        'cursor': cursor,
+        'next_cursor': end if end < len(assessments) else None,
+        'succeeded': succeeded,
+        'failed': len(results) - succeeded
+    }
+
+def _header(event: Dict, name: str) -> str:
+    headers = {k.lower(): v for k, v in (event.get('headers') or {}).items()}
+    return headers.get(name) or ''
+
+def _accepts_event_stream(event: Dict) -> bool:
+    return 'text/event-stream' in _header(event, 'accept')
+
+def iter_sse(events: Iterator[tuple]) -> Iterator[str]:
+    """Format (event, data) pairs as server-sent events, ending with a 'done' event"""
+    for name, data in events:
+        yield f"event: {name}\ndata: {dumps(data)}\n\n"
+    yield "event: done\ndata: {}\n\n"
+
+def _event_stream_response(events: Iterator[tuple]) -> Dict[str, Any]:
+    """
+    Server-sent events response for API Gateway proxy integration.
+    
+    The proxy integration buffers the body, so events are joined here; a host
+    with response streaming can write ``iter_sse`` output chunk by chunk instead.
+    """
+    with timed('serialize'):
+        body = ''.join(iter_sse(events))
+    return {
+        'statusCode': 200,
+        'headers': {
+            'Content-Type': 'text/event-stream',
+            'Cache-Control': 'no-cache',
+            'Access-Control-Allow-Origin': '*',
+            'Access-Control-Allow-Headers': 'Content-Type',
+            'Access-Control-Allow-Methods': 'POST, OPTIONS'
+        },
+        'body': body
+    }
+
+def _api_response(status_code: int, payload: Dict, accept_encoding: str = None) -> Dict[str, Any]:
+    """
+    Wrap a payload in an API Gateway proxy response with CORS headers.
+    
+    Large bodies are gzip or brotli compressed when ``accept_encoding`` allows,
+    and sent base64-encoded as the proxy integration requires.
+    """
+    with timed('serialize'):
+        body = dumps(payload)
+    with timed('compress'):
+        body, encoding = encode_body(body, accept_encoding)
+    headers = {
+        'Content-Type': 'application/json',
+        'Vary': 'Accept-Encoding',
+        'Access-Control-Allow-Origin': '*',
+        'Access-Control-Allow-Headers': 'Content-Type',
+        'Access-Control-Allow-Methods': 'POST, OPTIONS'
+    }
+    if encoding:
+        headers['Content-Encoding'] = encoding
+    return {
+        'statusCode': status_code,
+        'headers': headers,
+        'body': body,
+        'isBase64Encoded': encoding is not None
+    }
 
 # Requirements for deployment:
 # boto3==1.34.0